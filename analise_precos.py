@@ -0,0 +1,271 @@
+import os
+import sys
+import json
+import argparse
+import threading
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+import banco
+from referencias import NORMALIZACOES
+
+# ==============================================================================
+# BASE ANALÍTICA EM PARQUET (ITENS + LICITAÇÕES, PARTICIONADA POR MÊS E CATEGORIA)
+# ==============================================================================
+# O SQLite continua sendo a fonte da verdade; o Parquet é uma cópia colunar
+# para as análises entre editais. A exportação é incremental (só itens com id
+# maior que o último exportado); completo=True reconstrói do zero (use depois
+# de apagar ou reprocessar itens, e para compactar os arquivos pequenos).
+PASTA_PARQUET = os.environ.get("LICITACLOUD_PARQUET", "parquet_itens")
+ARQUIVO_ESTADO = "_exportacao.json"
+LINHAS_POR_LOTE = 50_000
+
+ESQUEMA = pa.schema([
+    ("item_id", pa.int64()),
+    ("licitacao_id", pa.int64()),
+    ("dono_id", pa.int64()),
+    ("nome_arquivo", pa.string()),
+    ("data_processamento", pa.string()),
+    ("valor_encontrado", pa.string()),
+    ("componente", pa.string()),
+    ("quantidade", pa.int64()),
+    ("preco", pa.float64()),
+    ("mes", pa.string()),
+    ("tipo_componente", pa.string()),
+])
+PARTICOES = ds.partitioning(pa.schema([("mes", pa.string()), ("tipo_componente", pa.string())]), flavor="hive")
+
+def normalizar_componentes(textos):
+    """Versão vetorizada (Arrow) de referencias.normalizar_componente: mesmas regras, mesma chave."""
+    textos = pc.utf8_lower(textos)
+    for padrao, troca in NORMALIZACOES:
+        textos = pc.replace_substring_regex(textos, padrao, troca)
+    return pc.utf8_trim_whitespace(textos)
+
+# ==============================================================================
+# EXPORTAÇÃO
+# ==============================================================================
+_trava_exportacao = threading.Lock() # Várias sessões do Streamlit no mesmo processo
+
+def _ler_estado(destino):
+    try:
+        with open(os.path.join(destino, ARQUIVO_ESTADO), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"ultimo_id": 0, "exportacoes": 0}
+
+def _gravar_estado(destino, estado):
+    caminho = os.path.join(destino, ARQUIVO_ESTADO)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(estado, f)
+    os.replace(caminho + ".tmp", caminho) # Troca atômica: nunca fica um estado pela metade
+
+def _lotes_do_banco(conexao, a_partir_de, ate):
+    """RecordBatches de itens + licitações com a_partir_de < id <= ate, lidos em blocos."""
+    cursor = conexao.execute("""
+        SELECT i.id, l.id, l.dono_id, l.nome_arquivo, l.data_processamento, i.valor_encontrado,
+               i.quantidade_edital, i.preco_medio_edital, substr(l.data_processamento, 1, 7), i.tipo_componente
+        FROM itens_extraidos i JOIN licitacoes l ON l.id = i.licitacao_id
+        WHERE i.id > ? AND i.id <= ? ORDER BY i.id
+    """, (a_partir_de, ate))
+    while True:
+        linhas = cursor.fetchmany(LINHAS_POR_LOTE)
+        if not linhas: return
+        colunas = list(zip(*linhas))
+        valores = pa.array(colunas[5], pa.string())
+        yield pa.RecordBatch.from_arrays([
+            pa.array(colunas[0], pa.int64()),
+            pa.array(colunas[1], pa.int64()),
+            pa.array(colunas[2], pa.int64()),
+            pa.array(colunas[3], pa.string()),
+            pa.array(colunas[4], pa.string()),
+            valores,
+            normalizar_componentes(valores),
+            pa.array(colunas[6], pa.int64()),
+            pa.array(colunas[7], pa.float64()),
+            pc.fill_null(pa.array(colunas[8], pa.string()), "sem-data"),
+            pc.fill_null(pa.array(colunas[9], pa.string()), "outros"),
+        ], schema=ESQUEMA)
+
+def exportar_parquet(destino=PASTA_PARQUET, completo=False):
+    """
+    Copia os itens novos do SQLite para o Parquet particionado (mes=AAAA-MM/tipo_componente=...).
+    Retorna {"linhas": exportadas agora, "ultimo_id": ...}.
+    """
+    with _trava_exportacao:
+        if os.path.isdir(destino) and _ler_estado(destino).get("refazer"): completo = True
+        if completo and os.path.isdir(destino):
+            for raiz, _, arquivos in os.walk(destino, topdown=False):
+                for a in arquivos: os.remove(os.path.join(raiz, a))
+                if raiz != destino: os.rmdir(raiz)
+        os.makedirs(destino, exist_ok=True)
+        estado = _ler_estado(destino)
+
+        # Uma fonte por arquivo: o banco compartilhado e, no modo particionado, o de cada
+        # usuário (lá os ids são do arquivo: o item é identificado por dono_id + item_id)
+        ultimos = estado.setdefault("donos", {})
+        pendentes = []
+        for dono_id in [None] + (banco.donos_particionados() if banco.particionado() else []):
+            with banco.conexao(dono_id) as conexao:
+                maior_id = conexao.execute("SELECT COALESCE(MAX(id), 0) FROM itens_extraidos").fetchone()[0]
+            a_partir_de = estado["ultimo_id"] if dono_id is None else ultimos.get(str(dono_id), 0)
+            if maior_id > a_partir_de:
+                pendentes.append((dono_id, a_partir_de, maior_id))
+        if not pendentes:
+            return {"linhas": 0, "ultimo_id": estado["ultimo_id"]}
+
+        contador = {"linhas": 0}
+        def lotes():
+            # O write_dataset consome os lotes numa thread dele: as conexões do pool
+            # aceitam isso (check_same_thread=False), sempre com um acesso por vez
+            for dono_id, a_partir_de, maior_id in pendentes:
+                with banco.conexao(dono_id) as conexao:
+                    for lote in _lotes_do_banco(conexao, a_partir_de, maior_id):
+                        contador["linhas"] += lote.num_rows
+                        yield lote
+        ds.write_dataset(
+            lotes(),
+            destino,
+            schema=ESQUEMA,
+            format="parquet",
+            partitioning=PARTICOES,
+            # Nome único por exportação: as incrementais só acrescentam arquivos
+            basename_template=f"parte-{estado['exportacoes']:06d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+        for dono_id, _, maior_id in pendentes:
+            if dono_id is None: estado["ultimo_id"] = maior_id
+            else: ultimos[str(dono_id)] = maior_id
+        estado["exportacoes"] += 1
+        _gravar_estado(destino, estado)
+        return {"linhas": contador["linhas"], "ultimo_id": estado["ultimo_id"]}
+
+def invalidar_exportacao(destino=PASTA_PARQUET):
+    """Itens foram trocados ou apagados no banco (ex: reprocessamento): a próxima exportação refaz tudo."""
+    with _trava_exportacao:
+        if not os.path.isdir(destino): return
+        estado = _ler_estado(destino)
+        estado["refazer"] = True
+        _gravar_estado(destino, estado)
+
+# ==============================================================================
+# ANÁLISES VETORIZADAS (ARROW)
+# ==============================================================================
+PERCENTIS = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+def carregar(dono_id, destino=PASTA_PARQUET, tipo=None, meses=None, colunas=None):
+    """
+    Tabela Arrow dos itens do usuário. Filtros de tipo e mês podam partições
+    inteiras (diretórios que nem são abertos).
+    """
+    if not os.path.isdir(destino):
+        return ESQUEMA.empty_table()
+    dataset = ds.dataset(destino, format="parquet", partitioning=PARTICOES, schema=ESQUEMA)
+    filtro = ds.field("dono_id") == dono_id
+    if tipo: filtro &= ds.field("tipo_componente") == tipo
+    if meses: filtro &= ds.field("mes").isin(list(meses))
+    return dataset.to_table(filter=filtro, columns=colunas)
+
+def categorias_exportadas(dono_id, destino=PASTA_PARQUET):
+    """Categorias com itens do usuário na base (só as colunas dono_id e tipo_componente são lidas)."""
+    tabela = carregar(dono_id, destino, colunas=["tipo_componente"])
+    return sorted(pc.unique(tabela["tipo_componente"]).drop_null().to_pylist())
+
+def _com_preco(tabela):
+    return tabela.filter(pc.greater(tabela["preco"], 0))
+
+def percentis_por_componente(tabela, percentis=PERCENTIS, min_amostras=1):
+    """Percentis (t-digest), média, mínimo e máximo do preço estimado por componente normalizado."""
+    tabela = _com_preco(tabela)
+    agregado = tabela.group_by(["tipo_componente", "componente"]).aggregate([
+        ("preco", "count"),
+        ("preco", "tdigest", pc.TDigestOptions(q=list(percentis))),
+        ("preco", "mean"),
+        ("preco", "min"),
+        ("preco", "max"),
+    ])
+    agregado = agregado.filter(pc.greater_equal(agregado["preco_count"], min_amostras))
+    quantis = agregado["preco_tdigest"].combine_chunks().flatten()
+    colunas = {
+        "Categoria": agregado["tipo_componente"],
+        "Componente": agregado["componente"],
+        "Amostras": agregado["preco_count"],
+    }
+    for i, p in enumerate(percentis):
+        # flatten() intercala os quantis de cada linha: pega o i-ésimo de cada grupo
+        colunas[f"p{int(p * 100)}"] = pc.take(quantis, pa.array(range(i, len(quantis), len(percentis)), pa.int64()))
+    colunas.update({"Media": agregado["preco_mean"], "Min": agregado["preco_min"], "Max": agregado["preco_max"]})
+    return pa.table(colunas).sort_by([("Amostras", "descending")]).to_pandas()
+
+def tendencia_mensal(tabela, componentes=None):
+    """Mediana e volume mensais por componente, mais a variação entre o primeiro e o último mês."""
+    tabela = _com_preco(tabela)
+    if componentes:
+        tabela = tabela.filter(pc.is_in(tabela["componente"], pa.array(list(componentes))))
+    mensal = tabela.group_by(["componente", "mes"]).aggregate([
+        ("preco", "approximate_median"),
+        ("preco", "count"),
+    ]).rename_columns(["componente", "mes", "mediana", "amostras"]).sort_by([("componente", "ascending"), ("mes", "ascending")])
+    df = mensal.to_pandas()
+    if df.empty:
+        df["variacao"] = []
+        return df
+    primeira = df.groupby("componente")["mediana"].transform("first")
+    df["variacao"] = df["mediana"] / primeira - 1
+    return df
+
+def detectar_outliers(tabela, fator=1.5, min_amostras=5):
+    """
+    Itens com preço fora de [Q1 - fator*IQR, Q3 + fator*IQR] do seu componente
+    (só componentes com amostras suficientes para o quartil fazer sentido).
+    """
+    tabela = _com_preco(tabela)
+    quartis = tabela.group_by("componente").aggregate([
+        ("preco", "tdigest", pc.TDigestOptions(q=[0.25, 0.75])),
+        ("preco", "count"),
+    ])
+    quartis = quartis.filter(pc.greater_equal(quartis["preco_count"], min_amostras))
+    q = quartis["preco_tdigest"].combine_chunks().flatten()
+    q1 = pc.take(q, pa.array(range(0, len(q), 2), pa.int64()))
+    q3 = pc.take(q, pa.array(range(1, len(q), 2), pa.int64()))
+    iqr = pc.subtract(q3, q1)
+    faixas = pa.table({
+        "componente": quartis["componente"],
+        "limite_inferior": pc.subtract(q1, pc.multiply(iqr, fator)),
+        "limite_superior": pc.add(q3, pc.multiply(iqr, fator)),
+        "mediana_q": pc.divide(pc.add(q1, q3), 2),
+    })
+    juntos = tabela.join(faixas, "componente", join_type="inner")
+    fora = pc.or_(pc.less(juntos["preco"], juntos["limite_inferior"]),
+                  pc.greater(juntos["preco"], juntos["limite_superior"]))
+    achados = juntos.filter(fora)
+    return achados.select(["nome_arquivo", "tipo_componente", "componente", "preco",
+                           "limite_inferior", "limite_superior"]).sort_by([("componente", "ascending")]).to_pandas()
+
+# ==============================================================================
+# EXECUÇÃO DIRETA
+# ==============================================================================
+# python analise_precos.py exportar [--completo]
+# python analise_precos.py percentis --user 1 [--tipo ram]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Base analítica de preços (Parquet)")
+    parser.add_argument("comando", choices=["exportar", "percentis", "outliers"])
+    parser.add_argument("--user", type=int, help="ID do usuário (percentis/outliers)")
+    parser.add_argument("--tipo", default=None, help="Categoria (ex: ram, processador)")
+    parser.add_argument("--completo", action="store_true", help="Reconstrói a exportação do zero")
+    parser.add_argument("--destino", default=PASTA_PARQUET)
+    args = parser.parse_args()
+
+    if args.comando == "exportar":
+        r = exportar_parquet(args.destino, completo=args.completo)
+        print(f"✅ {r['linhas']} itens exportados para {args.destino}.")
+        sys.exit(0)
+
+    if args.user is None:
+        parser.error("--user é obrigatório para análises")
+    tabela = carregar(args.user, args.destino, tipo=args.tipo)
+    df = percentis_por_componente(tabela) if args.comando == "percentis" else detectar_outliers(tabela)
+    print(df.head(40).to_string(index=False))
@@ -1,10 +1,19 @@
+import os
 import streamlit as st
 import sqlite3
-import pandas as pd
 import hashlib
-import os
-import altair as alt
-from main import extrair_dados_pdf, salvar_no_banco
+import inspect
+import importlib
+import threading
+import banco
+import fila
+import geracoes
+from setup_banco import garantir_schema
+# pandas, altair, pyarrow (analise_precos), consultas e catalogo ficam fora do
+# topo: a tela de login não carrega nenhum deles (ver PRÉ-AQUECIMENTO abaixo)
+
+# E-mails que enxergam o painel de desempenho de todos os usuários (separados por vírgula)
+ADMINS = {e.strip().lower() for e in os.environ.get("LICITACLOUD_ADMINS", "").split(",") if e.strip()}
 
 # ==============================================================================
 # CONFIGURAÇÃO VISUAL E CSS
@@ -27,66 +36,127 @@ st.markdown("""
 # ==============================================================================
 # FUNÇÕES DE BANCO E SEGURANÇA
 # ==============================================================================
-def get_conexao():
-    return sqlite3.connect("licitacloud.db")
-
+# Conexões sempre emprestadas do pool do processo (banco.py), compartilhado por
+# todas as sessões do servidor: nada de abrir e fechar conexão a cada chamada.
 def criar_hash(senha):
     return hashlib.sha256(senha.encode()).hexdigest()
 
 def verificar_login(email, senha):
-    conn = get_conexao()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, nome, senha_hash FROM usuarios WHERE email = ?", (email,))
-    usuario = cursor.fetchone()
-    conn.close()
+    usuario = buscar_usuario(email, geracoes.geracao("usuarios"))
     if usuario and usuario[2] == criar_hash(senha):
-        return {"id": usuario[0], "nome": usuario[1]}
+        return {"id": usuario[0], "nome": usuario[1], "admin": email.strip().lower() in ADMINS}
     return None
 
 def criar_usuario(nome, email, senha):
-    conn = get_conexao()
-    cursor = conn.cursor()
     try:
-        cursor.execute("INSERT INTO usuarios (nome, email, senha_hash) VALUES (?, ?, ?)", 
-                       (nome, email, criar_hash(senha)))
-        conn.commit()
-        return True
+        with banco.transacao() as conn:
+            conn.execute("INSERT INTO usuarios (nome, email, senha_hash) VALUES (?, ?, ?)",
+                         (nome, email, criar_hash(senha)))
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
+    geracoes.invalidar("usuarios")
+    return True
 
 def cadastrar_produto(dono_id, nome, tags, custo, venda):
-    conn = get_conexao()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO catalogo_produtos (dono_id, nome_produto, tags_match, custo_unitario, preco_venda)
-        VALUES (?, ?, ?, ?, ?)
-    """, (dono_id, nome, tags.lower(), custo, venda))
-    conn.commit()
-    conn.close()
-
-def buscar_produto_compativel(item_edital, df_produtos):
-    if df_produtos.empty or not item_edital:
-        return "Sem Match", 0.0, 0.0
-    item_texto = str(item_edital).lower()
-    for _, produto in df_produtos.iterrows():
-        tags = produto['tags_match'].split(',')
-        match = False
-        for tag in tags:
-            tag_limpa = tag.strip()
-            if len(tag_limpa) > 1 and tag_limpa in item_texto:
-                match = True
-                break
-        if match:
-            margem = produto['preco_venda'] - produto['custo_unitario']
-            return produto['nome_produto'], produto['preco_venda'], margem
-    return None, 0.0, 0.0
+    from catalogo import atualizar_matches_do_produto
+    with banco.transacao(dono_id) as conn:
+        cursor = conn.execute("""
+            INSERT INTO catalogo_produtos (dono_id, nome_produto, tags_match, custo_unitario, preco_venda)
+            VALUES (?, ?, ?, ?, ?)
+        """, (dono_id, nome, tags.lower(), custo, venda))
+        # Só os itens com alguma tag do produto novo têm o match refeito (mesma transação)
+        atualizar_matches_do_produto(conn, dono_id, cursor.lastrowid)
+    geracoes.invalidar("catalogo", dono_id)
+
+# ==============================================================================
+# LEITURAS EM CACHE (INVALIDADAS PELAS ESCRITAS)
+# ==============================================================================
+# A geração do dado (ver geracoes.py) faz parte da chave: enquanto ninguém
+# escrever, um rerun (trocar o contrato, paginar, buscar de novo) não abre o
+# banco. max_entries e ttl limitam a memória ocupada pelo cache.
+CACHE_LEITURAS_MAX = 256
+CACHE_LEITURAS_TTL = 3600
+
+CONSULTAS_EM_CACHE = {"listar_produtos", "listar_licitacoes", "kpis_licitacao", "histograma_categorias",
+                      "lucro_potencial", "pagina_itens", "buscar_nos_editais"}
+
+@st.cache_data(max_entries=CACHE_LEITURAS_MAX, ttl=CACHE_LEITURAS_TTL, show_spinner=False)
+def _ler_em_cache(nome_consulta, geracao, *args):
+    import consultas
+    consulta = getattr(consultas, nome_consulta)
+    # Toda consulta do dashboard recebe dono_id: no modo particionado ele escolhe o arquivo
+    dono_id = inspect.signature(consulta).bind(None, *args).arguments["dono_id"]
+    with banco.conexao(dono_id) as conn:
+        return consulta(conn, *args)
+
+def ler(nome_consulta, geracao, *args):
+    """Roda uma função de consultas.py (pelo nome: o módulo só é importado no miss) pelo cache."""
+    if nome_consulta not in CONSULTAS_EM_CACHE:
+        raise ValueError(f"Consulta sem cache: {nome_consulta}")
+    return _ler_em_cache(nome_consulta, geracao, *args)
+
+@st.cache_data(max_entries=CACHE_LEITURAS_MAX, ttl=CACHE_LEITURAS_TTL, show_spinner=False)
+def buscar_usuario(email, geracao):
+    with banco.conexao() as conn:
+        return conn.execute("SELECT id, nome, senha_hash FROM usuarios WHERE email = ?", (email,)).fetchone()
+
+@st.cache_data(max_entries=CACHE_LEITURAS_MAX, ttl=CACHE_LEITURAS_TTL, show_spinner=False)
+def itens_com_sugestao(id_lic, dono_id, pagina, ger_lic, ger_cat, ger_ref):
+    """Uma página da tabela com o produto sugerido (matches_produto), os totais e a referência de mercado."""
+    from consultas import referencias_dos_itens
+    # O produto sugerido muda com o catálogo: as duas gerações entram na chave
+    itens_pag = ler("pagina_itens", (ger_lic, ger_cat), id_lic, dono_id, pagina)
+    with banco.conexao() as conn:
+        itens_pag[['Ref. Mercado', 'Amostras Mercado']] = referencias_dos_itens(conn, itens_pag)
+    itens_pag['vs Mercado'] = (itens_pag['preco_medio_edital'] / itens_pag['Ref. Mercado'] - 1).where(itens_pag['preco_medio_edital'] > 0)
+    itens_pag['Total Venda'] = itens_pag['Venda'] * itens_pag['quantidade_edital']
+    itens_pag['Total Lucro'] = itens_pag['Lucro'] * itens_pag['quantidade_edital']
+    return itens_pag
+
+@st.cache_data(max_entries=CACHE_LEITURAS_MAX, ttl=CACHE_LEITURAS_TTL, show_spinner="Atualizando base analítica...")
+def categorias_mercado(dono_id, ger_lic):
+    """Leva os itens novos para o Parquet (incremental) só quando a geração muda; categorias do usuário."""
+    import analise_precos
+    analise_precos.exportar_parquet()
+    return analise_precos.categorias_exportadas(dono_id)
+
+@st.cache_data(max_entries=CACHE_LEITURAS_MAX, ttl=CACHE_LEITURAS_TTL, show_spinner=False)
+def analise_mercado(dono_id, categoria, ger_lic):
+    """Percentis, tendência e outliers de uma categoria (Parquet, exportado incrementalmente antes)."""
+    import analise_precos
+    analise_precos.exportar_parquet()
+    tabela = analise_precos.carregar(dono_id, tipo=categoria,
+                                     colunas=["nome_arquivo", "tipo_componente", "componente", "preco", "mes"])
+    return (analise_precos.percentis_por_componente(tabela),
+            analise_precos.tendencia_mensal(tabela),
+            analise_precos.detectar_outliers(tabela))
+
+# ==============================================================================
+# PRÉ-AQUECIMENTO (MÓDULOS DAS TELAS EM SEGUNDO PLANO)
+# ==============================================================================
+# Logo depois do login uma thread importa o que as telas vão usar, enquanto o
+# usuário ainda olha o menu; a tela que chegar antes só espera o que falta (o
+# Python nunca importa o mesmo módulo duas vezes). Uma vez por processo do
+# servidor. LICITACLOUD_PREAQUECER=0 desliga (cada tela importa na hora).
+PREAQUECER = os.environ.get("LICITACLOUD_PREAQUECER", "1") != "0"
+MODULOS_DAS_TELAS = ("pandas", "consultas", "catalogo", "altair", "analise_precos")
+
+@st.cache_resource(show_spinner=False)
+def preaquecer():
+    def importar():
+        for nome in MODULOS_DAS_TELAS:
+            importlib.import_module(nome)
+    thread = threading.Thread(target=importar, name="preaquecimento", daemon=True)
+    thread.start()
+    return thread
 
 # ==============================================================================
 # INTERFACE DO USUÁRIO
 # ==============================================================================
 
+garantir_schema() # Atualiza bancos antigos na primeira execução do processo
+fila.garantir_pool() # Workers da fila local (um pool por servidor, não por aba)
+
 if "usuario_logado" not in st.session_state:
     st.session_state["usuario_logado"] = None
 
@@ -106,6 +176,7 @@ if st.session_state["usuario_logado"] is None:
                 usuario = verificar_login(email_login, senha_login)
                 if usuario:
                     st.session_state["usuario_logado"] = usuario
+                    if PREAQUECER: preaquecer()
                     st.rerun()
                 else:
                     st.error("Credenciais inválidas.")
@@ -123,13 +194,17 @@ if st.session_state["usuario_logado"] is None:
 # --- DASHBOARD LOGADO ---
 else:
     usuario = st.session_state["usuario_logado"]
-    conn = get_conexao()
+    # Gerações lidas uma vez por rerun (stat de arquivo, sem SQL)
+    ger_lic = geracoes.geracao("licitacoes", usuario['id'])
+    ger_cat = geracoes.geracao("catalogo", usuario['id'])
+    ger_ref = geracoes.geracao("referencias")
+    if PREAQUECER: preaquecer() # Sessão que já estava logada quando o servidor reiniciou
     
     with st.sidebar:
         st.markdown(f"### Olá, {usuario['nome']}")
         st.caption("LicitaCloud v1.3 (Pro)")
         st.divider()
-        menu = st.radio("Menu", ["📊 Dashboard Executivo", "📦 Produtos & Preços", "📂 Processar Edital"])
+        menu = st.radio("Menu", ["📊 Dashboard Executivo", "🔎 Buscar nos Editais", "📦 Produtos & Preços", "📂 Processar Edital", "📈 Preços de Mercado", "🩺 Desempenho"])
         st.divider()
         if st.button("Sair", use_container_width=True):
             st.session_state["usuario_logado"] = None
@@ -138,38 +213,42 @@ else:
     # --- MENU: UPLOAD MÚLTIPLO ---
     if menu == "📂 Processar Edital":
         st.title("📂 Processamento em Lote")
-        st.markdown("Arraste **um ou vários** editais (PDF) para a IA processar de uma vez.")
+        st.markdown("Arraste **um ou vários** editais (PDF). Eles entram na fila e são processados em segundo plano: pode navegar ou atualizar a página à vontade.")
         
         uploaded_files = st.file_uploader("Selecione os arquivos", type="pdf", accept_multiple_files=True)
         
         if uploaded_files:
             qtd = len(uploaded_files)
             if st.button(f"🚀 Processar {qtd} Editais", type="primary"):
-                prog_bar = st.progress(0)
-                log_box = st.expander("Logs de Processamento", expanded=True)
-                sucessos = 0
-                
-                for i, file in enumerate(uploaded_files):
-                    prog_bar.progress((i + 1) / qtd)
-                    try:
-                        temp = f"temp_{file.name}"
-                        with open(temp, "wb") as f: f.write(file.getbuffer())
-                        
-                        dados = extrair_dados_pdf(temp)
-                        if any(dados.values()):
-                            salvar_no_banco(file.name, dados, usuario['id'])
-                            log_box.write(f"✅ **{file.name}**: Processado!")
-                            sucessos += 1
-                        else:
-                            log_box.warning(f"⚠️ **{file.name}**: Sem itens de T.I.")
-                        
-                        if os.path.exists(temp): os.remove(temp)
-                    except Exception as e:
-                        log_box.error(f"❌ Erro em {file.name}: {e}")
-                
-                if sucessos > 0:
-                    st.balloons()
-                    st.success("Processamento Finalizado!")
+                for file in uploaded_files:
+                    fila.enfileirar(usuario['id'], file.name, file.getbuffer())
+                st.success(f"{qtd} editais na fila!")
+
+        # Painel da fila: se redesenha sozinho enquanto houver job em andamento
+        @st.fragment(run_every=2)
+        def painel_jobs():
+            import pandas as pd
+            jobs = pd.DataFrame(fila.listar_jobs(usuario['id']))
+            if jobs.empty:
+                st.info("Nenhum edital enviado ainda.")
+                return
+            ativos = jobs['status'].isin([fila.NA_FILA, fila.PROCESSANDO]).sum()
+            st.subheader(f"Fila ({ativos} em andamento)" if ativos else "Fila")
+            jobs['progresso'] = (jobs['paginas_lidas'] / jobs['total_paginas'].where(jobs['total_paginas'] > 0)).fillna(0.0)
+            jobs.loc[jobs['status'] == fila.CONCLUIDO, 'progresso'] = 1.0
+            st.dataframe(
+                jobs[['id', 'nome_arquivo', 'status', 'progresso', 'itens', 'duracao_s', 'erro', 'criado_em']],
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "id": "Job",
+                    "nome_arquivo": "Edital",
+                    "progresso": st.column_config.ProgressColumn("Páginas", min_value=0.0, max_value=1.0),
+                    "duracao_s": st.column_config.NumberColumn("Tempo", format="%.1f s"),
+                    "erro": "Observação",
+                }
+            )
+        painel_jobs()
 
     # --- MENU: CATÁLOGO ---
     elif menu == "📦 Produtos & Preços":
@@ -185,42 +264,129 @@ else:
             st.success("Salvo!")
             st.rerun()
             
-        df_prods = pd.read_sql_query("SELECT * FROM catalogo_produtos WHERE dono_id=?", conn, params=(usuario['id'],))
+        df_prods = ler("listar_produtos", ger_cat, usuario['id'])
         if not df_prods.empty:
             st.dataframe(df_prods[['nome_produto', 'tags_match', 'custo_unitario', 'preco_venda']], use_container_width=True)
         else:
             st.info("Cadastre produtos para habilitar cálculos de lucro.")
 
+    # --- MENU: BUSCA TEXTUAL ---
+    elif menu == "🔎 Buscar nos Editais":
+        st.title("🔎 Buscar nos Editais")
+        termo = st.text_input("O que você procura?", placeholder="Ex: ryzen 7 5700, switch 24 portas, nobreak")
+        if termo:
+            achados = ler("buscar_nos_editais", ger_lic, usuario['id'], termo)
+            if achados.empty:
+                st.info("Nada encontrado nos seus editais.")
+            else:
+                st.caption(f"{len(achados)} itens encontrados")
+                st.dataframe(
+                    achados,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={"Preco": st.column_config.NumberColumn("Preço Estimado", format="R$ %.2f")}
+                )
+
+    # --- MENU: PREÇOS DE MERCADO (BASE ANALÍTICA EM PARQUET) ---
+    elif menu == "📈 Preços de Mercado":
+        st.title("📈 Preços de Mercado")
+        st.caption("Preços estimados em todos os seus editais, por componente (mesma peça escrita de formas diferentes é agrupada).")
+        categorias = categorias_mercado(usuario['id'], ger_lic)
+        if not categorias:
+            st.info("Nenhum item processado ainda.")
+        else:
+            categoria = st.selectbox("Categoria", categorias)
+            percentis, tendencia, outliers = analise_mercado(usuario['id'], categoria, ger_lic)
+            if percentis.empty:
+                st.info("Nenhum item com preço nesta categoria.")
+            else:
+                formato_preco = {c: st.column_config.NumberColumn(format="R$ %.2f")
+                                 for c in ["p10", "p25", "p50", "p75", "p90", "Media", "Min", "Max"]}
+                st.dataframe(percentis.drop(columns="Categoria"), use_container_width=True, hide_index=True,
+                             column_config={**formato_preco, "p50": st.column_config.NumberColumn("Mediana", format="R$ %.2f")})
+
+                col_t, col_o = st.columns(2)
+                with col_t:
+                    st.subheader("Tendência mensal")
+                    componente = st.selectbox("Componente", percentis['Componente'])
+                    serie = tendencia[tendencia['componente'] == componente]
+                    import altair as alt
+                    grafico = alt.Chart(serie).mark_line(point=True).encode(
+                        x=alt.X('mes', title='Mês'), y=alt.Y('mediana', title='Mediana (R$)'), tooltip=['mes', 'mediana', 'amostras'])
+                    st.altair_chart(grafico, use_container_width=True)
+                    if len(serie) > 1:
+                        st.caption(f"Variação desde {serie['mes'].iloc[0]}: {serie['variacao'].iloc[-1]:+.1%}")
+                with col_o:
+                    st.subheader(f"Preços fora da curva ({len(outliers)})")
+                    st.dataframe(outliers, use_container_width=True, hide_index=True, column_config={
+                        "preco": st.column_config.NumberColumn("Preço", format="R$ %.2f"),
+                        "limite_inferior": st.column_config.NumberColumn("Mín. esperado", format="R$ %.2f"),
+                        "limite_superior": st.column_config.NumberColumn("Máx. esperado", format="R$ %.2f"),
+                    })
+
+    # --- MENU: DESEMPENHO DO PROCESSAMENTO ---
+    elif menu == "🩺 Desempenho":
+        st.title("🩺 Desempenho do Processamento")
+        todos = usuario.get('admin') and st.toggle("Todos os usuários (admin)", value=True)
+        dono_filtro = None if todos else usuario['id']
+
+        # Sem cache: painel de diagnóstico, lido sempre fresco
+        from consultas import arquivos_mais_lentos, padroes_mais_lentos, paginas_mais_lentas
+        with banco.conexao() as conn:
+            arquivos = arquivos_mais_lentos(conn, dono_filtro)
+            padroes = padroes_mais_lentos(conn, dono_filtro)
+            paginas = paginas_mais_lentas(conn, dono_filtro)
+        if arquivos.empty:
+            st.info("Nenhum edital processado com métricas ainda.")
+        else:
+            st.subheader("Editais mais lentos")
+            st.caption("Tempo total e por estágio, em segundos.")
+            st.dataframe(arquivos, use_container_width=True, hide_index=True,
+                         column_config={"Total": st.column_config.NumberColumn(format="%.2f s")})
+
+            col_p1, col_p2 = st.columns(2)
+            with col_p1:
+                st.subheader("Padrões mais caros")
+                st.dataframe(padroes, use_container_width=True, hide_index=True, column_config={
+                    "Segundos": st.column_config.NumberColumn(format="%.3f s"),
+                    "us_por_linha": st.column_config.NumberColumn("µs/linha", format="%.1f"),
+                })
+            with col_p2:
+                st.subheader("Páginas mais lentas")
+                st.dataframe(paginas, use_container_width=True, hide_index=True,
+                             column_config={"Segundos": st.column_config.NumberColumn(format="%.2f s")})
+
+        if usuario.get('admin'):
+            st.subheader("Conexões com o banco (este servidor)")
+            pool = banco.metricas()
+            col_b1, col_b2, col_b3, col_b4 = st.columns(4)
+            col_b1.metric("Conexões em uso", f"{pool['abertas'] - pool['livres']}/{pool['tamanho']}")
+            col_b2.metric("Espera por conexão", f"{pool['espera_pool_media_s'] * 1000:.1f} ms",
+                          help=f"Máxima: {pool['espera_pool_max_s'] * 1000:.0f} ms · {pool['esperas_pool']} esperas")
+            col_b3.metric("Espera por lock de escrita", f"{pool['espera_lock_media_s'] * 1000:.1f} ms",
+                          help=f"Máxima: {pool['espera_lock_max_s'] * 1000:.0f} ms em {pool['transacoes']} transações")
+            col_b4.metric("Bloqueios", pool['bloqueios'] + pool['esgotamentos'],
+                          help="Erros 'database is locked' + pedidos que esgotaram a espera do pool")
+
     # --- MENU: DASHBOARD (CORRIGIDO) ---
     elif menu == "📊 Dashboard Executivo":
         st.title("📊 Visão Geral")
         
-        df_lic = pd.read_sql_query("SELECT * FROM licitacoes WHERE dono_id=? ORDER BY id DESC", conn, params=(usuario['id'],))
-        df_itens = pd.read_sql_query("SELECT * FROM itens_extraidos", conn)
-        df_prods = pd.read_sql_query("SELECT * FROM catalogo_produtos WHERE dono_id=?", conn, params=(usuario['id'],))
+        df_lic = ler("listar_licitacoes", ger_lic, usuario['id'])
 
         if not df_lic.empty:
-            sel = st.selectbox("Contrato:", df_lic['nome_arquivo'].unique())
-            id_lic = df_lic[df_lic['nome_arquivo'] == sel]['id'].values[0]
-            itens_lic = df_itens[df_itens['licitacao_id'] == id_lic].copy()
+            nomes = dict(zip(df_lic['id'], df_lic['nome_arquivo']))
+            id_lic = int(st.selectbox("Contrato:", df_lic['id'], format_func=lambda i: f"#{i} · {nomes[i]}"))
+            kpis = ler("kpis_licitacao", ger_lic, id_lic, usuario['id'])
             
-            if not itens_lic.empty:
-                # --- CORREÇÃO DO BUG AQUI ---
-                if not df_prods.empty:
-                    res = itens_lic['valor_encontrado'].apply(lambda x: pd.Series(buscar_produto_compativel(x, df_prods)))
-                    itens_lic[['Produto', 'Venda', 'Lucro']] = res
-                else:
-                    itens_lic['Produto'] = None
-                    itens_lic['Venda'] = 0.0 # <--- AQUI ESTAVA FALTANDO!
-                    itens_lic['Lucro'] = 0.0
+            if kpis["itens"] > 0:
+                lucro_total = ler("lucro_potencial", (ger_lic, ger_cat), id_lic, usuario['id'])
 
                 # KPIs
                 c1, c2, c3, c4 = st.columns(4)
-                c1.metric("Itens", len(itens_lic))
-                c2.metric("Categorias", itens_lic['tipo_componente'].nunique())
-                val_gov = (itens_lic['preco_medio_edital'] * itens_lic['quantidade_edital']).sum()
-                c3.metric("Estimativa Gov.", f"R$ {val_gov:,.2f}")
-                lucro_total = (itens_lic['Lucro'] * itens_lic['quantidade_edital']).sum()
+                c1.metric("Itens", kpis["itens"])
+                c2.metric("Categorias", kpis["categorias"])
+                c3.metric("Estimativa Gov.", f"R$ {kpis['val_gov']:,.2f}")
                 c4.metric("Lucro Potencial", f"R$ {lucro_total:,.2f}", delta=f"{lucro_total:,.2f}" if lucro_total > 0 else None)
 
                 st.divider()
@@ -229,30 +395,33 @@ else:
                 col_g1, col_g2 = st.columns(2)
                 with col_g1:
                     st.subheader("Categorias")
-                    chart_data = itens_lic['tipo_componente'].value_counts().reset_index()
-                    chart_data.columns = ['Categoria', 'Qtd']
+                    chart_data = ler("histograma_categorias", ger_lic, id_lic, usuario['id'])
+                    import altair as alt
                     c = alt.Chart(chart_data).mark_bar().encode(x='Qtd', y=alt.Y('Categoria', sort='-x'), color=alt.value('#00D4FF'))
                     st.altair_chart(c, use_container_width=True)
                 
                 with col_g2:
                     st.subheader("Análise Financeira")
+                    from consultas import ITENS_POR_PAGINA
+                    total_paginas = max(1, -(-kpis["itens"] // ITENS_POR_PAGINA))
+                    pagina = st.number_input(f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, value=1)
+                    itens_pag = itens_com_sugestao(id_lic, usuario['id'], int(pagina), ger_lic, ger_cat, ger_ref)
+
                     # Tabela detalhada
-                    display_df = itens_lic.copy()
-                    display_df['Total Venda'] = display_df['Venda'] * display_df['quantidade_edital']
-                    display_df['Total Lucro'] = display_df['Lucro'] * display_df['quantidade_edital']
-                    
                     st.dataframe(
-                        display_df[['tipo_componente', 'valor_encontrado', 'quantidade_edital', 'Produto', 'Total Lucro']],
+                        itens_pag[['tipo_componente', 'valor_encontrado', 'quantidade_edital', 'preco_medio_edital',
+                                   'Ref. Mercado', 'vs Mercado', 'Produto', 'Total Lucro']],
                         use_container_width=True,
                         hide_index=True,
                         column_config={
                             "Total Lucro": st.column_config.NumberColumn("Lucro", format="R$ %.2f"),
-                            "Produto": "Sugestão"
+                            "Produto": "Sugestão",
+                            "preco_medio_edital": st.column_config.NumberColumn("Estimativa", format="R$ %.2f"),
+                            "Ref. Mercado": st.column_config.NumberColumn("Mediana Mercado", format="R$ %.2f"),
+                            "vs Mercado": st.column_config.NumberColumn("vs Mercado", format="percent"),
                         }
                     )
             else:
                 st.warning("Sem itens técnicos.")
         else:
-            st.info("Nenhuma licitação processada.")
-            
-    conn.close()
\ No newline at end of file
+            st.info("Nenhuma licitação processada.")
\ No newline at end of file
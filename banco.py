@@ -0,0 +1,313 @@
+import os
+import time
+import argparse
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from setup_banco import CAMINHO_BANCO, garantir_schema
+
+# ==============================================================================
+# POOL DE CONEXÕES SQLITE (COMPARTILHADO ENTRE THREADS DO PROCESSO)
+# ==============================================================================
+# Cada processo (servidor Streamlit, worker da fila, CLI de ingestão) tem um
+# pool limitado de conexões já configuradas, emprestadas a uma thread por vez.
+# Escritas usam BEGIN IMMEDIATE: o lock de escrita é pedido no início (e
+# esperado pelo busy_timeout), em vez de uma leitura tentar virar escrita no
+# meio da transação e falhar na hora com 'database is locked'.
+TAMANHO_POOL = int(os.environ.get("LICITACLOUD_POOL", "8"))
+ESPERA_POOL_S = 30.0     # Máximo esperando uma conexão livre do pool
+ESPERA_LOCK_S = 30.0     # busy_timeout: máximo esperando o lock de outro processo/conexão
+CACHE_COMANDOS = 256     # Comandos preparados guardados por conexão (sqlite3 cached_statements)
+
+class PoolConexoes:
+    def __init__(self, caminho=CAMINHO_BANCO, tamanho=TAMANHO_POOL, espera_max=ESPERA_POOL_S):
+        self.caminho = caminho
+        self.tamanho = tamanho
+        self.espera_max = espera_max
+        self._livres = queue.LifoQueue() # A última devolvida é a mais "quente" (cache de comandos)
+        self._abertas = 0
+        self._trava = threading.Lock()
+        self._metricas = {
+            "emprestimos": 0, "esperas_pool": 0, "esgotamentos": 0, "espera_pool_s": 0.0, "espera_pool_max_s": 0.0,
+            "transacoes": 0, "espera_lock_s": 0.0, "espera_lock_max_s": 0.0, "bloqueios": 0,
+        }
+
+    def _abrir(self):
+        # check_same_thread=False: a conexão passa de thread em thread, mas só uma a usa por vez
+        conexao = sqlite3.connect(self.caminho, check_same_thread=False, cached_statements=CACHE_COMANDOS)
+        conexao.execute(f"PRAGMA busy_timeout={int(ESPERA_LOCK_S * 1000)}")
+        conexao.execute("PRAGMA journal_mode=WAL")     # Leitores não travam o escritor (e vice-versa)
+        conexao.execute("PRAGMA synchronous=NORMAL")   # fsync só no checkpoint do WAL
+        return conexao
+
+    def _somar(self, **valores):
+        with self._trava:
+            for chave, valor in valores.items():
+                if chave.endswith("_max_s"): self._metricas[chave] = max(self._metricas[chave], valor)
+                else: self._metricas[chave] += valor
+
+    def _pegar(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = self._livres.get_nowait()
+        except queue.Empty:
+            with self._trava:
+                abrir = self._abertas < self.tamanho
+                if abrir: self._abertas += 1
+            if abrir:
+                try:
+                    conexao = self._abrir()
+                except sqlite3.Error:
+                    with self._trava: self._abertas -= 1
+                    raise
+            else:
+                self._somar(esperas_pool=1)
+                try:
+                    conexao = self._livres.get(timeout=self.espera_max)
+                except queue.Empty:
+                    self._somar(esgotamentos=1)
+                    raise sqlite3.OperationalError(
+                        f"pool de conexões esgotado ({self.tamanho} em uso por mais de {self.espera_max:.0f}s)")
+        espera = time.perf_counter() - inicio
+        self._somar(emprestimos=1, espera_pool_s=espera, espera_pool_max_s=espera)
+        return conexao
+
+    def _devolver(self, conexao):
+        try:
+            if conexao.in_transaction: conexao.rollback() # Ninguém herda transação pela metade
+        except sqlite3.Error:
+            conexao.close() # Conexão quebrada sai do pool; outra é aberta quando precisar
+            with self._trava: self._abertas -= 1
+            return
+        self._livres.put(conexao)
+
+    def _contar_bloqueio(self, erro):
+        if isinstance(erro, sqlite3.OperationalError) and ("locked" in str(erro) or "busy" in str(erro)):
+            self._somar(bloqueios=1)
+
+    @contextmanager
+    def conexao(self):
+        """Empresta uma conexão (leituras ou controle manual da transação). Não aninhar na mesma thread."""
+        conexao = self._pegar()
+        try:
+            yield conexao
+        except sqlite3.Error as e:
+            self._contar_bloqueio(e)
+            raise
+        finally:
+            self._devolver(conexao)
+
+    @contextmanager
+    def transacao(self, imediata=True):
+        """Conexão com transação aberta: commit no final, rollback se qualquer coisa falhar."""
+        with self.conexao() as conexao:
+            inicio = time.perf_counter()
+            conexao.execute("BEGIN IMMEDIATE" if imediata else "BEGIN")
+            espera = time.perf_counter() - inicio # Tempo parado esperando o lock de escrita
+            self._somar(transacoes=1, espera_lock_s=espera, espera_lock_max_s=espera)
+            try:
+                yield conexao
+                conexao.commit()
+            except BaseException:
+                conexao.rollback()
+                raise
+
+    def fechar_se_ocioso(self):
+        """Fecha as conexões se nenhuma estiver emprestada (True). Com alguma em uso não mexe (False)."""
+        with self._trava:
+            if self._livres.qsize() < self._abertas: return False
+            while True:
+                try:
+                    self._livres.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._abertas -= 1
+            return True
+
+    def metricas(self):
+        with self._trava:
+            dados = dict(self._metricas)
+            dados.update(tamanho=self.tamanho, abertas=self._abertas, livres=self._livres.qsize())
+        dados["espera_pool_media_s"] = dados["espera_pool_s"] / dados["emprestimos"] if dados["emprestimos"] else 0.0
+        dados["espera_lock_media_s"] = dados["espera_lock_s"] / dados["transacoes"] if dados["transacoes"] else 0.0
+        return dados
+
+# ==============================================================================
+# PARTICIONAMENTO POR USUÁRIO (OPCIONAL: LICITACLOUD_PARTICAO=dono)
+# ==============================================================================
+# O SQLite só tem um escritor por arquivo. No modo "dono", os dados de cada
+# usuário (TABELAS_DO_DONO e a busca FTS, que vem junto por trigger) ficam num
+# arquivo próprio em <banco>.donos/, e o lote de 200 editais de um cliente não
+# segura a gravação nem a leitura dos outros. No banco compartilhado ficam
+# usuários, fila, cache de extração, métricas e as referências de mercado.
+# Todo arquivo recebe o schema completo (mesmas migrações); cada um só usa as suas tabelas.
+# Para passar um banco existente para o modo "dono": python banco.py particionar
+PARTICAO = os.environ.get("LICITACLOUD_PARTICAO", "unico")
+TABELAS_DO_DONO = ("licitacoes", "itens_extraidos", "catalogo_produtos", "ingestao_arquivos", "matches_produto")
+
+def particionado():
+    return PARTICAO == "dono"
+
+def pasta_donos():
+    return f"{CAMINHO_BANCO}.donos"
+
+def caminho_do_dono(dono_id):
+    return os.path.join(pasta_donos(), f"dono-{int(dono_id)}.db")
+
+def donos_particionados():
+    """IDs dos usuários que já têm arquivo próprio."""
+    if not os.path.isdir(pasta_donos()):
+        return []
+    return sorted(int(nome[5:-3]) for nome in os.listdir(pasta_donos())
+                  if nome.startswith("dono-") and nome.endswith(".db"))
+
+def _caminho(dono_id):
+    if dono_id is None or not particionado():
+        return CAMINHO_BANCO
+    return caminho_do_dono(dono_id)
+
+# ==============================================================================
+# POOL PADRÃO DO PROCESSO
+# ==============================================================================
+# A chave inclui o pid: um processo filho (fork do pool de extração ou da fila)
+# nunca usa as conexões herdadas do pai, abre as suas.
+# Pools de usuário ficam em ordem de uso (LRU): passando de MAX_POOLS_DONOS, os
+# menos usados que estiverem ociosos são fechados (cada arquivo em WAL segura ~3
+# descritores por conexão). Um pool fechado é aberto de novo no próximo acesso.
+MAX_POOLS_DONOS = int(os.environ.get("LICITACLOUD_POOLS_DONOS", "32"))
+_pools = OrderedDict()
+_trava_pools = threading.Lock()
+_metricas_encerradas = {} # pid -> métricas somadas dos pools de usuário já fechados
+
+def _encerrar_ociosos(pid):
+    dos_donos = [chave for chave in _pools if chave[0] == pid and chave[1] != CAMINHO_BANCO]
+    excesso = len(dos_donos) - MAX_POOLS_DONOS
+    for chave in dos_donos: # Do menos para o mais recente
+        if excesso <= 0: break
+        if _pools[chave].fechar_se_ocioso():
+            dados = _pools.pop(chave).metricas()
+            encerradas = _metricas_encerradas.setdefault(pid, {})
+            for campo, valor in dados.items():
+                if campo in ("tamanho", "abertas", "livres") or campo.endswith("_media_s"): continue
+                encerradas[campo] = max(encerradas.get(campo, 0), valor) if campo.endswith("_max_s") else encerradas.get(campo, 0) + valor
+            excesso -= 1
+
+def obter_pool(dono_id=None):
+    """Pool do banco compartilhado ou (modo particionado) do arquivo do usuário."""
+    chave = (os.getpid(), _caminho(dono_id))
+    if chave[1] == CAMINHO_BANCO:
+        pool = _pools.get(chave)
+        if pool is not None: return pool
+    with _trava_pools:
+        pool = _pools.get(chave)
+        if pool is None:
+            if chave[1] != CAMINHO_BANCO: # Arquivo de usuário: criado e migrado no primeiro acesso
+                os.makedirs(pasta_donos(), exist_ok=True)
+                garantir_schema(chave[1])
+            pool = _pools[chave] = PoolConexoes(chave[1])
+        if chave[1] != CAMINHO_BANCO:
+            _pools.move_to_end(chave)
+            _encerrar_ociosos(chave[0])
+    return pool
+
+def conexao(dono_id=None):
+    """Sem dono_id: banco compartilhado. Com dono_id: onde ficam as TABELAS_DO_DONO desse usuário."""
+    return obter_pool(dono_id).conexao()
+
+def transacao(dono_id=None, imediata=True):
+    return obter_pool(dono_id).transacao(imediata)
+
+def metricas():
+    """Métricas somadas dos pools deste processo (espera por conexão e por lock, bloqueios)."""
+    pid = os.getpid()
+    with _trava_pools:
+        pools = [p for (pid_pool, _), p in _pools.items() if pid_pool == pid]
+    pools = pools or [obter_pool()]
+    total = dict(_metricas_encerradas.get(pid, {}))
+    for dados in (p.metricas() for p in pools):
+        for chave, valor in dados.items():
+            total[chave] = max(total.get(chave, 0), valor) if chave.endswith("_max_s") else total.get(chave, 0) + valor
+    total["espera_pool_media_s"] = total["espera_pool_s"] / total["emprestimos"] if total["emprestimos"] else 0.0
+    total["espera_lock_media_s"] = total["espera_lock_s"] / total["transacoes"] if total["transacoes"] else 0.0
+    total["arquivos"] = len(pools)
+    return total
+
+# ==============================================================================
+# MIGRAÇÃO PARA O MODO PARTICIONADO (python banco.py particionar)
+# ==============================================================================
+# Copia as TABELAS_DO_DONO de cada usuário do banco compartilhado para o arquivo
+# dele, com os mesmos ids (jobs, métricas e checkpoints continuam apontando
+# certo), e só depois apaga da origem. Pode rodar de novo se for interrompida:
+# o que já foi copiado é ignorado (INSERT OR IGNORE pela chave primária).
+# Rode com o app e os workers parados; depois suba com LICITACLOUD_PARTICAO=dono.
+_FILTRO_DO_DONO = {
+    "licitacoes": "dono_id = ?",
+    "itens_extraidos": "licitacao_id IN (SELECT id FROM origem.licitacoes WHERE dono_id = ?)",
+    "catalogo_produtos": "dono_id = ?",
+    "ingestao_arquivos": "dono_id = ?",
+    "matches_produto": "licitacao_id IN (SELECT id FROM origem.licitacoes WHERE dono_id = ?)",
+}
+
+def particionar(apagar_origem=True):
+    """Retorna {dono_id: {tabela: linhas copiadas}}."""
+    garantir_schema()
+    origem = sqlite3.connect(CAMINHO_BANCO)
+    try:
+        donos = [linha[0] for linha in origem.execute(" UNION ".join(
+            f"SELECT DISTINCT dono_id FROM {t}" for t in ("licitacoes", "catalogo_produtos", "ingestao_arquivos")))]
+    finally:
+        origem.close()
+
+    copiados = {}
+    os.makedirs(pasta_donos(), exist_ok=True)
+    for dono_id in donos:
+        caminho = caminho_do_dono(dono_id)
+        garantir_schema(caminho)
+        destino = sqlite3.connect(caminho)
+        try:
+            destino.execute("ATTACH DATABASE ? AS origem", (CAMINHO_BANCO,))
+            copiados[dono_id] = {}
+            with destino: # Tudo do usuário numa transação só
+                for tabela in TABELAS_DO_DONO:
+                    # Colunas pelo nome: bancos adotados pela v1 podem ter outra ordem
+                    colunas = ", ".join(c[1] for c in destino.execute(f"PRAGMA main.table_info({tabela})"))
+                    cursor = destino.execute(f"""
+                        INSERT OR IGNORE INTO main.{tabela} ({colunas})
+                        SELECT {colunas} FROM origem.{tabela} WHERE {_FILTRO_DO_DONO[tabela]}
+                    """, (dono_id,))
+                    copiados[dono_id][tabela] = cursor.rowcount
+                # Índice de trechos não tem trigger de INSERT: refeito com os itens copiados
+                destino.execute("INSERT INTO busca_trechos (busca_trechos) VALUES ('rebuild')")
+            destino.execute("DETACH DATABASE origem")
+        finally:
+            destino.close()
+        print(f"   -> Usuário {dono_id}: " + ", ".join(f"{n} {t}" for t, n in copiados[dono_id].items()))
+
+    if apagar_origem and donos:
+        origem = sqlite3.connect(CAMINHO_BANCO, timeout=ESPERA_LOCK_S)
+        try:
+            with origem:
+                for dono_id in donos: # Só o que foi copiado; itens (e matches, por trigger) antes das licitações
+                    origem.execute("DELETE FROM itens_extraidos WHERE licitacao_id IN "
+                                   "(SELECT id FROM licitacoes WHERE dono_id = ?)", (dono_id,))
+                    for tabela in ("licitacoes", "catalogo_produtos", "ingestao_arquivos"):
+                        origem.execute(f"DELETE FROM {tabela} WHERE dono_id = ?", (dono_id,))
+        finally:
+            origem.close()
+    return copiados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Acesso ao banco do LicitaCloud")
+    parser.add_argument("comando", choices=["particionar"])
+    parser.add_argument("--manter-origem", action="store_true",
+                        help="Não apaga do banco compartilhado os dados copiados")
+    args = parser.parse_args()
+
+    print(f"--- Separando os dados de cada usuário em {pasta_donos()} ---")
+    copiados = particionar(apagar_origem=not args.manter_origem)
+    print(f"✅ {len(copiados)} usuários copiados, {len(donos_particionados())} com arquivo próprio. "
+          "Suba o app com LICITACLOUD_PARTICAO=dono.")
+    print("   Depois, com o modo ligado, refaça a base analítica: python analise_precos.py exportar --completo")
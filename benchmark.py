@@ -0,0 +1,542 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import sqlite3
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+import pandas as pd
+import pdfplumber
+
+import consultas
+from catalogo import buscar_produto_compativel, materializar_matches
+from gerador_editais import gerar_edital
+from setup_banco import CAMINHO_BANCO, migrar
+from main import (PATTERNS, MOTORES, MOTOR_PADRAO, normalizar_texto, escanear_linha, extrair_dados_pdf,
+                  processar_pagina, salvar_no_banco, salvar_em_lote, calcular_hash_pdf, reprocessar)
+
+# ==============================================================================
+# BENCHMARK DO SCANNER (LINHAS/SEGUNDO)
+# ==============================================================================
+# Linhas típicas de edital: a maioria é texto jurídico sem item de T.I.,
+# uma parte menor é linha de tabela com especificação técnica.
+LINHAS_RUIDO = [
+    "O licitante deverá apresentar a documentação exigida no item 8.3 deste Termo de Referência",
+    "A contratada responderá pelos danos causados diretamente à Administração ou a terceiros",
+    "Prazo de entrega: até 30 (trinta) dias corridos a contar do recebimento da nota de empenho",
+    "Dotação orçamentária conforme programa de trabalho e elemento de despesa indicado",
+    "A garantia mínima exigida é de 36 meses on-site, com atendimento em horário comercial",
+]
+LINHAS_ITEM = [
+    "10 Computador Processador i5-12400, memória 16 GB DDR4, SSD 512 GB R$ 4.250,00",
+    "5 Monitor LED de 24 pol Full HD 75hz Valor Unit: 980,00",
+    "2 Switch de 24 portas gerenciável, cabo UTP Cat6 R$ 2.100,00",
+    "3 Nobreak de 1.5 kVA senoidal com estabilizador R$ 1.890,00",
+    "20 Teclado USB ABNT2 e Mouse optico R$ 85,00",
+    "15 Licença Windows 11 Pro e Office 2021 R$ 1.200,00",
+]
+
+def gerar_linhas(total, proporcao_itens=0.1, semente=42):
+    """Gera um corpus determinístico de linhas já normalizadas."""
+    rnd = random.Random(semente)
+    linhas = []
+    for _ in range(total):
+        fonte = LINHAS_ITEM if rnd.random() < proporcao_itens else LINHAS_RUIDO
+        linhas.append(normalizar_texto(rnd.choice(fonte)))
+    return linhas
+
+def scan_legado(linha_clean):
+    """O laço antigo: re.search de cada padrão, um depois do outro."""
+    resultados = []
+    for categoria, regex in PATTERNS.items():
+        match = re.search(regex, linha_clean)
+        if match:
+            resultados.append((categoria, match))
+    return resultados
+
+def medir(funcao, linhas, repeticoes=3):
+    """Melhor tempo entre as repetições, em linhas por segundo."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for linha in linhas:
+            funcao(linha)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return len(linhas) / melhor
+
+def bench_scanner(total_linhas=50000):
+    linhas = gerar_linhas(total_linhas)
+
+    # Sanidade: os dois caminhos precisam achar exatamente a mesma coisa
+    for linha in linhas:
+        antigo = [(c, m.group(0)) for c, m in scan_legado(linha)]
+        novo = [(c, m.group(0)) for c, m in escanear_linha(linha)]
+        assert antigo == novo, f"Divergência na linha: {linha}"
+
+    legado = medir(scan_legado, linhas)
+    scanner = medir(escanear_linha, linhas)
+    return {"linhas": total_linhas, "legado_linhas_s": legado, "scanner_linhas_s": scanner, "ganho": scanner / legado}
+
+# ==============================================================================
+# BENCHMARK DO MODO PARALELO (PÁGINAS/SEGUNDO POR Nº DE WORKERS)
+# ==============================================================================
+def bench_paralelo(caminho_pdf, lista_workers=(1, 2, 4, 8)):
+    with pdfplumber.open(caminho_pdf) as pdf:
+        total_paginas = len(pdf.pages)
+
+    logging.getLogger("main").setLevel(logging.WARNING) # Sem log de progresso no meio da medição
+    resultados = []
+    referencia = None
+    for workers in lista_workers:
+        inicio = time.perf_counter()
+        dados = extrair_dados_pdf(caminho_pdf, workers=workers, usar_cache=False)
+        segundos = time.perf_counter() - inicio
+
+        # Todo nº de workers tem que devolver exatamente o resultado sequencial
+        if referencia is None: referencia = dados
+        assert dados == referencia, f"Resultado divergente com {workers} workers"
+
+        resultados.append({"workers": workers, "segundos": segundos, "paginas_s": total_paginas / segundos})
+    base = resultados[0]["segundos"]
+    for r in resultados:
+        r["speedup"] = base / r["segundos"]
+    return {"paginas": total_paginas, "execucoes": resultados}
+
+# ==============================================================================
+# BENCHMARK MULTIUSUÁRIO (GRAVAÇÕES CONCORRENTES, BANCO ÚNICO X UM ARQUIVO POR USUÁRIO)
+# ==============================================================================
+# Um processo por usuário, todos gravando lotes ao mesmo tempo (como vários
+# clientes subindo editais). O modo vai pela variável LICITACLOUD_PARTICAO,
+# lida por cada processo filho ao importar o banco.
+def _edital_sintetico(itens=60, semente=0):
+    """dados_extraidos de um edital (linhas de item passadas pelo scanner de verdade)."""
+    rnd = random.Random(semente)
+    dados = {}
+    texto = "\n".join(rnd.choice(LINHAS_ITEM) for _ in range(itens))
+    for categoria, item in processar_pagina(texto, 1):
+        dados.setdefault(categoria, []).append(item)
+    return dados
+
+def _gravar_como_usuario(pasta, dono_id, lotes, arquivos, largada, resultados):
+    os.chdir(pasta)
+    logging.disable(logging.CRITICAL)
+    import banco
+    banco.obter_pool(dono_id) # Arquivo do usuário criado e migrado antes da largada
+    lote = [(f"u{dono_id}_{i}.pdf", _edital_sintetico(semente=dono_id * 1000 + i)) for i in range(arquivos)]
+    linhas = sum(1 + sum(len(v) for v in dados.values()) for _, dados in lote)
+    latencias = []
+    largada.wait()
+    inicio = time.time()
+    for _ in range(lotes):
+        t = time.perf_counter()
+        if not salvar_em_lote(lote, dono_id):
+            resultados.put({"erro": f"usuário {dono_id}: lote não gravado"})
+            return
+        latencias.append(time.perf_counter() - t)
+    resultados.put({"inicio": inicio, "fim": time.time(), "linhas": linhas * lotes,
+                    "latencias": latencias, "pool": banco.metricas()})
+
+def bench_multiusuario(usuarios=8, lotes=10, arquivos=10, modos=("unico", "dono")):
+    import multiprocessing
+    contexto = multiprocessing.get_context("spawn") # Filho limpo: relê LICITACLOUD_PARTICAO
+    relatorio = {}
+    modo_original = os.environ.get("LICITACLOUD_PARTICAO")
+    try:
+        for modo in modos:
+            os.environ["LICITACLOUD_PARTICAO"] = modo
+            with tempfile.TemporaryDirectory() as pasta:
+                conexao = sqlite3.connect(os.path.join(pasta, CAMINHO_BANCO))
+                migrar(conexao, silencioso=True)
+                conexao.close()
+
+                largada, resultados = contexto.Barrier(usuarios), contexto.Queue()
+                processos = [contexto.Process(target=_gravar_como_usuario,
+                                              args=(pasta, dono_id, lotes, arquivos, largada, resultados))
+                             for dono_id in range(1, usuarios + 1)]
+                for p in processos: p.start()
+                medidas = [resultados.get() for _ in processos]
+                for p in processos: p.join()
+
+            erros = [m["erro"] for m in medidas if "erro" in m]
+            if erros: raise RuntimeError("; ".join(erros))
+            segundos = max(m["fim"] for m in medidas) - min(m["inicio"] for m in medidas)
+            latencias = sorted(l for m in medidas for l in m["latencias"])
+            relatorio[modo] = {
+                "linhas_s": sum(m["linhas"] for m in medidas) / segundos,
+                "lote_p50_ms": latencias[len(latencias) // 2] * 1000,
+                "lote_p95_ms": latencias[int(len(latencias) * 0.95)] * 1000,
+                "espera_lock_s": sum(m["pool"]["espera_lock_s"] for m in medidas),
+                "bloqueios": sum(m["pool"]["bloqueios"] for m in medidas),
+            }
+    finally:
+        if modo_original is None: os.environ.pop("LICITACLOUD_PARTICAO", None)
+        else: os.environ["LICITACLOUD_PARTICAO"] = modo_original
+    return {"usuarios": usuarios, "lotes": lotes, "arquivos": arquivos, "modos": relatorio}
+
+# ==============================================================================
+# COMPARAÇÃO DE MOTORES DE LEITURA (VELOCIDADE E DIFERENÇAS DE ITENS)
+# ==============================================================================
+def _itens_como_conjunto(dados):
+    return {(cat, item["desc"], item["qtd"], item["preco"], item["pagina"]) for cat, itens in dados.items() for item in itens}
+
+def comparar_motores(caminhos_pdf, motores=MOTORES, referencia="pdfplumber"):
+    """
+    Roda cada motor no mesmo corpus (sem cache) e compara item a item com o motor de referência.
+    """
+    logging.getLogger("main").setLevel(logging.WARNING)
+    total_paginas = 0
+    for caminho in caminhos_pdf:
+        with pdfplumber.open(caminho) as pdf:
+            total_paginas += len(pdf.pages)
+
+    resultados = {}
+    for motor in motores:
+        inicio = time.perf_counter()
+        por_arquivo = {caminho: _itens_como_conjunto(extrair_dados_pdf(caminho, usar_cache=False, motor=motor))
+                       for caminho in caminhos_pdf}
+        segundos = time.perf_counter() - inicio
+        resultados[motor] = {"segundos": segundos, "paginas_s": total_paginas / segundos, "arquivos": por_arquivo}
+
+    relatorio = {"paginas": total_paginas, "motores": {}}
+    base = resultados[referencia]["arquivos"]
+    for motor, r in resultados.items():
+        so_no_motor, so_na_referencia, itens = [], [], 0
+        for caminho, conjunto in r["arquivos"].items():
+            itens += len(conjunto)
+            so_no_motor += [(caminho,) + item for item in sorted(conjunto - base[caminho])]
+            so_na_referencia += [(caminho,) + item for item in sorted(base[caminho] - conjunto)]
+        relatorio["motores"][motor] = {
+            "segundos": r["segundos"], "paginas_s": r["paginas_s"], "itens": itens,
+            "so_no_motor": so_no_motor, "so_na_referencia": so_na_referencia,
+        }
+    return relatorio
+
+# ==============================================================================
+# TEMPO DE IMPORTAÇÃO (PARTIDA A FRIO)
+# ==============================================================================
+# Cada alvo é importado num interpretador novo com -X importtime; o que o
+# Python já carrega sozinho na partida (rodando "pass") é descontado. "app"
+# importado fora do servidor desenha a tela de login, que é justamente o que
+# o primeiro acesso espera.
+ALVOS_IMPORTACAO = {
+    "app_login": "import app",
+    "main": "import main",
+    "analise_precos": "import analise_precos",
+}
+
+def _ler_importtime(codigo, pasta):
+    """{módulo: (self_us, cumulativo_us, nível)} de um interpretador novo rodando o código."""
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    env = {**os.environ, "PYTHONPATH": raiz, "LICITACLOUD_WORKERS": "0", "LICITACLOUD_PREAQUECER": "0"}
+    saida = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], cwd=pasta, env=env,
+                           capture_output=True, text=True, check=True).stderr
+    modulos = {}
+    for linha in saida.splitlines():
+        m = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", linha)
+        if m:
+            modulos[m.group(4)] = (int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2)
+    return modulos
+
+def medir_importacao(codigo, repeticoes=3):
+    """
+    Melhor total (ms) de várias partidas e o custo próprio por pacote de topo
+    (ms, da melhor partida): pandas, altair, main... em vez de centenas de submódulos.
+    """
+    melhor = None
+    with tempfile.TemporaryDirectory() as pasta: # O app cria o banco na pasta atual
+        partida = set(_ler_importtime("pass", pasta))
+        for _ in range(repeticoes):
+            modulos = {nome: v for nome, v in _ler_importtime(codigo, pasta).items() if nome not in partida}
+            total = sum(cumulativo for _, cumulativo, nivel in modulos.values() if nivel == 1) / 1000
+            if melhor is None or total < melhor[0]:
+                melhor = (total, modulos)
+    total, modulos = melhor
+    por_pacote = {}
+    for nome, (proprio, _, _) in modulos.items():
+        pacote = nome.split(".")[0].lstrip("_")
+        por_pacote[pacote] = por_pacote.get(pacote, 0) + proprio / 1000
+    return {"total_ms": total, "pacotes_ms": dict(sorted(por_pacote.items(), key=lambda p: -p[1]))}
+
+def estagio_inicializacao(alvos=ALVOS_IMPORTACAO):
+    return {f"inicializacao.{nome}.latencia_ms": medir_importacao(codigo)["total_ms"] for nome, codigo in alvos.items()}
+
+# ==============================================================================
+# SUÍTE COMPLETA (EDITAIS SINTÉTICOS, UM NÚMERO POR ESTÁGIO)
+# ==============================================================================
+# Todas as métricas terminam em _s (por segundo, maior é melhor) ou _ms
+# (latência, menor é melhor): é assim que a comparação sabe o que é regressão.
+CENARIOS_EXTRACAO = {
+    "tabela": {"layout": "tabela", "posicao_preco": "mesma_linha", "posicao_qtd": "inicio"},
+    "lista": {"layout": "lista", "posicao_preco": "abaixo", "posicao_qtd": "explicita"},
+    "colunas_denso": {"layout": "colunas", "posicao_preco": "acima", "posicao_qtd": "inicio", "densidade_itens": 0.4},
+}
+TAMANHOS_CATALOGO = (10, 100, 1000, 5000)
+
+def _cronometrar(funcao, repeticoes=5):
+    """Melhor tempo (segundos) de várias execuções."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+def estagio_extracao(pasta, paginas, motores):
+    metricas, amostras = {}, {}
+    for nome, cenario in CENARIOS_EXTRACAO.items():
+        meta = gerar_edital(os.path.join(pasta, f"{nome}.pdf"), {**cenario, "paginas": paginas})
+        for motor in motores:
+            inicio = time.perf_counter()
+            dados = extrair_dados_pdf(meta["caminho"], usar_cache=False, motor=motor)
+            segundos = time.perf_counter() - inicio
+            prefixo = f"extracao.{nome}.{motor}"
+            metricas[f"{prefixo}.paginas_s"] = meta["paginas"] / segundos
+            metricas[f"{prefixo}.linhas_s"] = meta["linhas"] / segundos
+            metricas[f"{prefixo}.itens"] = sum(len(v) for v in dados.values())
+            amostras[nome] = dados
+    return metricas, amostras
+
+def estagio_persistencia(amostras, arquivos=50):
+    """salvar_no_banco (um edital por chamada) x salvar_em_lote (tudo numa transação)."""
+    lote = [(f"{nome}_{i}.pdf", dados) for i in range(arquivos // len(amostras) + 1) for nome, dados in amostras.items()][:arquivos]
+    linhas = sum(1 + sum(len(v) for v in dados.values()) for _, dados in lote)
+
+    inicio = time.perf_counter()
+    for nome_arquivo, dados in lote:
+        salvar_no_banco(nome_arquivo, dados, 1)
+    por_arquivo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    salvar_em_lote(lote, 1)
+    em_lote = time.perf_counter() - inicio
+    return {
+        "persistencia.salvar_no_banco.linhas_s": linhas / por_arquivo,
+        "persistencia.salvar_em_lote.linhas_s": linhas / em_lote,
+    }
+
+def estagio_reprocessamento(pasta, dono_id=2):
+    """
+    Editais do estágio de extração lidos de novo do PDF (guardando o texto) x
+    reprocessar() sobre o texto guardado, com referências recalculadas. Usuário à parte.
+    """
+    inicio = time.perf_counter()
+    lote = []
+    for nome in CENARIOS_EXTRACAO:
+        caminho = os.path.join(pasta, f"{nome}.pdf")
+        hash_pdf = calcular_hash_pdf(caminho)
+        lote.append((f"{nome}.pdf", extrair_dados_pdf(caminho, hash_pdf=hash_pdf), hash_pdf))
+    reextracao = time.perf_counter() - inicio
+    salvar_em_lote(lote, dono_id)
+    r = reprocessar(dono_id)
+    return {
+        "reprocessamento.pdf.paginas_s": r["paginas"] / reextracao,
+        "reprocessamento.texto_guardado.paginas_s": r["paginas_s"],
+    }
+
+def estagio_consultas(repeticoes=20):
+    """Latência das consultas do Dashboard Executivo sobre o banco já populado pela persistência."""
+    conexao = sqlite3.connect(CAMINHO_BANCO)
+    try:
+        id_lic = int(consultas.listar_licitacoes(conexao, 1)['id'].iloc[0])
+        chamadas = {
+            "listar_licitacoes": lambda: consultas.listar_licitacoes(conexao, 1),
+            "kpis_licitacao": lambda: consultas.kpis_licitacao(conexao, id_lic, 1),
+            "histograma_categorias": lambda: consultas.histograma_categorias(conexao, id_lic, 1),
+            "lucro_potencial": lambda: consultas.lucro_potencial(conexao, id_lic, 1),
+            "pagina_itens": lambda: consultas.pagina_itens(conexao, id_lic, 1, 1),
+            "buscar_nos_editais": lambda: consultas.buscar_nos_editais(conexao, 1, "processador i5"),
+        }
+        return {f"consultas.{nome}.latencia_ms": _cronometrar(f, repeticoes) * 1000 for nome, f in chamadas.items()}
+    finally:
+        conexao.close()
+
+def catalogo_sintetico(tamanho, semente=7):
+    """Catálogo com tags que raramente batem (pior caso: o item percorre o catálogo inteiro)."""
+    rnd = random.Random(semente)
+    return pd.DataFrame({
+        "id": range(1, tamanho + 1),
+        "nome_produto": [f"SKU {i}" for i in range(tamanho)],
+        "tags_match": [f"modelo-{i}, linha{rnd.randint(0, 500)}x, {rnd.choice(['i5', 'i7', 'ssd', '24 pol', 'nobreak'])}"
+                       for i in range(tamanho)],
+        "custo_unitario": [rnd.uniform(100, 5000) for _ in range(tamanho)],
+        "preco_venda": [rnd.uniform(150, 7000) for _ in range(tamanho)],
+    })
+
+def estagio_catalogo(amostras, tamanhos=TAMANHOS_CATALOGO, amostra_unitaria=50):
+    """
+    Match de um item só x materialização dos matches de todos os itens do usuário 1
+    (o que a ingestão faz a cada gravação). O catálogo sintético é desfeito no fim.
+    """
+    unitarios = [normalizar_texto(i["desc"]) for dados in amostras.values() for v in dados.values() for i in v][:amostra_unitaria]
+    conexao = sqlite3.connect(CAMINHO_BANCO, isolation_level=None)
+    try:
+        licitacoes = [id_lic for (id_lic,) in conexao.execute("SELECT id FROM licitacoes WHERE dono_id = 1")]
+        metricas = {}
+        for tamanho in tamanhos:
+            df = catalogo_sintetico(tamanho)
+            t = _cronometrar(lambda: [buscar_produto_compativel(x, df) for x in unitarios], repeticoes=1)
+            metricas[f"catalogo.{tamanho}.buscar_produto_compativel.itens_s"] = len(unitarios) / t
+
+            conexao.execute("BEGIN")
+            try:
+                conexao.executemany("""
+                    INSERT INTO catalogo_produtos (dono_id, nome_produto, tags_match, custo_unitario, preco_venda)
+                    VALUES (1, ?, ?, ?, ?)
+                """, df[["nome_produto", "tags_match", "custo_unitario", "preco_venda"]].itertuples(index=False))
+                itens = materializar_matches(conexao, 1, licitacoes)
+                t = _cronometrar(lambda: materializar_matches(conexao, 1, licitacoes), repeticoes=3)
+                metricas[f"catalogo.{tamanho}.materializar_matches.itens_s"] = itens / t
+            finally:
+                conexao.execute("ROLLBACK")
+        return metricas
+    finally:
+        conexao.close()
+
+def _versao_codigo():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def rodar_suite(paginas=20, motores=None):
+    """Roda todos os estágios numa pasta temporária (banco novo, sem cache) e devolve o relatório."""
+    motores = motores or [MOTOR_PADRAO]
+    logging.getLogger("main").setLevel(logging.WARNING)
+    metricas = {}
+    pasta_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta) # O banco é relativo à pasta atual: a suíte nunca toca o banco real
+        try:
+            conexao = sqlite3.connect(CAMINHO_BANCO)
+            migrar(conexao, silencioso=True)
+            conexao.close()
+
+            r = bench_scanner()
+            metricas["scanner.legado.linhas_s"] = r["legado_linhas_s"]
+            metricas["scanner.compilado.linhas_s"] = r["scanner_linhas_s"]
+            m, amostras = estagio_extracao(pasta, paginas, motores)
+            metricas.update(m)
+            metricas.update(estagio_persistencia(amostras))
+            metricas.update(estagio_reprocessamento(pasta))
+            metricas.update(estagio_consultas())
+            metricas.update(estagio_catalogo(amostras))
+            metricas.update(estagio_inicializacao())
+        finally:
+            os.chdir(pasta_original)
+    return {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "versao": _versao_codigo(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "paginas": paginas,
+            "motores": motores,
+        },
+        "metricas": metricas,
+    }
+
+def comparar(base, atual, tolerancia=0.2):
+    """Lista de regressões: taxa (_s) que caiu ou latência (_ms) que subiu além da tolerância."""
+    regressoes = []
+    for chave, valor in atual["metricas"].items():
+        anterior = base["metricas"].get(chave)
+        if not anterior: continue
+        if chave.endswith("_s") and valor < anterior * (1 - tolerancia):
+            regressoes.append((chave, anterior, valor))
+        elif chave.endswith("_ms") and valor > anterior * (1 + tolerancia):
+            regressoes.append((chave, anterior, valor))
+    return regressoes
+
+def _imprimir_suite(relatorio):
+    print(f"--- Suíte de benchmark ({relatorio['meta']['versao']}, {relatorio['meta']['paginas']} páginas/edital) ---")
+    for chave, valor in relatorio["metricas"].items():
+        print(f"   {chave:<60} {valor:>14,.2f}")
+
+# ==============================================================================
+# EXECUÇÃO DIRETA
+# ==============================================================================
+# python benchmark.py [suite] [--paginas 20] [--motores pdfplumber,pypdfium2] [--comparar base.json]
+# python benchmark.py scanner
+# python benchmark.py paralelo edital.pdf
+# python benchmark.py motores a.pdf b.pdf ...
+# python benchmark.py multiusuario [--usuarios 8]
+# python benchmark.py importacao [--top 10]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks do LicitaCloud")
+    parser.add_argument("comando", nargs="?", default="suite", choices=["suite", "scanner", "paralelo", "motores", "multiusuario", "importacao"])
+    parser.add_argument("pdfs", nargs="*", help="PDFs para os comandos paralelo/motores")
+    parser.add_argument("--paginas", type=int, default=20, help="Páginas de cada edital sintético")
+    parser.add_argument("--motores", default=None, help="Motores de leitura da suíte, separados por vírgula")
+    parser.add_argument("--saida", default=None, help="JSON de saída (padrão: bench_resultados/<data>.json)")
+    parser.add_argument("--comparar", default=None, help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Queda aceitável antes de acusar regressão")
+    parser.add_argument("--usuarios", type=int, default=8, help="Processos gravando ao mesmo tempo (multiusuario)")
+    parser.add_argument("--top", type=int, default=10, help="Pacotes mais caros listados por alvo (importacao)")
+    args = parser.parse_args()
+
+    if args.comando == "scanner":
+        r = bench_scanner()
+        print(f"--- Scanner ({r['linhas']} linhas) ---")
+        print(f"   Legado : {r['legado_linhas_s']:,.0f} linhas/s")
+        print(f"   Scanner: {r['scanner_linhas_s']:,.0f} linhas/s")
+        print(f"   Ganho  : {r['ganho']:.1f}x")
+
+    elif args.comando == "paralelo":
+        r = bench_paralelo(args.pdfs[0])
+        print(f"--- Modo paralelo ({r['paginas']} páginas) ---")
+        for e in r["execucoes"]:
+            print(f"   {e['workers']} workers: {e['paginas_s']:,.1f} páginas/s ({e['speedup']:.2f}x)")
+
+    elif args.comando == "motores":
+        r = comparar_motores(args.pdfs)
+        print(f"--- Motores de leitura ({r['paginas']} páginas) ---")
+        for motor, m in r["motores"].items():
+            print(f"   {motor:<10}: {m['paginas_s']:,.1f} páginas/s | {m['itens']} itens | "
+                  f"+{len(m['so_no_motor'])} / -{len(m['so_na_referencia'])} vs pdfplumber")
+            for item in m["so_no_motor"][:5]: print(f"      + {item}")
+            for item in m["so_na_referencia"][:5]: print(f"      - {item}")
+
+    elif args.comando == "multiusuario":
+        r = bench_multiusuario(usuarios=args.usuarios)
+        print(f"--- Gravação concorrente ({r['usuarios']} usuários x {r['lotes']} lotes de {r['arquivos']} editais) ---")
+        for modo, m in r["modos"].items():
+            print(f"   {modo:<6}: {m['linhas_s']:>10,.0f} linhas/s | lote p50 {m['lote_p50_ms']:,.0f} ms, "
+                  f"p95 {m['lote_p95_ms']:,.0f} ms | espera por lock {m['espera_lock_s']:.2f}s | {m['bloqueios']} bloqueios")
+
+    elif args.comando == "importacao":
+        print("--- Tempo de importação (partida a frio, melhor de 3) ---")
+        for nome, codigo in ALVOS_IMPORTACAO.items():
+            r = medir_importacao(codigo)
+            print(f"   {nome:<15}: {r['total_ms']:,.0f} ms  ({codigo})")
+            for pacote, ms in list(r["pacotes_ms"].items())[:args.top]:
+                print(f"      {pacote:<25} {ms:>8,.1f} ms")
+
+    else:
+        motores = args.motores.split(",") if args.motores else None
+        relatorio = rodar_suite(paginas=args.paginas, motores=motores)
+        _imprimir_suite(relatorio)
+
+        saida = args.saida or os.path.join("bench_resultados", f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+        os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+        with open(saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultado salvo em {saida}")
+
+        if args.comparar:
+            with open(args.comparar, encoding="utf-8") as f:
+                regressoes = comparar(json.load(f), relatorio, args.tolerancia)
+            if regressoes:
+                print(f"\n❌ {len(regressoes)} regressões (tolerância {args.tolerancia:.0%}):")
+                for chave, antes, agora in regressoes:
+                    print(f"   {chave}: {antes:,.2f} -> {agora:,.2f}")
+                sys.exit(1)
+            print("\n✅ Sem regressões em relação a", args.comparar)
@@ -0,0 +1,255 @@
+from collections import deque
+
+# ==============================================================================
+# MATCHER DO CATÁLOGO (AHO-CORASICK SOBRE AS TAGS)
+# ==============================================================================
+# Regra de negócio (a mesma do antigo laço com iterrows): o produto escolhido é
+# o PRIMEIRO do catálogo que tenha alguma tag (com 2+ letras) contida no texto do item.
+# O autômato acha todas as tags presentes numa passada só pelo texto e cada tag
+# carrega a posição do primeiro produto que a usa, então basta pegar o menor.
+
+SEM_CATALOGO = ("Sem Match", 0.0, 0.0)
+SEM_MATCH = (None, 0.0, 0.0)
+
+def tags_validas(tags_match):
+    """Tags do produto que participam do match (separadas por vírgula, 2+ letras)."""
+    return [tag.strip() for tag in tags_match.split(',') if len(tag.strip()) > 1]
+
+def _valor(preco):
+    """Custo/venda em branco (NULL no banco, NaN no DataFrame) contam como 0."""
+    return 0.0 if preco is None or preco != preco else preco
+
+class MatcherCatalogo:
+    def __init__(self, df_produtos):
+        self._montar(zip(df_produtos['nome_produto'], df_produtos['tags_match'],
+                         df_produtos['custo_unitario'], df_produtos['preco_venda']))
+
+    @classmethod
+    def das_linhas(cls, linhas):
+        """Mesmo matcher a partir de tuplas (nome_produto, tags_match, custo_unitario, preco_venda), sem pandas."""
+        matcher = cls.__new__(cls)
+        matcher._montar(linhas)
+        return matcher
+
+    def _montar(self, linhas):
+        self.produtos = []
+        # Tag -> posição do primeiro produto que a usa
+        prioridade = {}
+        for posicao, (nome, tags, custo, venda) in enumerate(linhas):
+            custo, venda = _valor(custo), _valor(venda)
+            self.produtos.append((nome, venda, venda - custo))
+            for tag in tags_validas(tags):
+                if tag not in prioridade:
+                    prioridade[tag] = posicao
+        self.vazio = not self.produtos
+        self._montar_automato(prioridade)
+
+    def _montar_automato(self, prioridade):
+        # Estado 0 é a raiz; cada estado guarda o melhor (menor) produto que termina nele
+        self.transicoes = [{}]
+        self.melhor = [None]
+        for tag, posicao in prioridade.items():
+            estado = 0
+            for letra in tag:
+                proximo = self.transicoes[estado].get(letra)
+                if proximo is None:
+                    proximo = len(self.transicoes)
+                    self.transicoes[estado][letra] = proximo
+                    self.transicoes.append({})
+                    self.melhor.append(None)
+                estado = proximo
+            self.melhor[estado] = posicao
+
+        # Links de falha em largura; o melhor de um estado herda o do seu sufixo
+        self.falha = [0] * len(self.transicoes)
+        fila = deque(self.transicoes[0].values())
+        while fila:
+            estado = fila.popleft()
+            for letra, proximo in self.transicoes[estado].items():
+                f = self.falha[estado]
+                while f and letra not in self.transicoes[f]:
+                    f = self.falha[f]
+                destino = self.transicoes[f].get(letra, 0)
+                self.falha[proximo] = destino if destino != proximo else 0
+                herdado = self.melhor[self.falha[proximo]]
+                if herdado is not None and (self.melhor[proximo] is None or herdado < self.melhor[proximo]):
+                    self.melhor[proximo] = herdado
+                fila.append(proximo)
+
+    def combinar(self, item_edital):
+        """(nome_produto, preco_venda, margem) do produto compatível com o item."""
+        if self.vazio or not item_edital:
+            return SEM_CATALOGO
+        posicao = self.posicao(item_edital)
+        return self.produtos[posicao] if posicao is not None else SEM_MATCH
+
+    def posicao(self, item_edital):
+        """Posição no catálogo do produto compatível com o item, ou None."""
+        if self.vazio or not item_edital:
+            return None
+        transicoes, falha, melhor = self.transicoes, self.falha, self.melhor
+        estado = 0
+        vencedor = None
+        for letra in str(item_edital).lower():
+            while estado and letra not in transicoes[estado]:
+                estado = falha[estado]
+            estado = transicoes[estado].get(letra, 0)
+            achado = melhor[estado]
+            if achado is not None and (vencedor is None or achado < vencedor):
+                vencedor = achado
+                if vencedor == 0: break # Não existe produto com mais prioridade que o primeiro
+        return vencedor
+
+def buscar_produto_compativel(item_edital, df_produtos):
+    """Match de um item só. Para itens gravados use materializar_matches (tabela matches_produto)."""
+    return MatcherCatalogo(df_produtos).combinar(item_edital)
+
+# ==============================================================================
+# MATCHES MATERIALIZADOS (TABELA matches_produto)
+# ==============================================================================
+# O produto sugerido de cada item é gravado na mesma transação do item (ingestão
+# e reprocessamento) e refeito só para os itens afetados quando um produto entra
+# ou muda. O dashboard lê pronto e o Lucro Potencial vira um SUM no SQLite.
+# Sempre na transação de quem chama, na conexão onde ficam itens e catálogo do usuário.
+_matchers_do_banco = {}
+
+def matcher_do_banco(conexao, dono_id):
+    """
+    (matcher, ids dos produtos na ordem do catálogo) com o catálogo atual do usuário.
+    O autômato só é refeito quando as linhas do catálogo mudam (inclusive por outro processo).
+    Não usa pandas: roda também dentro da migração, na partida do app.
+    """
+    linhas = tuple(conexao.execute("""
+        SELECT id, nome_produto, tags_match, custo_unitario, preco_venda
+        FROM catalogo_produtos WHERE dono_id = ? ORDER BY id
+    """, (dono_id,)).fetchall())
+    em_cache = _matchers_do_banco.get(dono_id)
+    if em_cache is None or em_cache[0] != linhas:
+        matcher = MatcherCatalogo.das_linhas(linha[1:] for linha in linhas)
+        em_cache = (linhas, matcher, [linha[0] for linha in linhas])
+        _matchers_do_banco[dono_id] = em_cache
+    return em_cache[1], em_cache[2]
+
+def _gravar_matches(conexao, dono_id, itens):
+    """itens: [(item_id, licitacao_id, valor_encontrado)]; cada descrição distinta passa uma vez pelo autômato."""
+    if not itens: return 0
+    matcher, ids_produtos = matcher_do_banco(conexao, dono_id)
+    posicoes = {}
+    linhas = []
+    for item_id, licitacao_id, descricao in itens:
+        if descricao not in posicoes: posicoes[descricao] = matcher.posicao(descricao)
+        posicao = posicoes[descricao]
+        if posicao is None:
+            linhas.append((item_id, licitacao_id, None, 0.0, 0.0))
+        else:
+            _, venda, margem = matcher.produtos[posicao]
+            linhas.append((item_id, licitacao_id, ids_produtos[posicao], venda, margem))
+    conexao.executemany("""
+        INSERT OR REPLACE INTO matches_produto (item_id, licitacao_id, produto_id, preco_venda, margem)
+        VALUES (?, ?, ?, ?, ?)
+    """, linhas)
+    return len(linhas)
+
+def indexar_trechos(conexao, licitacoes):
+    """Itens recém-gravados das licitações no busca_trechos (um INSERT ... SELECT para o lote todo)."""
+    if not licitacoes: return
+    conexao.execute(f"""
+        INSERT INTO busca_trechos (rowid, valor_encontrado)
+        SELECT id, valor_encontrado FROM itens_extraidos
+        WHERE licitacao_id IN ({', '.join('?' * len(licitacoes))})
+    """, list(licitacoes))
+
+def materializar_matches(conexao, dono_id, licitacoes):
+    """Matches de todos os itens das licitações (recém-gravadas ou reprocessadas)."""
+    if not licitacoes: return 0
+    itens = conexao.execute(f"""
+        SELECT id, licitacao_id, valor_encontrado FROM itens_extraidos
+        WHERE licitacao_id IN ({', '.join('?' * len(licitacoes))})
+    """, list(licitacoes)).fetchall()
+    return _gravar_matches(conexao, dono_id, itens)
+
+# Itens candidatos de uma tag saem do índice de trigramas (busca_trechos), que acha
+# a tag em qualquer posição do texto, inclusive grudada no meio de uma palavra
+# ("256gb" em "ssd256gb"). O LIKE desse índice é sem diferença de maiúsculas e trata
+# % e _ como coringas: sempre acha um superconjunto, e o instr confirma a substring
+# exata (como o matcher). Tags com menos de 3 letras (ou com % e _) não têm trigrama
+# para procurar: varrem os itens do usuário.
+def _itens_com_a_tag(conexao, dono_id, tag):
+    """[(item_id, licitacao_id, valor_encontrado)] do usuário cujo texto contém a tag."""
+    if len(tag) < 3 or '%' in tag or '_' in tag:
+        return conexao.execute("""
+            SELECT i.id, i.licitacao_id, i.valor_encontrado
+            FROM itens_extraidos i JOIN licitacoes l ON l.id = i.licitacao_id
+            WHERE l.dono_id = ? AND instr(i.valor_encontrado, ?) > 0
+        """, (dono_id, tag)).fetchall()
+    return conexao.execute("""
+        SELECT i.id, i.licitacao_id, i.valor_encontrado
+        FROM busca_trechos t JOIN itens_extraidos i ON i.id = t.rowid JOIN licitacoes l ON l.id = i.licitacao_id
+        WHERE t.valor_encontrado LIKE ? AND l.dono_id = ? AND instr(i.valor_encontrado, ?) > 0
+    """, (f"%{tag}%", dono_id, tag)).fetchall()
+
+def atualizar_matches_do_produto(conexao, dono_id, produto_id):
+    """
+    Depois de cadastrar, editar ou apagar um produto: refaz só os itens que estavam
+    com ele e os que contêm alguma das suas tags (achados pelo índice de trigramas).
+    Os demais não mudam: o produto não entra na disputa deles. Retorna quantos refez.
+    """
+    linha = conexao.execute("SELECT tags_match FROM catalogo_produtos WHERE id = ? AND dono_id = ?",
+                            (produto_id, dono_id)).fetchone()
+    afetados = {item[0]: item for item in conexao.execute("""
+        SELECT i.id, i.licitacao_id, i.valor_encontrado
+        FROM matches_produto m JOIN itens_extraidos i ON i.id = m.item_id
+        WHERE m.produto_id = ?
+    """, (produto_id,))}
+    for tag in (tags_validas(linha[0]) if linha else []):
+        for item in _itens_com_a_tag(conexao, dono_id, tag):
+            afetados[item[0]] = item
+    return _gravar_matches(conexao, dono_id, list(afetados.values()))
+
+def recalcular_matches(conexao):
+    """Refaz a tabela inteira com os itens de todos os usuários do banco (carga inicial)."""
+    conexao.execute("DELETE FROM matches_produto")
+    for (dono_id,) in conexao.execute("SELECT DISTINCT dono_id FROM licitacoes").fetchall():
+        itens = conexao.execute("""
+            SELECT i.id, i.licitacao_id, i.valor_encontrado
+            FROM itens_extraidos i JOIN licitacoes l ON l.id = i.licitacao_id WHERE l.dono_id = ?
+        """, (dono_id,)).fetchall()
+        _gravar_matches(conexao, dono_id, itens)
+
+def conferir_matches(conexao, dono_id):
+    """Itens cujo match gravado difere do matcher com o catálogo atual: [(item_id, gravado, esperado)]."""
+    matcher, ids_produtos = matcher_do_banco(conexao, dono_id)
+    divergentes = []
+    for item_id, descricao, gravado in conexao.execute("""
+        SELECT i.id, i.valor_encontrado, m.produto_id
+        FROM itens_extraidos i JOIN licitacoes l ON l.id = i.licitacao_id
+        LEFT JOIN matches_produto m ON m.item_id = i.id
+        WHERE l.dono_id = ?
+    """, (dono_id,)).fetchall():
+        posicao = matcher.posicao(descricao)
+        esperado = ids_produtos[posicao] if posicao is not None else None
+        if gravado != esperado: divergentes.append((item_id, gravado, esperado))
+    return divergentes
+
+# python catalogo.py conferir: confere matches_produto de todos os usuários contra o matcher
+if __name__ == "__main__":
+    import sys
+    import banco
+    if sys.argv[1:] != ["conferir"]:
+        sys.exit("uso: python catalogo.py conferir")
+    banco.garantir_schema()
+    if banco.particionado():
+        donos = banco.donos_particionados()
+    else:
+        with banco.conexao() as conexao:
+            donos = [dono_id for (dono_id,) in conexao.execute("SELECT id FROM usuarios ORDER BY id")]
+    total = 0
+    for dono_id in donos:
+        with banco.conexao(dono_id) as conexao:
+            divergentes = conferir_matches(conexao, dono_id)
+        total += len(divergentes)
+        for item_id, gravado, esperado in divergentes[:10]:
+            print(f"   usuário {dono_id}, item {item_id}: gravado {gravado}, esperado {esperado}")
+    if total:
+        sys.exit(f"❌ {total} itens com o produto sugerido desatualizado (python main.py reprocessar refaz).")
+    print("✅ Produto sugerido de todos os itens confere com o catálogo.")
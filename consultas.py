@@ -0,0 +1,141 @@
+import re
+
+import pandas as pd
+
+from referencias import normalizar_componente
+
+# ==============================================================================
+# CONSULTAS DO DASHBOARD (FILTRO E AGREGAÇÃO NO SQLITE, SEMPRE POR USUÁRIO)
+# ==============================================================================
+ITENS_POR_PAGINA = 50
+
+def listar_licitacoes(conn, dono_id):
+    return pd.read_sql_query("SELECT id, nome_arquivo FROM licitacoes WHERE dono_id=? ORDER BY id DESC",
+                             conn, params=(dono_id,))
+
+def listar_produtos(conn, dono_id):
+    return pd.read_sql_query("SELECT * FROM catalogo_produtos WHERE dono_id=?", conn, params=(dono_id,))
+
+def kpis_licitacao(conn, id_lic, dono_id):
+    """Contagem, categorias e estimativa do governo calculadas pelo próprio SQLite."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT COUNT(*), COUNT(DISTINCT i.tipo_componente),
+               COALESCE(SUM(i.preco_medio_edital * i.quantidade_edital), 0)
+        FROM itens_extraidos i JOIN licitacoes l ON l.id = i.licitacao_id
+        WHERE i.licitacao_id = ? AND l.dono_id = ?
+    """, (id_lic, dono_id))
+    total_itens, categorias, val_gov = cursor.fetchone()
+    return {"itens": total_itens, "categorias": categorias, "val_gov": val_gov}
+
+def histograma_categorias(conn, id_lic, dono_id):
+    return pd.read_sql_query("""
+        SELECT i.tipo_componente AS Categoria, COUNT(*) AS Qtd
+        FROM itens_extraidos i JOIN licitacoes l ON l.id = i.licitacao_id
+        WHERE i.licitacao_id = ? AND l.dono_id = ?
+        GROUP BY i.tipo_componente ORDER BY Qtd DESC
+    """, conn, params=(id_lic, dono_id))
+
+def lucro_potencial(conn, id_lic, dono_id):
+    """Margem x quantidade de cada item, com o produto já escolhido em matches_produto."""
+    cursor = conn.execute("""
+        SELECT COALESCE(SUM(m.margem * i.quantidade_edital), 0)
+        FROM matches_produto m JOIN itens_extraidos i ON i.id = m.item_id JOIN licitacoes l ON l.id = m.licitacao_id
+        WHERE m.licitacao_id = ? AND l.dono_id = ?
+    """, (id_lic, dono_id))
+    return float(cursor.fetchone()[0])
+
+def pagina_itens(conn, id_lic, dono_id, pagina, por_pagina=ITENS_POR_PAGINA):
+    """Paginação no servidor: só a fatia visível da tabela sai do banco, já com o produto sugerido."""
+    return pd.read_sql_query("""
+        SELECT i.id, i.tipo_componente, i.valor_encontrado, i.quantidade_edital, i.preco_medio_edital,
+               p.nome_produto AS Produto, COALESCE(m.preco_venda, 0.0) AS Venda, COALESCE(m.margem, 0.0) AS Lucro
+        FROM itens_extraidos i JOIN licitacoes l ON l.id = i.licitacao_id
+        LEFT JOIN matches_produto m ON m.item_id = i.id
+        LEFT JOIN catalogo_produtos p ON p.id = m.produto_id
+        WHERE i.licitacao_id = ? AND l.dono_id = ?
+        ORDER BY i.id LIMIT ? OFFSET ?
+    """, conn, params=(id_lic, dono_id, por_pagina, (pagina - 1) * por_pagina))
+
+def referencias_dos_itens(conn, itens):
+    """
+    Referência de mercado (mediana e amostras de todos os editais) de cada item
+    do DataFrame: uma busca pela chave primária de referencia_precos por item distinto.
+    """
+    chaves = [(t, normalizar_componente(v)) for t, v in zip(itens['tipo_componente'], itens['valor_encontrado'])]
+    unicas = list(dict.fromkeys(chaves))
+    mapa = {}
+    if unicas:
+        cursor = conn.execute(f"""
+            SELECT tipo_componente, componente, mediana, amostras FROM referencia_precos
+            WHERE (tipo_componente, componente) IN (VALUES {",".join(["(?, ?)"] * len(unicas))})
+        """, [v for chave in unicas for v in chave])
+        mapa = {(t, c): (mediana, amostras) for t, c, mediana, amostras in cursor.fetchall()}
+    return pd.DataFrame([mapa.get(chave, (None, 0)) for chave in chaves], index=itens.index,
+                        columns=['Ref. Mercado', 'Amostras Mercado'])
+
+def buscar_nos_editais(conn, dono_id, termo, limite=200):
+    """
+    Busca textual (FTS5) em todos os editais do usuário: cada palavra digitada
+    vira um prefixo obrigatório ('ryzen 7 5700' acha 'ryzen 7 5700x').
+    """
+    palavras = re.findall(r"\w+", termo.lower())
+    if not palavras:
+        return pd.DataFrame()
+    consulta = " ".join(f'"{p}"*' for p in palavras)
+    return pd.read_sql_query("""
+        SELECT b.nome_arquivo AS Edital, i.tipo_componente AS Categoria, i.valor_encontrado AS Item,
+               i.quantidade_edital AS Qtd, i.preco_medio_edital AS Preco
+        FROM busca_itens b JOIN itens_extraidos i ON i.id = b.rowid
+        WHERE busca_itens MATCH ? AND b.dono_id = ?
+        ORDER BY bm25(busca_itens) LIMIT ?
+    """, conn, params=(consulta, dono_id, limite))
+
+# ==============================================================================
+# PAINEL DE DESEMPENHO (TABELA metricas_processamento)
+# ==============================================================================
+# dono_id=None: visão de administrador (todos os usuários)
+def _filtro_dono(dono_id, alias="m"):
+    return ("", ()) if dono_id is None else (f" AND {alias}.dono_id = ?", (dono_id,))
+
+def arquivos_mais_lentos(conn, dono_id=None, limite=20):
+    """Processamentos mais demorados, com o tempo de cada estágio em colunas."""
+    filtro, params = _filtro_dono(dono_id)
+    arquivos = pd.read_sql_query(f"""
+        SELECT m.execucao, m.nome_arquivo AS Edital, m.motor AS Motor, m.criado_em AS Data,
+               m.segundos AS Total, m.linhas AS Linhas, m.matches AS Itens, m.rejeitados AS Rejeitados
+        FROM metricas_processamento m
+        WHERE m.escopo = 'arquivo'{filtro}
+        ORDER BY m.segundos DESC LIMIT ?
+    """, conn, params=params + (limite,))
+    if arquivos.empty:
+        return arquivos
+    marcadores = ",".join("?" * len(arquivos))
+    estagios = pd.read_sql_query(f"""
+        SELECT execucao, chave, segundos FROM metricas_processamento
+        WHERE escopo = 'estagio' AND execucao IN ({marcadores})
+    """, conn, params=tuple(arquivos['execucao']))
+    colunas = estagios.pivot_table(index='execucao', columns='chave', values='segundos', aggfunc='sum')
+    return arquivos.join(colunas, on='execucao').drop(columns='execucao')
+
+def padroes_mais_lentos(conn, dono_id=None):
+    """Custo acumulado de cada regex de PATTERNS (tempo total e por linha examinada)."""
+    filtro, params = _filtro_dono(dono_id)
+    return pd.read_sql_query(f"""
+        SELECT m.chave AS Categoria, SUM(m.segundos) AS Segundos, SUM(m.linhas) AS Linhas,
+               SUM(m.matches) AS Matches, SUM(m.rejeitados) AS Rejeitados,
+               1e6 * SUM(m.segundos) / MAX(SUM(m.linhas), 1) AS us_por_linha
+        FROM metricas_processamento m
+        WHERE m.escopo = 'padrao'{filtro}
+        GROUP BY m.chave ORDER BY Segundos DESC
+    """, conn, params=params)
+
+def paginas_mais_lentas(conn, dono_id=None, limite=20):
+    filtro, params = _filtro_dono(dono_id)
+    return pd.read_sql_query(f"""
+        SELECT m.nome_arquivo AS Edital, CAST(m.chave AS INTEGER) AS Pagina, m.segundos AS Segundos,
+               m.linhas AS Linhas, m.matches AS Achados, m.motor AS Motor
+        FROM metricas_processamento m
+        WHERE m.escopo = 'pagina'{filtro}
+        ORDER BY m.segundos DESC LIMIT ?
+    """, conn, params=params + (limite,))
@@ -0,0 +1,284 @@
+import os
+import sys
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+import banco
+from setup_banco import garantir_schema
+from perfil import PERFIL_ATIVO, PerfilExtracao, gravar_metricas
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# CONFIGURAÇÃO DA FILA
+# ==============================================================================
+# Backend "local" (padrão): a própria tabela jobs é a fila e um pool de
+# processos consome. Backend "celery": o job continua registrado na tabela
+# (status/progresso), mas quem entrega para os workers é o broker do Celery.
+BACKEND_FILA = os.environ.get("LICITACLOUD_FILA", "local")
+BROKER_CELERY = os.environ.get("LICITACLOUD_BROKER", "redis://localhost:6379/0")
+WORKERS_PADRAO = int(os.environ.get("LICITACLOUD_WORKERS", "2"))
+PASTA_UPLOADS = "uploads"
+INTERVALO_POLL = 1.0        # Segundos entre consultas quando a fila está vazia
+INTERVALO_PROGRESSO = 0.5   # Mínimo entre gravações de progresso do mesmo job
+INTERVALO_BATIMENTO = 30.0  # Batimento do job em andamento, independente do progresso por página
+MINUTOS_ORFAO = 2           # Job PROCESSANDO sem batimento há mais que isso é de worker morto
+INTERVALO_VARREDURA = 60.0  # Cada worker procura jobs órfãos nesse intervalo
+MAX_TENTATIVAS = 3          # Reservas de um job; órfão que chegou nisso vai para FALHOU
+
+NA_FILA, PROCESSANDO, CONCLUIDO, FALHOU = "NA_FILA", "PROCESSANDO", "CONCLUIDO", "FALHOU"
+
+# ==============================================================================
+# PRODUTOR (CHAMADO PELA INTERFACE)
+# ==============================================================================
+def enfileirar(dono_id, nome_arquivo, conteudo_pdf):
+    """Grava o PDF em disco, registra o job e (no Celery) despacha a tarefa. Retorna o id do job."""
+    os.makedirs(PASTA_UPLOADS, exist_ok=True)
+    caminho = os.path.join(PASTA_UPLOADS, f"{uuid.uuid4().hex}.pdf")
+    with open(caminho, "wb") as f:
+        f.write(conteudo_pdf)
+
+    with banco.transacao() as conexao:
+        cursor = conexao.execute(
+            "INSERT INTO jobs (dono_id, nome_arquivo, caminho_pdf, status) VALUES (?, ?, ?, ?)",
+            (dono_id, nome_arquivo, caminho, NA_FILA))
+        job_id = cursor.lastrowid
+
+    if BACKEND_FILA == "celery":
+        _app_celery().send_task("licitacloud.processar_job", args=[job_id])
+    logger.info(f"📥 Job #{job_id} na fila: {nome_arquivo}")
+    return job_id
+
+def listar_jobs(dono_id, limite=50):
+    with banco.conexao() as conexao:
+        cursor = conexao.execute("""
+            SELECT id, nome_arquivo, status, paginas_lidas, total_paginas, itens, erro,
+                   criado_em, iniciado_em, finalizado_em, duracao_s
+            FROM jobs WHERE dono_id = ? ORDER BY id DESC LIMIT ?
+        """, (dono_id, limite))
+        colunas = [c[0] for c in cursor.description]
+        return [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+
+# ==============================================================================
+# CONSUMIDOR (WORKERS)
+# ==============================================================================
+def reservar_proximo_job(worker):
+    """
+    Pega o job mais antigo da fila de forma atômica: o BEGIN IMMEDIATE trava a
+    escrita, então dois workers nunca reservam o mesmo job.
+    """
+    with banco.transacao(imediata=True) as conexao:
+        linha = conexao.execute("SELECT id FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (NA_FILA,)).fetchone()
+        if linha:
+            _reservar(conexao, linha[0], worker)
+    return linha[0] if linha else None
+
+def _reservar(conexao, job_id, worker):
+    """Só reserva se o job ainda estiver na fila. Retorna True se conseguiu."""
+    cursor = conexao.execute("""
+        UPDATE jobs SET status = ?, worker = ?, tentativas = tentativas + 1,
+               iniciado_em = CURRENT_TIMESTAMP, atualizado_em = CURRENT_TIMESTAMP
+        WHERE id = ? AND status = ?
+    """, (PROCESSANDO, worker, job_id, NA_FILA))
+    return cursor.rowcount == 1
+
+def _marcar_progresso(job_id):
+    """Callback de progresso do extrator, gravando no máximo a cada INTERVALO_PROGRESSO."""
+    ultimo = [0.0]
+    def progresso(paginas_lidas, total_paginas):
+        agora = time.monotonic()
+        if agora - ultimo[0] < INTERVALO_PROGRESSO and paginas_lidas < total_paginas: return
+        ultimo[0] = agora
+        with banco.transacao() as conexao:
+            conexao.execute("""
+                UPDATE jobs SET paginas_lidas = ?, total_paginas = ?, atualizado_em = CURRENT_TIMESTAMP WHERE id = ?
+            """, (paginas_lidas, total_paginas, job_id))
+    return progresso
+
+@contextmanager
+def _batimento(job_id):
+    """
+    Thread que renova o atualizado_em do job a cada INTERVALO_BATIMENTO enquanto ele roda:
+    página lenta, hash ou abertura de um PDF grande não fazem um job vivo parecer órfão.
+    """
+    parar = threading.Event()
+    def bater():
+        while not parar.wait(INTERVALO_BATIMENTO):
+            try:
+                with banco.transacao() as conexao:
+                    conexao.execute("UPDATE jobs SET atualizado_em = CURRENT_TIMESTAMP WHERE id = ? AND status = ?",
+                                    (job_id, PROCESSANDO))
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Job #{job_id}: batimento não gravado ({e})")
+    thread = threading.Thread(target=bater, daemon=True, name=f"batimento-{job_id}")
+    thread.start()
+    try:
+        yield
+    finally:
+        parar.set()
+        thread.join()
+
+def _finalizar(job_id, status, inicio, itens=0, licitacao_id=None, erro=None):
+    with banco.transacao() as conexao:
+        conexao.execute("""
+            UPDATE jobs SET status = ?, itens = ?, licitacao_id = ?, erro = ?,
+                   finalizado_em = CURRENT_TIMESTAMP, duracao_s = ?
+            WHERE id = ?
+        """, (status, itens, licitacao_id, erro, time.perf_counter() - inicio, job_id))
+
+def processar_job(job_id):
+    """Extrai e grava um edital da fila. Nunca levanta exceção: o desfecho fica no status do job."""
+    from main import MOTOR_PADRAO, calcular_hash_pdf, extrair_dados_pdf, salvar_no_banco # Import pesado (pdfplumber) só no worker
+
+    inicio = time.perf_counter()
+    with banco.conexao() as conexao:
+        linha = conexao.execute("SELECT dono_id, nome_arquivo, caminho_pdf FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if linha is None:
+        logger.warning(f"⚠️ Job #{job_id} não existe mais.")
+        return
+    dono_id, nome_arquivo, caminho_pdf = linha
+    logger.info(f"⚙️ Job #{job_id}: processando {nome_arquivo}")
+
+    perfil = PerfilExtracao() if PERFIL_ATIVO else None
+    itens, licitacao_id = 0, None
+    try:
+        with _batimento(job_id):
+            hash_pdf = calcular_hash_pdf(caminho_pdf) # Vai junto na licitação: permite reprocessar depois
+            dados = extrair_dados_pdf(caminho_pdf, progresso=_marcar_progresso(job_id), perfil=perfil, hash_pdf=hash_pdf)
+        if not dados:
+            _finalizar(job_id, FALHOU, inicio, erro="Falha ao ler o PDF (veja os logs do worker)")
+        elif not any(dados.values()):
+            _finalizar(job_id, CONCLUIDO, inicio, erro="Sem itens de T.I.")
+        else:
+            if perfil: t_gravacao = time.perf_counter()
+            resultado = salvar_no_banco(nome_arquivo, dados, dono_id, hash_pdf)
+            if perfil: perfil.somar("gravacao", time.perf_counter() - t_gravacao)
+            if resultado:
+                itens, licitacao_id = resultado["itens"], resultado["ids"][0]
+                _finalizar(job_id, CONCLUIDO, inicio, itens=itens, licitacao_id=licitacao_id)
+            else:
+                _finalizar(job_id, FALHOU, inicio, erro="Falha ao gravar no banco")
+    except Exception as e:
+        logger.error(f"❌ Job #{job_id} falhou: {e}")
+        _finalizar(job_id, FALHOU, inicio, erro=str(e))
+    finally:
+        if os.path.exists(caminho_pdf): os.remove(caminho_pdf)
+
+    if perfil and perfil.estagios:
+        perfil.registrar_log(nome_arquivo)
+        gravar_metricas(perfil, nome_arquivo, dono_id, licitacao_id, MOTOR_PADRAO, itens)
+
+def loop_worker(nome, parar_quando_vazio=False):
+    """Laço de um processo do pool: reserva, processa, repete (e varre órfãos a cada INTERVALO_VARREDURA)."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    garantir_schema()
+    ultima_varredura = time.monotonic()
+    while True:
+        if time.monotonic() - ultima_varredura >= INTERVALO_VARREDURA:
+            ultima_varredura = time.monotonic()
+            try:
+                devolver_jobs_orfaos()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Varredura de jobs órfãos falhou: {e}")
+        job_id = reservar_proximo_job(nome)
+        if job_id is None:
+            if parar_quando_vazio: return
+            time.sleep(INTERVALO_POLL)
+            continue
+        processar_job(job_id)
+
+# ==============================================================================
+# POOL LOCAL
+# ==============================================================================
+def devolver_jobs_orfaos(minutos=MINUTOS_ORFAO):
+    """
+    Jobs PROCESSANDO sem batimento recente (worker morreu no meio) voltam para a fila.
+    Quem já foi reservado MAX_TENTATIVAS vezes vai para FALHOU (o PDF provavelmente
+    derruba o worker). Jobs de outros pools que ainda estão vivos não são tocados.
+    """
+    limite = f"-{minutos} minutes"
+    with banco.transacao() as conexao:
+        esgotados = conexao.execute("""
+            SELECT id, caminho_pdf FROM jobs WHERE status = ? AND atualizado_em < datetime('now', ?) AND tentativas >= ?
+        """, (PROCESSANDO, limite, MAX_TENTATIVAS)).fetchall()
+        conexao.executemany("""
+            UPDATE jobs SET status = ?, erro = ?, finalizado_em = CURRENT_TIMESTAMP WHERE id = ?
+        """, [(FALHOU, f"O worker caiu nas {MAX_TENTATIVAS} tentativas de processar este PDF", job_id)
+              for job_id, _ in esgotados])
+        devolvidos = conexao.execute("""
+            UPDATE jobs SET status = ?, worker = NULL, paginas_lidas = 0
+            WHERE status = ? AND atualizado_em < datetime('now', ?)
+        """, (NA_FILA, PROCESSANDO, limite)).rowcount
+    for job_id, caminho_pdf in esgotados:
+        if os.path.exists(caminho_pdf): os.remove(caminho_pdf)
+        logger.error(f"❌ Job #{job_id} desistido após {MAX_TENTATIVAS} tentativas.")
+    if devolvidos:
+        logger.warning(f"♻️ {devolvidos} jobs órfãos devolvidos para a fila.")
+    return devolvidos
+
+def iniciar_pool(workers=WORKERS_PADRAO):
+    """Sobe N processos consumidores (daemon: morrem junto com o processo pai)."""
+    garantir_schema()
+    devolver_jobs_orfaos()
+    processos = []
+    for n in range(workers):
+        nome = f"{socket.gethostname()}-{os.getpid()}-w{n + 1}"
+        p = multiprocessing.Process(target=loop_worker, args=(nome,), daemon=True, name=nome)
+        p.start()
+        processos.append(p)
+    logger.info(f"🏭 Pool local com {workers} workers no ar.")
+    return processos
+
+_pool_do_processo = []
+
+def garantir_pool(workers=WORKERS_PADRAO):
+    """
+    Usado pelo app: sobe o pool local uma vez por processo do servidor (não por aba/sessão).
+    Com LICITACLOUD_WORKERS=0 ou backend Celery o app não sobe workers (rodam à parte).
+    """
+    if BACKEND_FILA != "local" or workers <= 0: return
+    if _pool_do_processo and all(p.is_alive() for p in _pool_do_processo): return
+    _pool_do_processo[:] = iniciar_pool(workers)
+
+# ==============================================================================
+# BACKEND CELERY (OPCIONAL)
+# ==============================================================================
+_celery = None
+
+def _app_celery():
+    """Só importa o Celery quando o backend é usado (dependência opcional)."""
+    global _celery
+    if _celery is None:
+        from celery import Celery
+        _celery = Celery("licitacloud", broker=BROKER_CELERY)
+        _celery.task(name="licitacloud.processar_job")(_tarefa_celery)
+    return _celery
+
+def _tarefa_celery(job_id):
+    """No Celery quem entrega o job é o broker; a tabela só registra a reserva."""
+    with banco.transacao() as conexao:
+        reservado = _reservar(conexao, job_id, f"celery-{socket.gethostname()}-{os.getpid()}")
+    if reservado:
+        processar_job(job_id)
+
+if BACKEND_FILA == "celery":
+    # Para o worker: LICITACLOUD_FILA=celery celery -A fila worker
+    celery = _app_celery()
+
+# ==============================================================================
+# EXECUÇÃO DIRETA: python fila.py [workers]
+# ==============================================================================
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else WORKERS_PADRAO
+    processos = iniciar_pool(total)
+    try:
+        for p in processos: p.join()
+    except KeyboardInterrupt:
+        print("\n--- Encerrando workers ---")
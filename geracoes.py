@@ -0,0 +1,35 @@
+import os
+import time
+
+from setup_banco import CAMINHO_BANCO
+
+# ==============================================================================
+# GERAÇÕES DOS DADOS (INVALIDAÇÃO DO CACHE DE LEITURA DO APP)
+# ==============================================================================
+# Cada escrita carimba um arquivo-marcador (um por escopo e usuário) ao lado do
+# banco, e o app usa o carimbo como parte da chave do cache: mudou o marcador,
+# a próxima leitura vai ao banco. Sendo arquivo (e não memória), vale também
+# para as escritas dos workers da fila, que rodam em outros processos, e
+# conferir a geração custa um stat, nenhuma consulta SQL.
+# Escopos: "usuarios" (global), "catalogo" e "licitacoes" (por usuário).
+
+def _marcador(escopo, dono_id=None):
+    nome = escopo if dono_id is None else f"{escopo}-{dono_id}"
+    return os.path.join(f"{CAMINHO_BANCO}.geracoes", nome)
+
+def geracao(escopo, dono_id=None):
+    """Carimbo atual do escopo (0 se nunca houve escrita registrada)."""
+    try:
+        return os.stat(_marcador(escopo, dono_id)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+def invalidar(escopo, dono_id=None):
+    """Chamado depois de cada escrita que commitou."""
+    caminho = _marcador(escopo, dono_id)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    # Sempre avança, mesmo com duas escritas no mesmo tique do relógio
+    carimbo = max(time.time_ns(), geracao(escopo, dono_id) + 1)
+    with open(caminho, "a"):
+        pass
+    os.utime(caminho, ns=(carimbo, carimbo))
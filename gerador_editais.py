@@ -0,0 +1,166 @@
+import sys
+import zlib
+import random
+
+# ==============================================================================
+# GERADOR DE EDITAIS SINTÉTICOS (PDF ESCRITO NA MÃO, SEM DEPENDÊNCIAS)
+# ==============================================================================
+# Serve para o benchmark rodar offline e de forma reproduzível: a mesma
+# configuração + semente gera sempre o mesmo PDF, byte a byte.
+
+CONFIG_PADRAO = {
+    "paginas": 20,
+    "linhas_por_pagina": 50,
+    "densidade_itens": 0.15,        # Fração das linhas que viram item de T.I.
+    "layout": "tabela",             # tabela / lista / colunas
+    "posicao_preco": "mesma_linha", # mesma_linha / abaixo / acima / sem_preco
+    "posicao_qtd": "inicio",        # inicio / explicita / sem_qtd
+    "semente": 42,
+}
+
+LAYOUTS = ("tabela", "lista", "colunas")
+POSICOES_PRECO = ("mesma_linha", "abaixo", "acima", "sem_preco")
+POSICOES_QTD = ("inicio", "explicita", "sem_qtd")
+
+# Texto jurídico de enchimento (a maior parte de um edital real)
+FRASES_RUIDO = [
+    "O licitante deverá apresentar a documentação exigida no item 8.3 deste Termo de Referência.",
+    "A contratada responderá pelos danos causados diretamente à Administração ou a terceiros.",
+    "Prazo de entrega: até 30 (trinta) dias corridos a contar do recebimento da nota de empenho.",
+    "Dotação orçamentária conforme programa de trabalho e elemento de despesa indicado.",
+    "A garantia mínima exigida é de 36 meses on-site, com atendimento em horário comercial.",
+    "Os pagamentos serão efetuados em até 30 dias após o atesto da nota fiscal.",
+    "Será desclassificada a proposta que apresentar preço manifestamente inexequível.",
+    "As especificações técnicas mínimas constam do Anexo I deste instrumento convocatório.",
+]
+
+# Geradores de descrição por categoria (cada um sorteia uma especificação)
+DESCRICOES = [
+    lambda r: f"Computador Processador i{r.choice([3, 5, 7, 9])}-{r.randint(10, 14)}{r.randint(100, 900)}, "
+              f"memória {r.choice([8, 16, 32])} GB DDR{r.choice([4, 5])}, SSD {r.choice([256, 512, 1])} "
+              f"{'GB' if r.random() < 0.8 else 'TB'}",
+    lambda r: f"Notebook Processador Ryzen {r.choice([5, 7])} {r.choice([5600, 5700, 7530])}U, {r.choice([8, 16])} GB DDR4",
+    lambda r: f"Servidor Processador Xeon {r.choice(['E5', 'Silver', 'Gold'])}, NVMe M.2 {r.choice([1, 2])} TB",
+    lambda r: f"Monitor LED de {r.choice([21, 23, 24, 27])} pol Full HD {r.choice([60, 75, 144])}hz",
+    lambda r: f"Switch de {r.choice([8, 16, 24, 48])} portas gerenciável, cabo UTP Cat{r.choice(['5e', '6', '6a'])}",
+    lambda r: f"Nobreak de {r.choice(['1.5', '2', '3'])} kVA senoidal",
+    lambda r: r.choice(["Teclado USB ABNT2", "Mouse optico USB", "Webcam HD 1080p", "Headset com microfone"]),
+    lambda r: f"Licença Windows {r.choice([10, 11])} Pro e Office {r.choice([2019, 2021, 365])}",
+    lambda r: f"Impressora multifuncional laser, Toner para {r.choice(['hp-85a', 'tn-1060', 'mlt-d111'])}",
+]
+
+def _dinheiro(valor):
+    """1234.5 -> '1.234,50' (formato brasileiro)."""
+    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def _linhas_item(rnd, config, numero):
+    """Monta as linhas de um item conforme layout e posições de preço/quantidade."""
+    desc = rnd.choice(DESCRICOES)(rnd)
+    qtd = rnd.randint(1, 200)
+    preco = f"R$ {_dinheiro(rnd.uniform(50, 15000))}"
+    layout, pos_preco, pos_qtd = config["layout"], config["posicao_preco"], config["posicao_qtd"]
+
+    if layout == "lista":
+        linhas = [f"Item {numero}: {desc}"]
+        if pos_qtd != "sem_qtd": linhas.append(f"Quantidade: {qtd}")
+        linha_preco = f"Valor unitário estimado: {preco}"
+    else:
+        sep = "    " if layout == "colunas" else " "
+        partes = []
+        if pos_qtd == "inicio": partes.append(str(qtd))
+        partes.append(desc)
+        if layout == "colunas": partes.append("UN")
+        if pos_qtd == "explicita": partes.append(f"Qtd: {qtd}")
+        if pos_preco == "mesma_linha": partes.append(preco)
+        linhas = [sep.join(partes)]
+        linha_preco = f"Valor estimado: {preco}"
+
+    if pos_preco == "abaixo" or (layout == "lista" and pos_preco == "mesma_linha"):
+        linhas.append(linha_preco)
+    elif pos_preco == "acima":
+        linhas.insert(0, linha_preco)
+    return linhas
+
+def gerar_texto_edital(config=None):
+    """Lista de páginas, cada uma uma lista de linhas. Determinístico pela semente."""
+    config = {**CONFIG_PADRAO, **(config or {})}
+    rnd = random.Random(config["semente"])
+    paginas, numero_item = [], 0
+    for _ in range(config["paginas"]):
+        linhas = []
+        while len(linhas) < config["linhas_por_pagina"]:
+            if rnd.random() < config["densidade_itens"]:
+                bloco = _linhas_item(rnd, config, numero_item + 1)
+                if len(linhas) + len(bloco) > config["linhas_por_pagina"]: break # Não cabe: fecha a página
+                numero_item += 1
+                linhas.extend(bloco)
+            else:
+                linhas.append(rnd.choice(FRASES_RUIDO))
+        paginas.append(linhas)
+    return paginas, numero_item
+
+# ==============================================================================
+# ESCRITA DO PDF (OBJETOS + XREF)
+# ==============================================================================
+def _escapar(texto):
+    dados = texto.encode("cp1252", errors="replace")
+    return dados.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+def _conteudo_pagina(linhas, tamanho_fonte=8, entrelinha=14):
+    partes = [f"BT /F1 {tamanho_fonte} Tf {entrelinha} TL 36 806 Td".encode()]
+    for linha in linhas:
+        partes.append(b"(" + _escapar(linha) + b") Tj T*")
+    partes.append(b"ET")
+    return zlib.compress(b"\n".join(partes))
+
+def escrever_pdf(caminho, paginas):
+    """PDF 1.4 mínimo: Helvetica WinAnsi, uma stream comprimida por página."""
+    objetos = []                              # Corpo de cada objeto (índice + 1 = número)
+    objetos.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objetos.append(None)                      # Pages: preenchido depois de saber os filhos
+    objetos.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    filhos = []
+    for linhas in paginas:
+        stream = _conteudo_pagina(linhas)
+        objetos.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        num_conteudo = len(objetos)
+        objetos.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % num_conteudo)
+        filhos.append(len(objetos))
+    kids = b" ".join(b"%d 0 R" % n for n in filhos)
+    objetos[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(filhos)
+
+    saida = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for numero, corpo in enumerate(objetos, start=1):
+        offsets.append(len(saida))
+        saida += b"%d 0 obj\n" % numero + corpo + b"\nendobj\n"
+    inicio_xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for offset in offsets:
+        saida += b"%010d 00000 n \n" % offset
+    saida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+
+    with open(caminho, "wb") as f:
+        f.write(saida)
+
+def gerar_edital(caminho, config=None):
+    """Gera o PDF e devolve os metadados (páginas, linhas e itens plantados)."""
+    config = {**CONFIG_PADRAO, **(config or {})}
+    paginas, itens = gerar_texto_edital(config)
+    escrever_pdf(caminho, paginas)
+    return {"caminho": caminho, "paginas": len(paginas), "linhas": sum(len(p) for p in paginas),
+            "itens_plantados": itens, "config": config}
+
+# ==============================================================================
+# EXECUÇÃO DIRETA: python gerador_editais.py saida.pdf [paginas] [layout]
+# ==============================================================================
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python gerador_editais.py saida.pdf [paginas] [layout]")
+        sys.exit(1)
+    config = {}
+    if len(sys.argv) > 2: config["paginas"] = int(sys.argv[2])
+    if len(sys.argv) > 3: config["layout"] = sys.argv[3]
+    meta = gerar_edital(sys.argv[1], config)
+    print(f"✅ {meta['caminho']}: {meta['paginas']} páginas, {meta['linhas']} linhas, {meta['itens_plantados']} itens")
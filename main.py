@@ -2,8 +2,29 @@ import sqlite3
 import pdfplumber
 import re
 import os
+import json
+import time
+import zlib
+import hashlib
+import atexit
+import inspect
 import logging
+import threading
+import argparse
 from datetime import datetime
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import pypdfium2 as pdfium # Motor rápido (opcional)
+except ImportError:
+    pdfium = None
+
+import banco
+import geracoes
+from referencias import atualizar_referencias, recalcular_tudo
+from setup_banco import garantir_schema
+from perfil import PERFIL_ATIVO, PerfilExtracao, linhas_metricas, inserir_metricas
 
 # ==============================================================================
 # CONFIGURAÇÃO DE LOGS (Para você ver o que a IA está pensando)
@@ -11,6 +32,15 @@ from datetime import datetime
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Cache de extração: teto de tamanho (soma dos resultados comprimidos) e idade máxima
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+CACHE_MAX_DIAS = 90
+# Texto das páginas guardado na primeira leitura (paginas_texto), base do reprocessar()
+GUARDAR_TEXTO = os.environ.get("LICITACLOUD_GUARDAR_TEXTO", "1") != "0"
+# Mesma política do cache (idade + LRU por tamanho), com prazo maior: é o que permite reprocessar
+TEXTO_MAX_BYTES = 500 * 1024 * 1024
+TEXTO_MAX_DIAS = 365
+
 # ==============================================================================
 # 1. PADRÕES DE REGEX (A "MEMÓRIA" DA IA)
 # ==============================================================================
@@ -30,6 +60,70 @@ PATTERNS = {
 # Palavras que indicam que NÃO é um item técnico (Filtro de Ruído)
 DENY_LIST = ["licitacao", "pregao", "edital", "objeto", "data", "assinatura", "contrato", "cnpj", "cpf"]
 
+# Gatilhos: literais que TODO match da categoria obrigatoriamente contém.
+# Servem de pré-filtro barato: se nenhum gatilho aparece na linha, o regex
+# pesado da categoria nem roda. Ao mexer em PATTERNS, revise esta lista
+# (categoria sem gatilho roda sempre, nunca perde match).
+GATILHOS = {
+    "processador": ["processador", "cpu", "chip"],
+    "ram": ["gb", "giga"],
+    "armazenamento": ["ssd", "nvme", "hd"],
+    "monitor": ["monitor", "tela", "hz", "full", "4k"],
+    "impressao": ["multifuncional", "impressora", "toner"],
+    "rede": ["switch", "cat", "patch", "cabo"],
+    "energia": ["nobreak", "ups", "estabilizador"],
+    "perifericos": ["teclado", "mouse", "webcam", "headset"],
+    "software": ["windows", "office", "antivirus"],
+}
+
+# ==============================================================================
+# 1.1 SCANNER (MONTADO UMA VEZ NO IMPORT)
+# ==============================================================================
+PADROES_COMPILADOS = {cat: re.compile(regex) for cat, regex in PATTERNS.items()}
+
+def _montar_scanner():
+    """
+    Junta os gatilhos de todas as categorias numa única alternação.
+    O lookahead deixa o finditer reportar gatilhos sobrepostos, e cada literal
+    herda as categorias dos gatilhos que são prefixo dele (mesma posição).
+    """
+    literais = sorted({g for lista in GATILHOS.values() for g in lista}, key=len, reverse=True)
+    mapa = {
+        lit: {cat for cat, lista in GATILHOS.items() if any(lit.startswith(g) for g in lista)}
+        for lit in literais
+    }
+    regex = re.compile("(?=(" + "|".join(re.escape(lit) for lit in literais) + "))")
+    sempre = [cat for cat in PATTERNS if not GATILHOS.get(cat)]
+    return regex, mapa, sempre
+
+GATILHO_RE, MAPA_GATILHOS, CATEGORIAS_SEM_GATILHO = _montar_scanner()
+
+def escanear_linha(linha_clean, perfil=None):
+    """
+    Uma passada na linha: descobre quais categorias podem bater e só então roda
+    o regex compilado delas. Retorna [(categoria, match)] na ordem de PATTERNS,
+    idêntico a fazer re.search de cada padrão na linha.
+    Com `perfil` (PerfilExtracao), cronometra cada regex que rodou.
+    """
+    candidatas = set(CATEGORIAS_SEM_GATILHO)
+    for m in GATILHO_RE.finditer(linha_clean):
+        candidatas |= MAPA_GATILHOS[m.group(1)]
+    if not candidatas:
+        return []
+
+    resultados = []
+    for categoria, regex in PADROES_COMPILADOS.items():
+        if categoria in candidatas:
+            if perfil is None:
+                match = regex.search(linha_clean)
+            else:
+                inicio = time.perf_counter()
+                match = regex.search(linha_clean)
+                perfil.contar_regex(categoria, time.perf_counter() - inicio, match is not None)
+            if match:
+                resultados.append((categoria, match))
+    return resultados
+
 # ==============================================================================
 # 2. FUNÇÕES UTILITÁRIAS (FERRAMENTAS)
 # ==============================================================================
@@ -54,6 +148,14 @@ def converter_dinheiro(valor_str):
     except ValueError:
         return 0.0
 
+# Tokens numéricos do contexto (compilados uma vez; o 'r$' minúsculo é de propósito)
+RE_MOEDA_RS = re.compile(r'r\$\s?(\d{1,3}(?:\.\d{3})*,\d{2})')
+RE_MOEDA = re.compile(r'(\d{1,3}(?:\.\d{3})*,\d{2})')
+RE_QTD_EXPLICITA = re.compile(r'(?:qtde|qtd|quant|unid|unidade)[\.:\s]*(\d+)')
+RE_QTD_INICIO = re.compile(r'^(\d+)\s')
+PALAVRAS_PRECO = ("valor", "unit", "estimado")
+ANOS_IGNORAR = frozenset(str(y) for y in range(2020, 2030)) # Evita falso positivo de quantidade
+
 def extrair_valor_contexto(bloco_texto):
     """
     Busca agressiva por preços no bloco de texto (linhas vizinhas).
@@ -61,14 +163,14 @@ def extrair_valor_contexto(bloco_texto):
     """
     # 1. Tenta achar com R$ (mais confiável)
     # Ex: R$ 1.500,00
-    match_moeda = re.search(r'r\$\s?(\d{1,3}(?:\.\d{3})*,\d{2})', bloco_texto)
+    match_moeda = RE_MOEDA_RS.search(bloco_texto)
     if match_moeda:
         return converter_dinheiro(match_moeda.group(1))
     
     # 2. Se não achar, tenta achar formato monetário XX,XX próximo a palavras chave
     # Ex: Valor Unit: 1.500,00
-    if "valor" in bloco_texto or "unit" in bloco_texto or "estimado" in bloco_texto:
-        match_num = re.search(r'(\d{1,3}(?:\.\d{3})*,\d{2})', bloco_texto)
+    if any(palavra in bloco_texto for palavra in PALAVRAS_PRECO):
+        match_num = RE_MOEDA.search(bloco_texto)
         if match_num:
             return converter_dinheiro(match_num.group(1))
             
@@ -80,28 +182,82 @@ def extrair_quantidade_contexto(bloco_texto):
     """
     bloco = bloco_texto.lower()
     
-    # Lista de anos para ignorar (evita falso positivo)
-    anos_ignorar = [str(y) for y in range(2020, 2030)]
-    
     # 1. Busca explícita (qtde: 10)
-    match_expl = re.search(r'(?:qtde|qtd|quant|unid|unidade)[\.:\s]*(\d+)', bloco)
+    match_expl = RE_QTD_EXPLICITA.search(bloco)
     if match_expl: 
         val = int(match_expl.group(1))
-        if str(val) not in anos_ignorar: return val
+        if str(val) not in ANOS_IGNORAR: return val
 
     # 2. Busca o primeiro número inteiro isolado na linha (comum em tabelas)
     # Ex: "10   Computador..."
-    match_inicio = re.match(r'^(\d+)\s', bloco.strip())
+    match_inicio = RE_QTD_INICIO.match(bloco.strip())
     if match_inicio:
         val = int(match_inicio.group(1))
         # Filtros de sanidade:
         # - Menor que 10000 (ninguém compra 20 mil computadores num edital comum)
         # - Não é um ano
-        if 0 < val < 10000 and str(val) not in anos_ignorar:
+        if 0 < val < 10000 and str(val) not in ANOS_IGNORAR:
             return val
             
     return 1 # Padrão seguro
 
+class IndiceContexto:
+    """
+    Tokens numéricos de uma página, lidos uma vez por linha e reaproveitados por
+    todos os achados vizinhos. Dá o mesmo resultado de extrair_valor_contexto no
+    bloco de 4 linhas (anterior, atual, 2 próximas) e de extrair_quantidade_contexto
+    na linha do achado, sem remontar o bloco nem repetir regex por achado.
+    """
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self._tokens = {}      # idx -> (valor com R$, R$ no fim da linha, valor sem R$, palavra-chave)
+        self._precos = {}
+        self._quantidades = {}
+
+    def _tokens_da_linha(self, idx):
+        tokens = self._tokens.get(idx)
+        if tokens is None:
+            linha = self.linhas[idx]
+            valor_rs = valor = None
+            if "," in linha: # Sem vírgula não há valor monetário
+                match = RE_MOEDA_RS.search(linha)
+                if match: valor_rs = converter_dinheiro(match.group(1))
+                match = RE_MOEDA.search(linha)
+                if match: valor = converter_dinheiro(match.group(1))
+            palavra = any(p in linha for p in PALAVRAS_PRECO)
+            tokens = self._tokens[idx] = (valor_rs, linha.endswith("r$"), valor, palavra)
+        return tokens
+
+    def preco(self, idx):
+        if idx in self._precos:
+            return self._precos[idx]
+        linhas_bloco = range(max(0, idx - 1), min(len(self.linhas), idx + 3))
+        tokens = [self._tokens_da_linha(i) for i in linhas_bloco]
+        preco = None
+
+        # 1. R$ explícito, na ordem do bloco (inclui "R$" numa linha e o valor no começo da seguinte)
+        for i, (valor_rs, quebra, _, _) in zip(linhas_bloco, tokens):
+            if valor_rs is not None:
+                preco = valor_rs
+                break
+            if quebra and i + 1 in linhas_bloco:
+                match = RE_MOEDA.match(self.linhas[i + 1])
+                if match:
+                    preco = converter_dinheiro(match.group(1))
+                    break
+
+        # 2. Primeiro valor monetário do bloco, se houver palavra-chave em alguma linha
+        if preco is None and any(t[3] for t in tokens):
+            preco = next((t[2] for t in tokens if t[2] is not None), None)
+
+        preco = self._precos[idx] = 0.0 if preco is None else preco
+        return preco
+
+    def quantidade(self, idx, linha_clean):
+        if idx not in self._quantidades:
+            self._quantidades[idx] = extrair_quantidade_contexto(linha_clean)
+        return self._quantidades[idx]
+
 def validar_item(categoria, texto):
     """O Guardião: Decide se o texto é lixo ou item real."""
     texto = texto.lower()
@@ -126,66 +282,259 @@ def validar_item(categoria, texto):
 # ==============================================================================
 # 3. CORE: A INTELIGÊNCIA DE EXTRAÇÃO (V9 ENTERPRISE)
 # ==============================================================================
-def extrair_dados_pdf(caminho_pdf):
+def processar_pagina(texto_pagina, numero_pagina, perfil=None):
+    """
+    Roda o scanner numa página já extraída.
+    Retorna [(categoria, item)] na ordem em que aparecem no texto.
+    Com `perfil`, soma o tempo dos estágios scanner/contexto e as rejeições por categoria.
+    """
+    achados = []
+    linhas = texto_pagina.split('\n')
+    indice = IndiceContexto(linhas)
+    seg_scanner = seg_contexto = 0.0
+
+    # Itera sobre as linhas da página
+    for idx_linha, linha in enumerate(linhas):
+        if perfil: inicio = time.perf_counter()
+        linha_clean = normalizar_texto(linha)
+
+        # Uma passada só: todas as categorias de T.I. que batem na linha
+        encontrados = escanear_linha(linha_clean, perfil)
+        if perfil: seg_scanner += time.perf_counter() - inicio
+
+        for categoria, match in encontrados:
+            item_encontrado = match.group(0)
+
+            # Validação de Qualidade
+            if not validar_item(categoria, item_encontrado):
+                if perfil: perfil.rejeitar(categoria)
+                continue
+
+            if perfil: inicio = time.perf_counter()
+            # --- CONTEXTO EXPANDIDO (VISÃO 360) ---
+            # Preço na linha anterior, na atual ou nas 2 próximas (o preço pode estar acima
+            # ou abaixo); qtd geralmente está na mesma linha. Resolvidos pelo índice da página.
+            preco = indice.preco(idx_linha)
+            qtd = indice.quantidade(idx_linha, linha_clean)
+            if perfil: seg_contexto += time.perf_counter() - inicio
+
+            # Log para debug (ajuda a entender erros)
+            logger.debug(f"[{categoria.upper()}] Item: {item_encontrado} | Preço: {preco} | Qtd: {qtd}")
+            
+            achados.append((categoria, {
+                "desc": item_encontrado,
+                "qtd": qtd,
+                "preco": preco,
+                "pagina": numero_pagina # Bom para auditoria futura
+            }))
+
+    if perfil:
+        perfil.somar("scanner", seg_scanner)
+        perfil.somar("contexto", seg_contexto)
+    return achados
+
+# ==============================================================================
+# 3.1 MOTORES DE LEITURA DE TEXTO (PDFPLUMBER / PYPDFIUM2 / AUTO)
+# ==============================================================================
+# pdfplumber: análise de layout em Python puro (referência, mas lento).
+# pypdfium2: extração nativa do PDFium, dezenas de vezes mais rápida.
+# auto: PDFium em todas as páginas e pdfplumber só nas que saírem com cara de lixo.
+MOTORES = ("pdfplumber", "pypdfium2", "auto")
+MOTOR_PADRAO = os.environ.get("LICITACLOUD_MOTOR", "pdfplumber")
+
+def _texto_pdfplumber(pdf, i):
+    pagina = pdf.pages[i]
+    texto = pagina.extract_text()
+    # O pdfplumber guarda o layout parseado (chars, textmap) até o fim do `with`,
+    # e é isso que estoura a RAM em editais gigantes: fecha a página logo após ler
+    pagina.close()
+    return texto
+
+def _texto_pdfium(doc, i):
+    pagina = doc[i]
+    textpage = pagina.get_textpage()
+    texto = textpage.get_text_bounded()
+    textpage.close()
+    pagina.close()
+    return texto.replace('\r\n', '\n')
+
+def texto_degradado(texto):
+    """
+    Heurística do modo auto: página vazia, cheia de caracteres de substituição/controle
+    (fonte sem mapa Unicode) ou quase sem letras e números pede a leitura do pdfplumber.
+    """
+    if not texto or not texto.strip(): return True
+    total = len(texto)
+    lixo = sum(1 for c in texto if c == '\ufffd' or (ord(c) < 32 and c not in '\n\t'))
+    if lixo / total > 0.05: return True
+    uteis = sum(1 for c in texto if c.isalnum() or c.isspace())
+    return uteis / total < 0.6
+
+@contextmanager
+def abrir_leitor(caminho_pdf, motor=None):
+    """
+    Abre o PDF no motor pedido e entrega (total_paginas, ler_pagina), onde
+    ler_pagina(i) devolve o texto da página i (base 0) com quebras de linha '\n'.
+    """
+    motor = motor or MOTOR_PADRAO
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de leitura desconhecido: {motor} (use {', '.join(MOTORES)})")
+    if pdfium is None and motor != "pdfplumber":
+        if motor == "pypdfium2": raise ImportError("pypdfium2 não está instalado")
+        motor = "pdfplumber" # auto sem PDFium vira pdfplumber puro
+
+    if motor == "pdfplumber":
+        with pdfplumber.open(caminho_pdf) as pdf:
+            yield len(pdf.pages), lambda i: _texto_pdfplumber(pdf, i)
+        return
+
+    doc = pdfium.PdfDocument(caminho_pdf)
+    reserva = {"pdf": None, "paginas": 0} # pdfplumber só é aberto se alguma página precisar
+    def ler_pagina(i):
+        texto = _texto_pdfium(doc, i)
+        if motor == "auto" and texto_degradado(texto):
+            if reserva["pdf"] is None: reserva["pdf"] = pdfplumber.open(caminho_pdf)
+            reserva["paginas"] += 1
+            texto = _texto_pdfplumber(reserva["pdf"], i)
+        return texto
+    try:
+        yield len(doc), ler_pagina
+    finally:
+        if reserva["pdf"] is not None:
+            logger.info(f"↩️ Motor auto: {reserva['paginas']} página(s) relidas com pdfplumber.")
+            reserva["pdf"].close()
+        doc.close()
+
+def _varrer_paginas(caminho_pdf, inicio=0, fim=None, motor=None, perfil=None, textos=None):
+    """
+    Gera (numero_pagina, achados) para as páginas [inicio, fim), abrindo o PDF por conta própria.
+    Com `textos` (dict), guarda nele o texto comprimido de cada página não vazia.
+    """
+    t_abrir = time.perf_counter()
+    with abrir_leitor(caminho_pdf, motor) as (total_paginas, ler_pagina):
+        if perfil: perfil.somar("abrir", time.perf_counter() - t_abrir)
+        if fim is None: fim = total_paginas
+        for i in range(inicio, fim):
+            if perfil is None:
+                texto_pagina = ler_pagina(i)
+                if textos is not None and texto_pagina: textos[i + 1] = zlib.compress(texto_pagina.encode())
+                yield i + 1, processar_pagina(texto_pagina, i + 1) if texto_pagina else []
+                continue
+
+            t_texto = time.perf_counter()
+            texto_pagina = ler_pagina(i)
+            if textos is not None and texto_pagina: textos[i + 1] = zlib.compress(texto_pagina.encode())
+            t_analise = time.perf_counter()
+            achados = processar_pagina(texto_pagina, i + 1, perfil) if texto_pagina else []
+            t_fim = time.perf_counter()
+            perfil.somar("texto", t_analise - t_texto)
+            perfil.registrar_pagina(i + 1, t_analise - t_texto, t_fim - t_analise,
+                                    texto_pagina.count('\n') + 1 if texto_pagina else 0, len(achados))
+            yield i + 1, achados
+
+def _extrair_intervalo(caminho_pdf, inicio, fim, motor=None, perfil=None, textos=None):
+    """
+    Trabalho de cada processo do pool (documentos abertos não atravessam processos).
+    Retorna (achados, perfil da fatia, textos da fatia), que voltam para o processo pai juntar.
+    """
+    achados = [achado for _, achados in _varrer_paginas(caminho_pdf, inicio, fim, motor, perfil, textos) for achado in achados]
+    return achados, perfil, textos
+
+def _dividir_paginas(total_paginas, workers):
+    """Fatias contíguas de páginas; 2 por worker para equilibrar páginas pesadas. PDF sem páginas: nenhuma."""
+    if total_paginas <= 0: return []
+    fatias = max(1, min(total_paginas, workers * 2))
+    tamanho = -(-total_paginas // fatias) # Divisão arredondando pra cima
+    return [(ini, min(ini + tamanho, total_paginas)) for ini in range(0, total_paginas, tamanho)]
+
+def _achados_por_pagina(caminho_pdf, workers, progresso, motor=None, perfil=None, textos=None):
+    """Fonte bruta de achados (com repetidos), sequencial ou via pool, sempre na ordem das páginas."""
+    t_abrir = time.perf_counter()
+    with abrir_leitor(caminho_pdf, motor) as (total_paginas, _):
+        pass # Só a contagem de páginas
+    if perfil: perfil.somar("abrir", time.perf_counter() - t_abrir)
+
+    if workers > 1 and total_paginas > 0: # Sem páginas não vale subir o pool
+        intervalos = _dividir_paginas(total_paginas, workers)
+        logger.info(f"⚡ Modo paralelo: {total_paginas} páginas em {len(intervalos)} fatias / {workers} processos")
+        
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = [pool.submit(_extrair_intervalo, caminho_pdf, ini, fim, motor, type(perfil)() if perfil else None,
+                                   {} if textos is not None else None)
+                       for ini, fim in intervalos]
+            # Consome na ordem das páginas (a ordem das fatias), não na ordem de término
+            for (ini, fim), futuro in zip(intervalos, futuros):
+                achados, perfil_fatia, textos_fatia = futuro.result()
+                if perfil: perfil.juntar(perfil_fatia)
+                if textos is not None: textos.update(textos_fatia)
+                yield from achados
+                if progresso: progresso(fim, total_paginas)
+    else:
+        for numero_pagina, achados in _varrer_paginas(caminho_pdf, motor=motor, perfil=perfil, textos=textos):
+            yield from achados
+            if progresso: progresso(numero_pagina, total_paginas)
+
+def _sem_repetidos(achados):
+    # Remove duplicatas exatas (mesmo item, mesmo preço, mesma qtd)
+    # Isso acontece se o regex pegar a mesma coisa 2x
+    vistos = set()
+    for categoria, item in achados:
+        chave = (categoria, tuple(item.items()))
+        if chave in vistos: continue
+        vistos.add(chave)
+        yield categoria, item
+
+def iterar_itens_pdf(caminho_pdf, progresso=None, workers=1, motor=None, perfil=None, textos=None):
+    """
+    API em streaming: gera (categoria, item) página a página, sem montar o resultado inteiro.
+    `progresso(paginas_lidas, total_paginas)` é chamado ao fim de cada página
+    (ou de cada fatia no modo paralelo). Repetidos exatos já saem filtrados.
+    `motor` escolhe a leitura de texto (ver MOTORES); None usa MOTOR_PADRAO.
+    `perfil` (perfil.PerfilExtracao) recebe os tempos por estágio, página e categoria.
+    `textos` (dict) recebe {numero_pagina: texto comprimido} para o reprocessamento.
+    """
+    yield from _sem_repetidos(_achados_por_pagina(caminho_pdf, workers, progresso, motor, perfil, textos))
+
+def extrair_dados_pdf(caminho_pdf, workers=1, progresso=None, usar_cache=True, motor=None, perfil=None, hash_pdf=None):
+    """
+    Extrai os itens de T.I. do edital (consome iterar_itens_pdf).
+    Com workers > 1 as páginas são repartidas entre processos (modo paralelo);
+    o resultado é o mesmo do modo sequencial, na mesma ordem.
+    Se o mesmo PDF já foi lido com as mesmas regras (e o mesmo motor), devolve direto do cache.
+    Com o cache ligado, o texto das páginas lidas fica guardado para o reprocessar()
+    (num hit, o PDF é relido só para o texto se ele ainda não estiver guardado).
+    `hash_pdf` evita recalcular o hash quando quem chama já tem (para gravar na licitação).
+    """
+    motor = motor or MOTOR_PADRAO
     logger.info(f"🔄 Iniciando análise profunda em: {caminho_pdf}")
     
     dados_estruturados = {key: [] for key in PATTERNS.keys()}
     
     try:
-        with pdfplumber.open(caminho_pdf) as pdf:
-            for i, pagina in enumerate(pdf.pages):
-                texto_pagina = pagina.extract_text()
-                if not texto_pagina: continue
-                
-                linhas = texto_pagina.split('\n')
-                total_linhas = len(linhas)
-                
-                # Itera sobre as linhas da página
-                for idx_linha, linha in enumerate(linhas):
-                    linha_clean = normalizar_texto(linha)
-                    
-                    # Para cada categoria de T.I.
-                    for categoria, regex in PATTERNS.items():
-                        match = re.search(regex, linha_clean)
-                        
-                        if match:
-                            item_encontrado = match.group(0)
-                            
-                            # Validação de Qualidade
-                            if not validar_item(categoria, item_encontrado):
-                                continue
-
-                            # --- CONTEXTO EXPANDIDO (VISÃO 360) ---
-                            # Pega a linha anterior, a atual e as 2 próximas
-                            # Isso ajuda quando o preço está acima ou abaixo
-                            contexto = []
-                            if idx_linha > 0: contexto.append(linhas[idx_linha-1]) # Linha anterior
-                            contexto.append(linha) # Atual
-                            if idx_linha + 1 < total_linhas: contexto.append(linhas[idx_linha+1]) # Próxima 1
-                            if idx_linha + 2 < total_linhas: contexto.append(linhas[idx_linha+2]) # Próxima 2
-                            
-                            bloco_texto = " ".join(contexto)
-                            
-                            # Extração Financeira no Bloco
-                            preco = extrair_valor_contexto(bloco_texto)
-                            qtd = extrair_quantidade_contexto(linha_clean) # Qtd geralmente está na mesma linha
-                            
-                            # Log para debug (ajuda a entender erros)
-                            logger.debug(f"[{categoria.upper()}] Item: {item_encontrado} | Preço: {preco} | Qtd: {qtd}")
-                            
-                            # Adiciona aos resultados
-                            dados_estruturados[categoria].append({
-                                "desc": item_encontrado,
-                                "qtd": qtd,
-                                "preco": preco,
-                                "pagina": i + 1 # Bom para auditoria futura
-                            })
-
-        # Remove duplicatas exatas (mesmo item, mesmo preço, mesma qtd)
-        # Isso acontece se o regex pegar a mesma coisa 2x
-        for cat in dados_estruturados:
-            # Truque de Python para remover dicts duplicados em lista
-            dados_estruturados[cat] = [dict(t) for t in {tuple(d.items()) for d in dados_estruturados[cat]}]
+        t_cache = time.perf_counter()
+        hash_pdf = (hash_pdf or calcular_hash_pdf(caminho_pdf)) if usar_cache else None
+        if hash_pdf:
+            em_cache = buscar_cache_extracao(hash_pdf, motor)
+            if perfil: perfil.somar("cache", time.perf_counter() - t_cache)
+            if em_cache is not None:
+                if perfil: perfil.cache_hit = True
+                logger.info(f"⚡ Cache hit ({hash_pdf[:12]}): PDF já analisado com as regras atuais.")
+                if GUARDAR_TEXTO and not texto_guardado(hash_pdf):
+                    t_texto = time.perf_counter()
+                    guardar_texto_do_pdf(caminho_pdf, hash_pdf, motor)
+                    if perfil: perfil.somar("texto", time.perf_counter() - t_texto)
+                return em_cache
+
+        textos = {} if hash_pdf and GUARDAR_TEXTO else None
+        for categoria, item in iterar_itens_pdf(caminho_pdf, progresso=progresso, workers=workers, motor=motor,
+                                                perfil=perfil, textos=textos):
+            dados_estruturados[categoria].append(item)
+
+        if hash_pdf:
+            t_cache = time.perf_counter()
+            gravar_cache_extracao(hash_pdf, dados_estruturados, motor)
+            if textos is not None: gravar_paginas_texto(hash_pdf, textos, motor)
+            if perfil: perfil.somar("cache", time.perf_counter() - t_cache)
 
         logger.info(f"✅ Análise concluída.")
         return dados_estruturados
@@ -194,52 +543,655 @@ def extrair_dados_pdf(caminho_pdf):
         logger.error(f"❌ Erro crítico ao processar PDF: {e}")
         return {}
 
+# ==============================================================================
+# 3.2 CACHE DE EXTRAÇÃO (ENDEREÇADO POR CONTEÚDO)
+# ==============================================================================
+# Chave = SHA-256 dos bytes do PDF + versão das regras. Qualquer mudança em
+# PATTERNS, GATILHOS, DENY_LIST ou nas funções que decidem o resultado gera
+# outra versão, então o cache antigo simplesmente deixa de ser encontrado.
+FUNCOES_DAS_REGRAS = [_montar_scanner, escanear_linha, normalizar_texto, converter_dinheiro,
+                      extrair_valor_contexto, extrair_quantidade_contexto, IndiceContexto,
+                      validar_item, processar_pagina, _sem_repetidos]
+
+def _calcular_versao_regras():
+    h = hashlib.sha256()
+    h.update(json.dumps([PATTERNS, GATILHOS, DENY_LIST], sort_keys=True).encode())
+    for funcao in FUNCOES_DAS_REGRAS:
+        try:
+            h.update(inspect.getsource(funcao).encode())
+        except (OSError, TypeError): # Sem código-fonte disponível (ex: build congelado)
+            metodos = vars(funcao).values() if isinstance(funcao, type) else [funcao]
+            for metodo in metodos:
+                if hasattr(metodo, "__code__"): h.update(metodo.__code__.co_code)
+    return h.hexdigest()[:16]
+
+VERSAO_REGRAS = _calcular_versao_regras()
+
+def _versao_cache(motor):
+    """Motores diferentes podem ler textos diferentes: cada um tem sua entrada no cache."""
+    return f"{VERSAO_REGRAS}:{motor}"
+
+def calcular_hash_pdf(caminho_pdf):
+    """SHA-256 dos bytes do arquivo, lido em blocos para não carregar o PDF inteiro."""
+    h = hashlib.sha256()
+    with open(caminho_pdf, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+def _contar_evento_cache(cursor, evento, quantidade=1):
+    cursor.execute("""
+        INSERT INTO cache_contadores (evento, total) VALUES (?, ?)
+        ON CONFLICT(evento) DO UPDATE SET total = total + excluded.total
+    """, (evento, quantidade))
+
+# Hits ficam contados em memória e vão para o banco em lote (no próximo miss,
+# na próxima gravação ou a cada HITS_POR_LOTE): a leitura do cache não pega o
+# lock de escrita, então leitores em paralelo não ficam em fila.
+HITS_POR_LOTE = 50
+_hits_pendentes = {}
+_trava_hits = threading.Lock()
+
+def _gravar_hits_pendentes(cursor):
+    """Último acesso, acessos e o contador de hit das entradas lidas desde o último lote."""
+    with _trava_hits:
+        pendentes = list(_hits_pendentes.items())
+        _hits_pendentes.clear()
+    if not pendentes: return
+    cursor.executemany("""
+        UPDATE cache_extracao SET ultimo_acesso = CURRENT_TIMESTAMP, acessos = acessos + ?
+        WHERE hash_pdf = ? AND versao_regras = ?
+    """, [(n, hash_pdf, versao) for (hash_pdf, versao), n in pendentes])
+    _contar_evento_cache(cursor, "hit", sum(n for _, n in pendentes))
+    _marcar_acesso_textos(cursor, {hash_pdf for (hash_pdf, _), _ in pendentes}) # O texto do PDF segue em uso
+
+def descarregar_hits_cache():
+    """Grava os hits ainda em memória (chamado também na saída do processo)."""
+    if not _hits_pendentes: return
+    try:
+        with banco.transacao() as conexao:
+            _gravar_hits_pendentes(conexao.cursor())
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Não foi possível gravar os acessos do cache: {e}")
+
+atexit.register(descarregar_hits_cache)
+
+def buscar_cache_extracao(hash_pdf, motor=None):
+    """Devolve o resultado guardado ou None (miss). Erro de banco vira miss, nunca quebra a extração."""
+    try:
+        versao = _versao_cache(motor or MOTOR_PADRAO)
+        with banco.conexao() as conexao:
+            linha = conexao.execute("SELECT resultado FROM cache_extracao WHERE hash_pdf = ? AND versao_regras = ?",
+                                    (hash_pdf, versao)).fetchone()
+        if linha is None:
+            # Miss: o PDF vai ser lido inteiro, uma escrita a mais aqui não pesa
+            with banco.transacao() as conexao:
+                cursor = conexao.cursor()
+                _gravar_hits_pendentes(cursor)
+                _contar_evento_cache(cursor, "miss")
+            return None
+        with _trava_hits:
+            _hits_pendentes[(hash_pdf, versao)] = _hits_pendentes.get((hash_pdf, versao), 0) + 1
+            lote_cheio = sum(_hits_pendentes.values()) >= HITS_POR_LOTE
+        if lote_cheio: descarregar_hits_cache()
+        return json.loads(zlib.decompress(linha[0]))
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Cache de extração indisponível: {e}")
+        return None
+
+def gravar_cache_extracao(hash_pdf, dados_estruturados, motor=None):
+    try:
+        resultado = zlib.compress(json.dumps(dados_estruturados).encode())
+        with banco.transacao() as conexao:
+            conexao.execute("""
+                INSERT OR REPLACE INTO cache_extracao (hash_pdf, versao_regras, resultado, tamanho_bytes)
+                VALUES (?, ?, ?, ?)
+            """, (hash_pdf, _versao_cache(motor or MOTOR_PADRAO), resultado, len(resultado)))
+            _gravar_hits_pendentes(conexao.cursor()) # LRU com os acessos em dia antes de despejar
+            _limpar_cache_extracao(conexao.cursor())
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Não foi possível gravar no cache de extração: {e}")
+
+def _limpar_cache_extracao(cursor, max_bytes=None, max_dias=None):
+    """
+    Política de despejo: primeiro tudo que passou da idade (ou é de regras antigas),
+    depois os menos acessados recentemente (LRU) até caber no teto de bytes.
+    """
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    max_dias = CACHE_MAX_DIAS if max_dias is None else max_dias
+
+    cursor.execute("DELETE FROM cache_extracao WHERE versao_regras NOT LIKE ? OR ultimo_acesso < datetime('now', ?)",
+                   (f"{VERSAO_REGRAS}:%", f"-{max_dias} days"))
+    despejados = cursor.rowcount
+
+    cursor.execute("SELECT COALESCE(SUM(tamanho_bytes), 0) FROM cache_extracao")
+    excesso = cursor.fetchone()[0] - max_bytes
+    if excesso > 0:
+        cursor.execute("SELECT hash_pdf, versao_regras, tamanho_bytes FROM cache_extracao ORDER BY ultimo_acesso, acessos")
+        remover = []
+        for hash_pdf, versao, tamanho in cursor.fetchall():
+            if excesso <= 0: break
+            remover.append((hash_pdf, versao))
+            excesso -= tamanho
+        cursor.executemany("DELETE FROM cache_extracao WHERE hash_pdf = ? AND versao_regras = ?", remover)
+        despejados += len(remover)
+
+    if despejados:
+        _contar_evento_cache(cursor, "despejo", despejados)
+        logger.info(f"🧹 Cache de extração: {despejados} entradas despejadas.")
+    return despejados
+
+def estatisticas_cache():
+    """Contadores de hit/miss/despejo e ocupação atual do cache."""
+    descarregar_hits_cache()
+    with banco.conexao() as conexao:
+        cursor = conexao.cursor()
+        cursor.execute("SELECT evento, total FROM cache_contadores")
+        stats = {"hit": 0, "miss": 0, "despejo": 0}
+        stats.update(dict(cursor.fetchall()))
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(tamanho_bytes), 0) FROM cache_extracao")
+        stats["entradas"], stats["bytes"] = cursor.fetchone()
+        consultas = stats["hit"] + stats["miss"]
+        stats["taxa_hit"] = stats["hit"] / consultas if consultas else 0.0
+        return stats
+
+# ==============================================================================
+# 3.3 TEXTO DAS PÁGINAS (BASE DO REPROCESSAMENTO)
+# ==============================================================================
+# Guardado pelo mesmo endereço do cache (hash do PDF), no banco compartilhado:
+# o mesmo edital enviado por dois usuários tem o texto guardado uma vez só.
+# textos_guardados tem uma linha por PDF (páginas, bytes, último acesso) e o
+# despejo segue a política do cache: idade primeiro, depois LRU até caber no teto.
+# Licitação cujo texto foi despejado volta em "sem_texto" no reprocessar().
+def gravar_paginas_texto(hash_pdf, textos, motor=None):
+    """textos: {numero_pagina: texto comprimido}. Erro de banco só vira aviso (o edital segue normal)."""
+    try:
+        with banco.transacao() as conexao:
+            cursor = conexao.cursor()
+            cursor.execute("DELETE FROM paginas_texto WHERE hash_pdf = ?", (hash_pdf,)) # Sem sobra de outro motor
+            cursor.executemany("INSERT INTO paginas_texto (hash_pdf, pagina, motor, texto) VALUES (?, ?, ?, ?)",
+                               [(hash_pdf, pagina, motor or MOTOR_PADRAO, texto) for pagina, texto in textos.items()])
+            cursor.execute("INSERT OR REPLACE INTO textos_guardados (hash_pdf, paginas, tamanho_bytes) VALUES (?, ?, ?)",
+                           (hash_pdf, len(textos), sum(len(texto) for texto in textos.values())))
+            _limpar_paginas_texto(cursor)
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Não foi possível guardar o texto das páginas: {e}")
+
+def texto_guardado(hash_pdf):
+    """Se o texto desse PDF já está guardado. Erro de banco responde que sim (não relê o PDF à toa)."""
+    try:
+        with banco.conexao() as conexao:
+            return conexao.execute("SELECT 1 FROM textos_guardados WHERE hash_pdf = ?", (hash_pdf,)).fetchone() is not None
+    except sqlite3.Error:
+        return True
+
+def guardar_texto_do_pdf(caminho_pdf, hash_pdf, motor=None):
+    """Lê só o texto das páginas (sem rodar as regras) e guarda. Falha aqui não afeta o resultado do cache."""
+    textos = {}
+    try:
+        with abrir_leitor(caminho_pdf, motor) as (total_paginas, ler_pagina):
+            for i in range(total_paginas):
+                texto_pagina = ler_pagina(i)
+                if texto_pagina: textos[i + 1] = zlib.compress(texto_pagina.encode())
+    except Exception as e:
+        logger.warning(f"⚠️ Não foi possível ler o texto das páginas para guardar: {e}")
+        return
+    gravar_paginas_texto(hash_pdf, textos, motor)
+
+def _marcar_acesso_textos(cursor, hashes):
+    cursor.executemany("UPDATE textos_guardados SET ultimo_acesso = CURRENT_TIMESTAMP WHERE hash_pdf = ?",
+                       [(hash_pdf,) for hash_pdf in hashes])
+
+def _limpar_paginas_texto(cursor, max_bytes=None, max_dias=None):
+    """Despeja o texto guardado: o que passou da idade, depois os menos acessados até caber no teto."""
+    max_bytes = TEXTO_MAX_BYTES if max_bytes is None else max_bytes
+    max_dias = TEXTO_MAX_DIAS if max_dias is None else max_dias
+
+    cursor.execute("SELECT hash_pdf FROM textos_guardados WHERE ultimo_acesso < datetime('now', ?)", (f"-{max_dias} days",))
+    remover = [hash_pdf for hash_pdf, in cursor.fetchall()]
+
+    cursor.execute("SELECT COALESCE(SUM(tamanho_bytes), 0) FROM textos_guardados WHERE ultimo_acesso >= datetime('now', ?)",
+                   (f"-{max_dias} days",))
+    excesso = cursor.fetchone()[0] - max_bytes
+    if excesso > 0:
+        cursor.execute("SELECT hash_pdf, tamanho_bytes FROM textos_guardados WHERE ultimo_acesso >= datetime('now', ?) "
+                       "ORDER BY ultimo_acesso", (f"-{max_dias} days",))
+        for hash_pdf, tamanho in cursor.fetchall():
+            if excesso <= 0: break
+            remover.append(hash_pdf)
+            excesso -= tamanho
+
+    if remover:
+        cursor.executemany("DELETE FROM paginas_texto WHERE hash_pdf = ?", [(h,) for h in remover])
+        cursor.executemany("DELETE FROM textos_guardados WHERE hash_pdf = ?", [(h,) for h in remover])
+        logger.info(f"🧹 Texto guardado: {len(remover)} PDFs despejados.")
+    return len(remover)
+
+def carregar_paginas_texto(conexao, hash_pdf):
+    """[(numero_pagina, texto)] na ordem das páginas; lista vazia se o texto não foi guardado."""
+    cursor = conexao.execute("SELECT pagina, texto FROM paginas_texto WHERE hash_pdf = ? ORDER BY pagina", (hash_pdf,))
+    return [(pagina, zlib.decompress(texto).decode()) for pagina, texto in cursor]
+
+def dados_das_paginas(paginas):
+    """O mesmo resultado do extrair_dados_pdf, a partir do texto já lido: [(numero_pagina, texto)]."""
+    dados_estruturados = {key: [] for key in PATTERNS.keys()}
+    achados = (achado for numero_pagina, texto in paginas for achado in processar_pagina(texto, numero_pagina))
+    for categoria, item in _sem_repetidos(achados):
+        dados_estruturados[categoria].append(item)
+    return dados_estruturados
+
 # ==============================================================================
 # 4. CAMADA DE PERSISTÊNCIA (SALVAR NO BANCO)
 # ==============================================================================
-def salvar_no_banco(nome_arquivo, dados_extraidos, dono_id):
-    logger.info(f"💾 Persistindo dados para usuário ID {dono_id}...")
-    
-    # Usa Context Manager para garantir que o banco fecha mesmo se der erro
+def _linhas_de_itens(id_licitacao, dados_extraidos, normalizados):
+    """Linhas do itens_extraidos de um edital. `normalizados` é o memo desc -> texto normalizado."""
+    linhas = []
+    for categoria, lista_itens in dados_extraidos.items():
+        for item in lista_itens:
+            desc = item['desc']
+            if desc not in normalizados: normalizados[desc] = normalizar_texto(desc)
+            linhas.append((id_licitacao, categoria, normalizados[desc], item['qtd'], item['preco']))
+    return linhas
+
+def salvar_em_lote(resultados, dono_id, apos_inserir=None):
+    """
+    Grava vários editais de uma vez: [(nome_arquivo, dados_extraidos[, hash_pdf]), ...].
+    Com o hash_pdf, a licitação pode ser reprocessada depois pelo texto guardado.
+    Uma conexão, uma transação e um executemany para todos os itens.
+    `apos_inserir(cursor, ids_licitacoes)` roda dentro da mesma transação
+    (ex: checkpoints da ingestão, que entram ou saem junto com os editais).
+    Retorna {"ids": [...], "itens": n, "segundos": t, "linhas_s": taxa} ou None se der erro
+    (nesse caso nada é gravado: a transação volta inteira).
+    """
+    from catalogo import indexar_trechos, materializar_matches
+    logger.info(f"💾 Persistindo lote para usuário ID {dono_id}...")
+    inicio = time.perf_counter()
+    ids_licitacoes = []
+    linhas_itens = []
+    normalizados = {} # A mesma descrição se repete muito: normaliza uma vez só
+
     try:
-        with sqlite3.connect("licitacloud.db") as conexao:
+        # Conexão do pool (WAL, fsync só no checkpoint); commit no final, rollback se qualquer coisa falhar.
+        # No modo particionado, o arquivo é o do usuário: não disputa o lock com os outros.
+        with banco.transacao(dono_id) as conexao:
             cursor = conexao.cursor()
-            
-            # Registra o Edital
-            cursor.execute("""
-                INSERT INTO licitacoes (dono_id, nome_arquivo, status) 
-                VALUES (?, ?, ?)
-            """, (dono_id, nome_arquivo, 'PROCESSADO'))
-            
-            id_licitacao = cursor.lastrowid
-            
-            contador = 0
-            for categoria, lista_itens in dados_extraidos.items():
-                for item in lista_itens:
-                    cursor.execute("""
-                        INSERT INTO itens_extraidos 
-                        (licitacao_id, tipo_componente, valor_encontrado, quantidade_edital, preco_medio_edital)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (
-                        id_licitacao, 
-                        categoria, 
-                        normalizar_texto(item['desc']), 
-                        item['qtd'], 
-                        item['preco']
-                    ))
-                    contador += 1
-            
-            logger.info(f"✅ Sucesso! {contador} itens gravados na Licitação #{id_licitacao}.")
-            
+            for nome_arquivo, dados_extraidos, *hash_pdf in resultados:
+                # Registra o Edital
+                cursor.execute("""
+                    INSERT INTO licitacoes (dono_id, nome_arquivo, status, hash_pdf) 
+                    VALUES (?, ?, ?, ?)
+                """, (dono_id, nome_arquivo, 'PROCESSADO', hash_pdf[0] if hash_pdf else None))
+                id_licitacao = cursor.lastrowid
+                ids_licitacoes.append(id_licitacao)
+                linhas_itens.extend(_linhas_de_itens(id_licitacao, dados_extraidos, normalizados))
+
+            cursor.executemany("""
+                INSERT INTO itens_extraidos 
+                (licitacao_id, tipo_componente, valor_encontrado, quantidade_edital, preco_medio_edital)
+                VALUES (?, ?, ?, ?, ?)
+            """, linhas_itens)
+            # Produto sugerido de cada item, com o catálogo de agora (cadastros depois refazem os afetados)
+            indexar_trechos(conexao, ids_licitacoes)
+            materializar_matches(conexao, dono_id, ids_licitacoes)
+            # Referência de mercado: só as chaves deste lote são tocadas
+            referencias = [(linha[1], linha[2], linha[4]) for linha in linhas_itens]
+            if not banco.particionado(): atualizar_referencias(cursor, referencias)
+            if apos_inserir: apos_inserir(cursor, ids_licitacoes)
+
+        if banco.particionado():
+            # As referências são de todos os usuários e ficam no banco compartilhado: transação
+            # curta à parte, depois do commit do usuário (se falhar, os editais já estão salvos)
+            try:
+                with banco.transacao() as conexao:
+                    atualizar_referencias(conexao.cursor(), referencias)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Referências de mercado não atualizadas (python referencias.py recalcular): {e}")
+
+        geracoes.invalidar("licitacoes", dono_id) # Dashboard do usuário relê na próxima interação
+        geracoes.invalidar("referencias") # Referências são de todos os editais, de todos os usuários
+        segundos = time.perf_counter() - inicio
+        total_linhas = len(ids_licitacoes) + len(linhas_itens)
+        metricas = {
+            "ids": ids_licitacoes,
+            "itens": len(linhas_itens),
+            "segundos": segundos,
+            "linhas_s": total_linhas / segundos if segundos > 0 else 0.0,
+        }
+        logger.info(f"✅ Sucesso! {len(linhas_itens)} itens em {len(ids_licitacoes)} licitações "
+                    f"({metricas['linhas_s']:,.0f} linhas/s).")
+        return metricas
+
     except sqlite3.Error as e:
         logger.error(f"❌ Erro de Banco de Dados: {e}")
     except Exception as e:
         logger.error(f"❌ Erro genérico ao salvar: {e}")
+    return None
+
+def salvar_no_banco(nome_arquivo, dados_extraidos, dono_id, hash_pdf=None):
+    """Grava um edital só (atalho para salvar_em_lote)."""
+    return salvar_em_lote([(nome_arquivo, dados_extraidos, hash_pdf)], dono_id)
 
 # ==============================================================================
-# 5. EXECUÇÃO LOCAL (PARA TESTES DE DESENVOLVEDOR)
+# 4.1 REPROCESSAMENTO (REGRAS NOVAS SOBRE O TEXTO GUARDADO)
+# ==============================================================================
+# Depois de mexer em PATTERNS, DENY_LIST ou validar_item: roda só o scanner e a
+# validação sobre paginas_texto (sem abrir PDF) e troca os itens de cada
+# licitação, LOTE_REPROCESSAMENTO licitações por transação. Como itens somem,
+# as referências de mercado são recalculadas e a base analítica é refeita.
+LOTE_REPROCESSAMENTO = 50
+
+def _reprocessar_dono(dono_id, licitacoes, resumo):
+    from catalogo import indexar_trechos, materializar_matches
+    with banco.conexao(dono_id) as conexao:
+        sql, parametros = "SELECT id, hash_pdf FROM licitacoes WHERE dono_id = ?", [dono_id]
+        if licitacoes is not None:
+            sql += f" AND id IN ({', '.join('?' * len(licitacoes))})"
+            parametros += list(licitacoes)
+        alvos = conexao.execute(sql + " ORDER BY id", parametros).fetchall()
+
+    por_hash = {} # O mesmo PDF enviado duas vezes é analisado uma vez só
+    for id_licitacao, hash_pdf in alvos:
+        if hash_pdf: por_hash.setdefault(hash_pdf, []).append(id_licitacao)
+        else: resumo["sem_texto"].append((dono_id, id_licitacao))
+    hashes = list(por_hash)
+    normalizados = {}
+
+    for ini in range(0, len(hashes), LOTE_REPROCESSAMENTO):
+        novos = {} # id_licitacao -> dados
+        lidos = []
+        with banco.conexao() as conexao: # O texto fica no banco compartilhado
+            for hash_pdf in hashes[ini:ini + LOTE_REPROCESSAMENTO]:
+                paginas = carregar_paginas_texto(conexao, hash_pdf)
+                if not paginas:
+                    resumo["sem_texto"].extend((dono_id, i) for i in por_hash[hash_pdf])
+                    continue
+                dados = dados_das_paginas(paginas)
+                resumo["paginas"] += len(paginas)
+                lidos.append(hash_pdf)
+                for id_licitacao in por_hash[hash_pdf]: novos[id_licitacao] = dados
+        if not novos: continue
+        with banco.transacao() as conexao: # Reprocessar conta como acesso (LRU do texto guardado)
+            _marcar_acesso_textos(conexao.cursor(), lidos)
+
+        ids = list(novos)
+        linhas_itens = [linha for i in ids for linha in _linhas_de_itens(i, novos[i], normalizados)]
+        with banco.transacao(dono_id) as conexao:
+            cursor = conexao.cursor()
+            cursor.execute(f"DELETE FROM itens_extraidos WHERE licitacao_id IN ({', '.join('?' * len(ids))})", ids)
+            resumo["itens_antes"] += cursor.rowcount
+            cursor.executemany("""
+                INSERT INTO itens_extraidos
+                (licitacao_id, tipo_componente, valor_encontrado, quantidade_edital, preco_medio_edital)
+                VALUES (?, ?, ?, ?, ?)
+            """, linhas_itens)
+            indexar_trechos(conexao, ids)
+            materializar_matches(conexao, dono_id, ids) # Os matches antigos saíram com os itens (trigger)
+            # Checkpoints da ingestão mostram a contagem nova
+            cursor.executemany("UPDATE ingestao_arquivos SET itens = ? WHERE dono_id = ? AND licitacao_id = ?",
+                               [(sum(len(v) for v in novos[i].values()), dono_id, i) for i in ids])
+        resumo["licitacoes"] += len(ids)
+        resumo["itens"] += len(linhas_itens)
+    if alvos: geracoes.invalidar("licitacoes", dono_id)
+
+def reprocessar(dono_id=None, licitacoes=None):
+    """
+    Aplica as regras atuais às licitações já gravadas, pelo texto guardado (sem reler o PDF).
+    dono_id=None: todos os usuários; `licitacoes` (ids do usuário) restringe a seleção.
+    Licitações sem texto guardado (anteriores à v9 do banco, com LICITACLOUD_GUARDAR_TEXTO=0 ou com o
+    texto despejado por TEXTO_MAX_DIAS/TEXTO_MAX_BYTES)
+    ficam como estão e voltam em "sem_texto". Retorna o resumo com contagens e vazão.
+    """
+    if licitacoes is not None and dono_id is None:
+        raise ValueError("Selecionar licitações exige o dono_id (os ids são de cada usuário)")
+    garantir_schema()
+    inicio = time.perf_counter()
+    if dono_id is None:
+        with banco.conexao() as conexao:
+            donos = [linha[0] for linha in conexao.execute("SELECT id FROM usuarios ORDER BY id")]
+    else:
+        donos = [dono_id]
+
+    resumo = {"licitacoes": 0, "sem_texto": [], "itens_antes": 0, "itens": 0, "paginas": 0}
+    for dono in donos:
+        _reprocessar_dono(dono, licitacoes, resumo)
+
+    if resumo["licitacoes"]:
+        recalcular_tudo() # Itens apagados não saem do agregado incremental: refaz a tabela
+        geracoes.invalidar("referencias")
+        from analise_precos import invalidar_exportacao # pyarrow só aqui
+        invalidar_exportacao()
+    resumo["segundos"] = time.perf_counter() - inicio
+    resumo["paginas_s"] = resumo["paginas"] / resumo["segundos"] if resumo["segundos"] > 0 else 0.0
+    logger.info(f"♻️ Reprocessadas {resumo['licitacoes']} licitações: {resumo['itens_antes']} -> {resumo['itens']} itens "
+                f"({resumo['paginas_s']:,.0f} páginas/s).")
+    return resumo
+
+# ==============================================================================
+# 5. INGESTÃO EM LOTE PELA LINHA DE COMANDO (python main.py ingest <pasta> --user N)
+# ==============================================================================
+# Cada processo do pool extrai um arquivo inteiro; o processo principal grava
+# em lotes (salvar_em_lote) junto com o checkpoint de cada arquivo. Se a
+# execução cair, a próxima pula o que já tem checkpoint CONCLUIDO/SEM_ITENS
+# (desde que o arquivo não tenha mudado) e tenta de novo as falhas.
+LOTE_INGESTAO = 50 # Arquivos por transação de gravação
+
+def listar_pdfs(pasta):
+    """Todos os PDFs da pasta e subpastas, em ordem estável."""
+    encontrados = []
+    for raiz, _, arquivos in os.walk(pasta):
+        encontrados.extend(os.path.abspath(os.path.join(raiz, a)) for a in arquivos if a.lower().endswith(".pdf"))
+    return sorted(encontrados)
+
+def _identidade_arquivo(caminho):
+    info = os.stat(caminho)
+    return info.st_size, info.st_mtime_ns
+
+def _carregar_checkpoints(dono_id):
+    """caminho -> (tamanho, modificado_ns) dos arquivos que não precisam ser processados de novo."""
+    with banco.conexao(dono_id) as conexao:
+        cursor = conexao.execute("""
+            SELECT caminho, tamanho, modificado_ns FROM ingestao_arquivos
+            WHERE dono_id = ? AND status IN ('CONCLUIDO', 'SEM_ITENS')
+        """, (dono_id,))
+        return {caminho: (tamanho, modificado) for caminho, tamanho, modificado in cursor.fetchall()}
+
+def _gravar_checkpoints(cursor, linhas):
+    """linhas: (dono_id, caminho, tamanho, modificado_ns, status, licitacao_id, itens, paginas, erro, segundos)."""
+    cursor.executemany("""
+        INSERT OR REPLACE INTO ingestao_arquivos
+        (dono_id, caminho, tamanho, modificado_ns, status, licitacao_id, itens, paginas, erro, segundos)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, linhas)
+
+def _ingerir_arquivo(caminho_pdf, motor=None):
+    """
+    Trabalho de cada processo da ingestão: extrai (sem gravar) e devolve
+    (dados, paginas, segundos, erro, hash_pdf, perfil). O perfil é None com LICITACLOUD_PERFIL=0.
+    """
+    inicio = time.perf_counter()
+    paginas = [0]
+    hash_pdf = None
+    perfil = PerfilExtracao() if PERFIL_ATIVO else None
+    def progresso(lidas, total): paginas[0] = total
+    try:
+        hash_pdf = calcular_hash_pdf(caminho_pdf)
+        dados = extrair_dados_pdf(caminho_pdf, progresso=progresso, motor=motor, perfil=perfil, hash_pdf=hash_pdf)
+        erro = None if dados else "Falha ao ler o PDF"
+    except Exception as e: # Um arquivo ruim não derruba o lote
+        dados, erro = {}, str(e)
+    return dados, paginas[0], time.perf_counter() - inicio, erro, hash_pdf, perfil
+
+def ingerir_pasta(pasta, dono_id, workers=1, motor=None, lote=LOTE_INGESTAO):
+    """
+    Processa todos os PDFs de `pasta` para o usuário `dono_id`, retomando de onde
+    uma execução anterior parou. Retorna o resumo (contagens, falhas e taxas).
+    """
+    garantir_schema()
+    inicio = time.perf_counter()
+    todos = listar_pdfs(pasta)
+    feitos = _carregar_checkpoints(dono_id)
+    fila_arquivos = [c for c in todos if feitos.get(c) != _identidade_arquivo(c)]
+    resumo = {"arquivos": len(todos), "pulados": len(todos) - len(fila_arquivos), "concluidos": 0,
+              "sem_itens": 0, "falhas": [], "itens": 0, "paginas": 0}
+    logger.info(f"📦 Ingestão: {len(todos)} PDFs em {pasta}, {resumo['pulados']} já processados, "
+                f"{len(fila_arquivos)} na fila ({workers} processos).")
+
+    pendentes = [] # Extraídos com itens, aguardando a próxima transação
+    metricas_adiadas = [] # Modo particionado: métricas vão para o banco compartilhado depois do commit do usuário
+
+    def checkpoint(caminho, status, paginas, segundos, licitacao_id=None, itens=0, erro=None):
+        return (dono_id, caminho) + _identidade_arquivo(caminho) + (status, licitacao_id, itens, paginas, erro, segundos)
+
+    def metricas(caminho, perfil, licitacao_id=None, itens=0):
+        if not perfil or not perfil.estagios: return []
+        return linhas_metricas(perfil, os.path.basename(caminho), dono_id, licitacao_id, motor or MOTOR_PADRAO, itens)
+
+    def gravar_metricas_do_lote(cursor, linhas):
+        # Painel 🩺 Desempenho: no banco único, na mesma transação dos editais e checkpoints
+        if banco.particionado(): metricas_adiadas.extend(linhas)
+        else: inserir_metricas(cursor, linhas)
+
+    def descarregar_metricas_adiadas():
+        if not metricas_adiadas: return
+        try:
+            with banco.transacao() as conexao:
+                inserir_metricas(conexao.cursor(), metricas_adiadas)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Não foi possível gravar as métricas de processamento: {e}")
+        metricas_adiadas.clear()
+
+    def descarregar():
+        if not pendentes: return
+        def gravar_checkpoints(cursor, ids):
+            concluidos, linhas_perfil = [], []
+            for (caminho, dados, paginas, segundos, _, perfil), id_lic in zip(pendentes, ids):
+                itens = sum(len(v) for v in dados.values())
+                concluidos.append(checkpoint(caminho, "CONCLUIDO", paginas, segundos, id_lic, itens))
+                linhas_perfil += metricas(caminho, perfil, id_lic, itens)
+            _gravar_checkpoints(cursor, concluidos)
+            gravar_metricas_do_lote(cursor, linhas_perfil)
+        gravado = salvar_em_lote([(os.path.basename(c), dados, h) for c, dados, _, _, h, _ in pendentes], dono_id,
+                                 apos_inserir=gravar_checkpoints)
+        if gravado:
+            resumo["concluidos"] += len(pendentes)
+            resumo["itens"] += gravado["itens"]
+            descarregar_metricas_adiadas()
+        else:
+            metricas_adiadas.clear() # Eram do lote que voltou
+            registrar([checkpoint(c, "FALHOU", p, s, erro="Falha ao gravar no banco") for c, _, p, s, _, _ in pendentes],
+                      [linha for c, _, _, _, _, perfil in pendentes for linha in metricas(c, perfil)])
+        pendentes.clear()
+
+    def registrar(linhas, linhas_perfil=()):
+        with banco.transacao(dono_id) as conexao:
+            _gravar_checkpoints(conexao.cursor(), linhas)
+            gravar_metricas_do_lote(conexao.cursor(), linhas_perfil)
+        descarregar_metricas_adiadas()
+        for linha in linhas:
+            if linha[4] == "FALHOU": resumo["falhas"].append((linha[1], linha[8]))
+            else: resumo["sem_itens"] += 1
+
+    def receber(caminho, dados, paginas, segundos, erro, hash_pdf, perfil):
+        resumo["paginas"] += paginas
+        if erro:
+            registrar([checkpoint(caminho, "FALHOU", paginas, segundos, erro=erro)], metricas(caminho, perfil))
+        elif not any(dados.values()):
+            registrar([checkpoint(caminho, "SEM_ITENS", paginas, segundos)], metricas(caminho, perfil))
+        else:
+            pendentes.append((caminho, dados, paginas, segundos, hash_pdf, perfil))
+            if len(pendentes) >= lote: descarregar()
+
+    feitos_agora = 0
+    try:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futuros = {pool.submit(_ingerir_arquivo, c, motor): c for c in fila_arquivos}
+                try:
+                    for futuro in as_completed(futuros):
+                        receber(futuros[futuro], *futuro.result())
+                        feitos_agora += 1
+                        if feitos_agora % 25 == 0: _logar_andamento(feitos_agora, len(fila_arquivos), inicio)
+                except KeyboardInterrupt:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+        else:
+            for caminho in fila_arquivos:
+                receber(caminho, *_ingerir_arquivo(caminho, motor))
+                feitos_agora += 1
+                if feitos_agora % 25 == 0: _logar_andamento(feitos_agora, len(fila_arquivos), inicio)
+    finally:
+        descarregar() # O que já foi extraído não se perde numa interrupção
+
+    resumo["segundos"] = time.perf_counter() - inicio
+    resumo["arquivos_s"] = len(fila_arquivos) / resumo["segundos"] if resumo["segundos"] > 0 else 0.0
+    resumo["paginas_s"] = resumo["paginas"] / resumo["segundos"] if resumo["segundos"] > 0 else 0.0
+    return resumo
+
+def _logar_andamento(feitos, total, inicio):
+    taxa = feitos / (time.perf_counter() - inicio)
+    logger.info(f"📦 {feitos}/{total} arquivos ({taxa:,.1f} arq/s)")
+
+def _imprimir_resumo_ingestao(resumo):
+    print(f"\n--- Ingestão concluída em {resumo['segundos']:,.1f}s ---")
+    print(f"   Arquivos : {resumo['arquivos']} ({resumo['pulados']} já processados antes)")
+    print(f"   Gravados : {resumo['concluidos']} editais, {resumo['itens']} itens")
+    print(f"   Sem itens: {resumo['sem_itens']}")
+    print(f"   Vazão    : {resumo['arquivos_s']:,.2f} arquivos/s | {resumo['paginas_s']:,.1f} páginas/s")
+    if resumo["falhas"]:
+        print(f"   ❌ Falhas : {len(resumo['falhas'])} (serão tentadas de novo na próxima execução)")
+        for caminho, erro in resumo["falhas"][:20]:
+            print(f"      {caminho}: {erro}")
+        if len(resumo["falhas"]) > 20: print(f"      ... e mais {len(resumo['falhas']) - 20}")
+
+def _imprimir_resumo_reprocessamento(resumo):
+    print(f"\n--- Reprocessamento concluído em {resumo['segundos']:,.1f}s (regras {VERSAO_REGRAS}) ---")
+    print(f"   Licitações: {resumo['licitacoes']} | itens {resumo['itens_antes']} -> {resumo['itens']}")
+    print(f"   Vazão     : {resumo['paginas_s']:,.1f} páginas/s ({resumo['paginas']} páginas)")
+    if resumo["sem_texto"]:
+        print(f"   ⚠️ Sem texto guardado: {len(resumo['sem_texto'])} (só reenviando o PDF)")
+        for dono_id, id_lic in resumo["sem_texto"][:20]:
+            print(f"      usuário {dono_id}, licitação #{id_lic}")
+        if len(resumo["sem_texto"]) > 20: print(f"      ... e mais {len(resumo['sem_texto']) - 20}")
+
+def _cli(argv):
+    parser = argparse.ArgumentParser(prog="python main.py", description="LicitaCloud pela linha de comando")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    ingest = comandos.add_parser("ingest", help="Processa todos os PDFs de uma pasta (retomável)")
+    ingest.add_argument("pasta")
+    ingest.add_argument("--user", type=int, required=True, help="ID do usuário dono dos editais")
+    ingest.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processos em paralelo (um arquivo cada)")
+    ingest.add_argument("--motor", choices=MOTORES, default=None, help="Motor de leitura (padrão: LICITACLOUD_MOTOR)")
+    ingest.add_argument("--lote", type=int, default=LOTE_INGESTAO, help="Arquivos por transação de gravação")
+    reproc = comandos.add_parser("reprocessar", help="Aplica as regras atuais ao texto guardado (sem reler os PDFs)")
+    reproc.add_argument("--user", type=int, default=None, help="ID do usuário (padrão: todos)")
+    reproc.add_argument("--licitacoes", default=None, help="IDs das licitações do usuário, separados por vírgula")
+    args = parser.parse_args(argv)
+
+    garantir_schema()
+    if args.comando == "reprocessar":
+        if args.licitacoes and args.user is None:
+            parser.error("--licitacoes exige --user")
+        licitacoes = [int(i) for i in args.licitacoes.split(",")] if args.licitacoes else None
+        _imprimir_resumo_reprocessamento(reprocessar(args.user, licitacoes))
+        return 0
+
+    if not os.path.isdir(args.pasta):
+        parser.error(f"pasta não encontrada: {args.pasta}")
+    with banco.conexao() as conexao:
+        if conexao.execute("SELECT 1 FROM usuarios WHERE id = ?", (args.user,)).fetchone() is None:
+            parser.error(f"usuário {args.user} não existe")
+    resumo = ingerir_pasta(args.pasta, args.user, workers=args.workers, motor=args.motor, lote=args.lote)
+    _imprimir_resumo_ingestao(resumo)
+    return 1 if resumo["falhas"] else 0
+
+# ==============================================================================
+# 6. EXECUÇÃO LOCAL (PARA TESTES DE DESENVOLVEDOR)
 # ==============================================================================
 if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        sys.exit(_cli(sys.argv[1:]))
+
     # Área de teste rápido - Só roda se você executar 'python main.py' direto
     arquivo_teste = "edital_exemplo.pdf"
     if os.path.exists(arquivo_teste):
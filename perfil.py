@@ -0,0 +1,140 @@
+import os
+import uuid
+import sqlite3
+import logging
+from contextlib import contextmanager
+from time import perf_counter
+
+import banco
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# PERFIL DE PROCESSAMENTO (ONDE O TEMPO DE UM EDITAL FOI GASTO)
+# ==============================================================================
+# Estágios: cache (hash + consulta), abrir (PDF), texto (extração do motor),
+# scanner (normalização + gatilhos + regex), contexto (preço/quantidade nas
+# linhas vizinhas) e gravacao (banco). Por categoria: linhas em que o regex
+# rodou, matches, rejeições do validar_item e o tempo acumulado do regex.
+# Com LICITACLOUD_PERFIL=0 a fila processa sem instrumentação.
+PERFIL_ATIVO = os.environ.get("LICITACLOUD_PERFIL", "1") != "0"
+PAGINAS_GRAVADAS = 20 # Só as N páginas mais lentas de cada arquivo vão para o banco
+
+class PerfilExtracao:
+    def __init__(self):
+        self.estagios = {}   # estágio -> segundos
+        self.categorias = {} # categoria -> [linhas, matches, rejeitados, segundos_regex]
+        self.paginas = []    # (pagina, segundos_texto, segundos_analise, linhas, achados)
+        self.linhas = 0
+        self.cache_hit = False
+
+    def somar(self, estagio, segundos):
+        self.estagios[estagio] = self.estagios.get(estagio, 0.0) + segundos
+
+    @contextmanager
+    def medir(self, estagio):
+        inicio = perf_counter()
+        try:
+            yield
+        finally:
+            self.somar(estagio, perf_counter() - inicio)
+
+    def _categoria(self, categoria):
+        contadores = self.categorias.get(categoria)
+        if contadores is None:
+            contadores = self.categorias[categoria] = [0, 0, 0, 0.0]
+        return contadores
+
+    def contar_regex(self, categoria, segundos, achou):
+        contadores = self._categoria(categoria)
+        contadores[0] += 1
+        contadores[3] += segundos
+        if achou: contadores[1] += 1
+
+    def rejeitar(self, categoria):
+        self._categoria(categoria)[2] += 1
+
+    def registrar_pagina(self, pagina, segundos_texto, segundos_analise, linhas, achados):
+        self.paginas.append((pagina, segundos_texto, segundos_analise, linhas, achados))
+        self.linhas += linhas
+
+    def juntar(self, outro):
+        """Soma o perfil de uma fatia processada em outro processo (modo paralelo)."""
+        for estagio, segundos in outro.estagios.items():
+            self.somar(estagio, segundos)
+        for categoria, (linhas, matches, rejeitados, segundos) in outro.categorias.items():
+            contadores = self._categoria(categoria)
+            contadores[0] += linhas
+            contadores[1] += matches
+            contadores[2] += rejeitados
+            contadores[3] += segundos
+        self.paginas.extend(outro.paginas)
+        self.linhas += outro.linhas
+
+    @property
+    def total_segundos(self):
+        return sum(self.estagios.values())
+
+    def registrar_log(self, nome_arquivo):
+        """Resumo numa linha de INFO; detalhe por página em DEBUG."""
+        estagios = " | ".join(f"{e} {s:.2f}s" for e, s in sorted(self.estagios.items(), key=lambda x: -x[1]))
+        resumo = f"⏱️ Perfil de {nome_arquivo}: {self.total_segundos:.2f}s ({estagios})"
+        if self.categorias:
+            pior, (linhas, _, _, segundos) = max(self.categorias.items(), key=lambda x: x[1][3])
+            resumo += f" · regex mais caro: {pior} ({segundos * 1000:.0f} ms em {linhas} linhas)"
+        logger.info(resumo)
+        for pagina, s_texto, s_analise, linhas, achados in sorted(self.paginas):
+            logger.debug(f"   pág. {pagina}: texto {s_texto * 1000:.1f} ms | análise {s_analise * 1000:.1f} ms "
+                         f"| {linhas} linhas | {achados} achados")
+
+# ==============================================================================
+# PERSISTÊNCIA (TABELA metricas_processamento)
+# ==============================================================================
+def linhas_metricas(perfil, nome_arquivo, dono_id=None, licitacao_id=None, motor=None, itens=0):
+    """
+    Uma linha por arquivo, por estágio, por categoria e pelas páginas mais lentas,
+    todas com o mesmo código de execução.
+    """
+    execucao = uuid.uuid4().hex
+    base = (execucao, dono_id, licitacao_id, nome_arquivo, motor)
+    rejeitados = sum(c[2] for c in perfil.categorias.values())
+    linhas = [base + ("arquivo", "cache" if perfil.cache_hit else None, perfil.total_segundos, perfil.linhas, itens, rejeitados)]
+    linhas += [base + ("estagio", estagio, segundos, 0, 0, 0) for estagio, segundos in perfil.estagios.items()]
+    linhas += [base + ("padrao", categoria, segundos, n_linhas, matches, rejeit)
+               for categoria, (n_linhas, matches, rejeit, segundos) in perfil.categorias.items()]
+    mais_lentas = sorted(perfil.paginas, key=lambda p: p[1] + p[2], reverse=True)[:PAGINAS_GRAVADAS]
+    linhas += [base + ("pagina", str(pagina), s_texto + s_analise, n_linhas, achados, 0)
+               for pagina, s_texto, s_analise, n_linhas, achados in mais_lentas]
+    return linhas
+
+def inserir_metricas(cursor, linhas):
+    """
+    Grava na transação de quem chama (ex: a do lote da ingestão), dentro de um
+    savepoint: se falhar, só as métricas são desfeitas e o resto da transação segue (False).
+    """
+    if not linhas: return True
+    cursor.execute("SAVEPOINT metricas")
+    try:
+        cursor.executemany("""
+            INSERT INTO metricas_processamento
+            (execucao, dono_id, licitacao_id, nome_arquivo, motor, escopo, chave, segundos, linhas, matches, rejeitados)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, linhas)
+        cursor.execute("RELEASE metricas")
+        return True
+    except sqlite3.Error as e:
+        cursor.execute("ROLLBACK TO metricas")
+        cursor.execute("RELEASE metricas")
+        logger.warning(f"⚠️ Não foi possível gravar as métricas de processamento: {e}")
+        return False
+
+def gravar_metricas(perfil, nome_arquivo, dono_id=None, licitacao_id=None, motor=None, itens=0):
+    """Métricas de um arquivo na sua própria transação. Falha aqui só gera aviso: métrica nunca derruba o processamento."""
+    linhas = linhas_metricas(perfil, nome_arquivo, dono_id, licitacao_id, motor, itens)
+    try:
+        with banco.transacao() as conexao:
+            gravou = inserir_metricas(conexao.cursor(), linhas)
+        return linhas[0][0] if gravou else None
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Não foi possível gravar as métricas de processamento: {e}")
+        return None
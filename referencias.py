@@ -0,0 +1,146 @@
+import re
+import sys
+import json
+import math
+import itertools
+
+# ==============================================================================
+# COMPONENTE NORMALIZADO (CHAVE DAS REFERÊNCIAS E DA BASE ANALÍTICA)
+# ==============================================================================
+# A mesma peça escrita de jeitos diferentes vira uma chave só ("16 gb ddr4" e
+# "16gb ddr4"; "ssd de 512 gb" e "ssd 512gb"). Regras em sintaxe comum ao re do
+# Python e ao RE2 do Arrow (analise_precos aplica as mesmas de forma vetorizada).
+NORMALIZACOES = [
+    (r"[^a-z0-9.,\-\s]", " "),                                  # Pontuação solta (":", "(", "\"")
+    (r"\b(ssd|hd|nvme|monitor|switch|nobreak)\s+de\s+", r"\1 "), # "ssd de 512" -> "ssd 512"
+    (r"(\d)\s+(gb|tb|hz|kva|va|pol|portas)\b", r"\1\2"),         # "16 gb" -> "16gb"
+    (r"\bgiga\b", "gb"),
+    (r"\s+", " "),
+]
+_NORMALIZACOES_COMPILADAS = [(re.compile(padrao), troca) for padrao, troca in NORMALIZACOES]
+
+def normalizar_componente(texto):
+    texto = (texto or "").lower()
+    for regex, troca in _NORMALIZACOES_COMPILADAS:
+        texto = regex.sub(troca, texto)
+    return texto.strip()
+
+# ==============================================================================
+# SKETCH DA DISTRIBUIÇÃO DE PREÇOS (BALDES LOGARÍTMICOS)
+# ==============================================================================
+# Cada preço cai no balde ceil(log(preco) / log(GAMA)); o valor representativo
+# do balde erra no máximo ~2% (relativo) para GAMA = 1.04. Somar sketches é
+# somar contagens, então dá para atualizar incrementalmente e juntar lotes.
+GAMA = 1.04
+_LOG_GAMA = math.log(GAMA)
+
+def balde(preco):
+    return math.ceil(math.log(preco) / _LOG_GAMA)
+
+def valor_do_balde(indice):
+    return 2 * GAMA ** indice / (GAMA + 1)
+
+def quantil_sketch(sketch, q):
+    """Quantil aproximado (0 <= q <= 1) de um sketch {balde: contagem}."""
+    total = sum(sketch.values())
+    if not total:
+        return None
+    alvo = q * (total - 1)
+    acumulado = 0
+    for indice in sorted(sketch):
+        acumulado += sketch[indice]
+        if acumulado > alvo:
+            return valor_do_balde(indice)
+    return valor_do_balde(max(sketch))
+
+# ==============================================================================
+# TABELA referencia_precos (ATUALIZADA PELA CAMADA DE PERSISTÊNCIA)
+# ==============================================================================
+def _agregar(itens):
+    """[(tipo, valor_encontrado, preco)] -> {(tipo, componente): [ocorrencias, amostras, soma, min, max, sketch]}."""
+    parciais = {}
+    normalizados = {}
+    for tipo, valor, preco in itens:
+        if valor not in normalizados: normalizados[valor] = normalizar_componente(valor)
+        chave = (tipo, normalizados[valor])
+        parcial = parciais.get(chave)
+        if parcial is None:
+            parcial = parciais[chave] = [0, 0, 0.0, None, None, {}]
+        parcial[0] += 1
+        if preco and preco > 0:
+            parcial[1] += 1
+            parcial[2] += preco
+            parcial[3] = preco if parcial[3] is None else min(parcial[3], preco)
+            parcial[4] = preco if parcial[4] is None else max(parcial[4], preco)
+            b = balde(preco)
+            parcial[5][b] = parcial[5].get(b, 0) + 1
+    return parciais
+
+def _gravar(cursor, agregados):
+    linhas = []
+    for (tipo, componente), (ocorrencias, amostras, soma, minimo, maximo, sketch) in agregados.items():
+        linhas.append((tipo, componente, ocorrencias, amostras, soma, minimo, maximo,
+                       quantil_sketch(sketch, 0.5), json.dumps(sketch)))
+    cursor.executemany("""
+        INSERT OR REPLACE INTO referencia_precos
+        (tipo_componente, componente, ocorrencias, amostras, soma, minimo, maximo, mediana, sketch, atualizado_em)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    """, linhas)
+
+def atualizar_referencias(cursor, itens):
+    """
+    Soma os itens recém-gravados às referências, dentro da transação de quem chamou.
+    itens: [(tipo_componente, valor_encontrado, preco)]. Custo proporcional ao lote, nunca à tabela.
+    """
+    novos = _agregar(itens)
+    chaves = list(novos)
+    for ini in range(0, len(chaves), 400): # Limite de parâmetros por consulta
+        bloco = chaves[ini:ini + 400]
+        cursor.execute(f"""
+            SELECT tipo_componente, componente, ocorrencias, amostras, soma, minimo, maximo, sketch
+            FROM referencia_precos WHERE (tipo_componente, componente) IN (VALUES {",".join(["(?, ?)"] * len(bloco))})
+        """, [v for chave in bloco for v in chave])
+        for tipo, componente, ocorrencias, amostras, soma, minimo, maximo, sketch in cursor.fetchall():
+            novo = novos[(tipo, componente)]
+            novo[0] += ocorrencias
+            novo[1] += amostras
+            novo[2] += soma
+            if minimo is not None: novo[3] = minimo if novo[3] is None else min(novo[3], minimo)
+            if maximo is not None: novo[4] = maximo if novo[4] is None else max(novo[4], maximo)
+            for indice, contagem in json.loads(sketch or "{}").items():
+                novo[5][int(indice)] = novo[5].get(int(indice), 0) + contagem
+    _gravar(cursor, novos)
+
+def recalcular_referencias(conexao, itens_extras=()):
+    """
+    Reconstrói a tabela inteira a partir de itens_extraidos (carga inicial ou depois de apagar itens).
+    itens_extras: linhas (tipo_componente, valor_encontrado, preco_medio_edital) de outros arquivos,
+    somadas às de `conexao`; a tabela gravada é sempre a de `conexao`.
+    """
+    cursor = conexao.cursor()
+    cursor.execute("DELETE FROM referencia_precos")
+    itens = itertools.chain(
+        conexao.execute("SELECT tipo_componente, valor_encontrado, preco_medio_edital FROM itens_extraidos"),
+        itens_extras)
+    _gravar(cursor, _agregar(itens))
+
+def _itens_dos_donos(donos):
+    """Itens do arquivo de cada usuário, um arquivo por vez (só uma conexão emprestada de cada vez)."""
+    import banco
+    for dono_id in donos:
+        with banco.conexao(dono_id) as fonte:
+            yield from fonte.execute("SELECT tipo_componente, valor_encontrado, preco_medio_edital FROM itens_extraidos")
+
+def recalcular_tudo():
+    """Recalcula no banco compartilhado com os itens de todos (no modo particionado, do arquivo de cada usuário)."""
+    import banco
+    donos = banco.donos_particionados() if banco.particionado() else []
+    with banco.transacao() as conexao:
+        recalcular_referencias(conexao, _itens_dos_donos(donos))
+
+# python referencias.py recalcular
+if __name__ == "__main__":
+    if sys.argv[1:] != ["recalcular"]:
+        sys.exit("uso: python referencias.py recalcular")
+    recalcular_tudo()
+    print("✅ Referências de mercado recalculadas.")
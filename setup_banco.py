@@ -1,62 +1,363 @@
 import sqlite3
 import hashlib
+import logging
+
+CAMINHO_BANCO = "licitacloud.db"
+
+logger = logging.getLogger(__name__)
+
+def _carga_referencias(conexao):
+    """Passo em Python da v8: normalização e sketch não cabem em SQL puro."""
+    from referencias import recalcular_referencias
+    recalcular_referencias(conexao)
+
+def _carga_matches(conexao):
+    """Passo em Python da v10: o match usa o autômato do catalogo.py."""
+    from catalogo import recalcular_matches
+    recalcular_matches(conexao)
+
+# ==============================================================================
+# MIGRAÇÕES VERSIONADAS (PRAGMA user_version)
+# ==============================================================================
+# Cada entrada leva o banco da versão anterior para a sua. Só se acrescenta no
+# final da lista, nunca se edita uma migração que já foi publicada.
+# A v1 usa IF NOT EXISTS para adotar bancos antigos (criados antes das migrações).
+# Um passo pode ser SQL (texto) ou uma função que recebe a conexão (cargas em Python).
+MIGRACOES = [
+    (1, "Tabelas base: usuários, licitações, itens e catálogo", [
+        """
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            senha_hash TEXT NOT NULL,
+            nome TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS licitacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dono_id INTEGER NOT NULL,
+            nome_arquivo TEXT NOT NULL,
+            data_processamento DATETIME DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'PROCESSADO',
+            FOREIGN KEY (dono_id) REFERENCES usuarios (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS itens_extraidos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            licitacao_id INTEGER,
+            tipo_componente TEXT,
+            valor_encontrado TEXT,
+            quantidade_edital INTEGER DEFAULT 1,
+            preco_medio_edital REAL DEFAULT 0.0,
+            FOREIGN KEY (licitacao_id) REFERENCES licitacoes (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS catalogo_produtos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dono_id INTEGER NOT NULL,
+            nome_produto TEXT NOT NULL,
+            tags_match TEXT NOT NULL,
+            custo_unitario REAL,
+            preco_venda REAL,
+            FOREIGN KEY (dono_id) REFERENCES usuarios (id)
+        )
+        """,
+    ]),
+    (2, "Cache de extração (resultado por hash do PDF + versão das regras)", [
+        """
+        CREATE TABLE IF NOT EXISTS cache_extracao (
+            hash_pdf TEXT NOT NULL,
+            versao_regras TEXT NOT NULL,
+            resultado BLOB NOT NULL,                -- JSON comprimido (zlib)
+            tamanho_bytes INTEGER NOT NULL,
+            criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+            ultimo_acesso DATETIME DEFAULT CURRENT_TIMESTAMP,
+            acessos INTEGER DEFAULT 0,
+            PRIMARY KEY (hash_pdf, versao_regras)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS cache_contadores (
+            evento TEXT PRIMARY KEY,                -- hit / miss / despejo
+            total INTEGER DEFAULT 0
+        )
+        """,
+    ]),
+    (3, "Índices das buscas por dono e por licitação", [
+        "CREATE INDEX IF NOT EXISTS idx_itens_licitacao ON itens_extraidos (licitacao_id)",
+        "CREATE INDEX IF NOT EXISTS idx_licitacoes_dono ON licitacoes (dono_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_catalogo_dono ON catalogo_produtos (dono_id)",
+        "CREATE INDEX IF NOT EXISTS idx_cache_acesso ON cache_extracao (ultimo_acesso)",
+    ]),
+    (4, "Busca textual (FTS5) sobre itens e nome do arquivo", [
+        # rowid da busca = id do item; dono_id vai junto para filtrar sem JOIN
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS busca_itens USING fts5(
+            valor_encontrado,
+            nome_arquivo,
+            licitacao_id UNINDEXED,
+            dono_id UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_busca_itens_insert AFTER INSERT ON itens_extraidos BEGIN
+            INSERT INTO busca_itens (rowid, valor_encontrado, nome_arquivo, licitacao_id, dono_id)
+            SELECT new.id, new.valor_encontrado, l.nome_arquivo, l.id, l.dono_id
+            FROM licitacoes l WHERE l.id = new.licitacao_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_busca_itens_delete AFTER DELETE ON itens_extraidos BEGIN
+            DELETE FROM busca_itens WHERE rowid = old.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_busca_itens_update AFTER UPDATE OF valor_encontrado ON itens_extraidos BEGIN
+            UPDATE busca_itens SET valor_encontrado = new.valor_encontrado WHERE rowid = new.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_busca_licitacao_renomeia AFTER UPDATE OF nome_arquivo ON licitacoes BEGIN
+            UPDATE busca_itens SET nome_arquivo = new.nome_arquivo WHERE licitacao_id = new.id;
+        END
+        """,
+        # Carga inicial com o que já existia no banco
+        """
+        INSERT INTO busca_itens (rowid, valor_encontrado, nome_arquivo, licitacao_id, dono_id)
+        SELECT i.id, i.valor_encontrado, l.nome_arquivo, l.id, l.dono_id
+        FROM itens_extraidos i JOIN licitacoes l ON l.id = i.licitacao_id
+        """,
+    ]),
+    (5, "Fila de processamento de editais (jobs)", [
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dono_id INTEGER NOT NULL,
+            nome_arquivo TEXT NOT NULL,
+            caminho_pdf TEXT NOT NULL,
+            status TEXT DEFAULT 'NA_FILA',          -- NA_FILA / PROCESSANDO / CONCLUIDO / FALHOU
+            paginas_lidas INTEGER DEFAULT 0,
+            total_paginas INTEGER DEFAULT 0,
+            itens INTEGER DEFAULT 0,
+            licitacao_id INTEGER,
+            worker TEXT,
+            erro TEXT,
+            criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+            iniciado_em DATETIME,
+            atualizado_em DATETIME,                 -- Batimento do worker (progresso)
+            finalizado_em DATETIME,
+            duracao_s REAL,
+            FOREIGN KEY (dono_id) REFERENCES usuarios (id),
+            FOREIGN KEY (licitacao_id) REFERENCES licitacoes (id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_dono ON jobs (dono_id, id)",
+    ]),
+    (6, "Métricas de processamento (perfil por arquivo, estágio, página e padrão)", [
+        """
+        CREATE TABLE IF NOT EXISTS metricas_processamento (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            execucao TEXT NOT NULL,                 -- Agrupa as linhas de um mesmo processamento
+            dono_id INTEGER,
+            licitacao_id INTEGER,
+            nome_arquivo TEXT,
+            motor TEXT,
+            escopo TEXT NOT NULL,                   -- arquivo / estagio / padrao / pagina
+            chave TEXT,                             -- Estágio, categoria ou número da página
+            segundos REAL DEFAULT 0.0,
+            linhas INTEGER DEFAULT 0,
+            matches INTEGER DEFAULT 0,
+            rejeitados INTEGER DEFAULT 0,
+            criado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_metricas_escopo ON metricas_processamento (escopo, dono_id)",
+        "CREATE INDEX IF NOT EXISTS idx_metricas_execucao ON metricas_processamento (execucao)",
+    ]),
+    (7, "Checkpoints da ingestão em lote pela linha de comando", [
+        """
+        CREATE TABLE IF NOT EXISTS ingestao_arquivos (
+            dono_id INTEGER NOT NULL,
+            caminho TEXT NOT NULL,                  -- Caminho absoluto do PDF
+            tamanho INTEGER,                        -- Tamanho e mtime: arquivo trocado é reprocessado
+            modificado_ns INTEGER,
+            status TEXT NOT NULL,                   -- CONCLUIDO / SEM_ITENS / FALHOU
+            licitacao_id INTEGER,
+            itens INTEGER DEFAULT 0,
+            paginas INTEGER DEFAULT 0,
+            erro TEXT,
+            segundos REAL,
+            atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (dono_id, caminho),
+            FOREIGN KEY (licitacao_id) REFERENCES licitacoes (id)
+        )
+        """,
+    ]),
+    (8, "Referência de preços de mercado por componente (agregado incremental)", [
+        """
+        CREATE TABLE IF NOT EXISTS referencia_precos (
+            tipo_componente TEXT NOT NULL,
+            componente TEXT NOT NULL,               -- valor_encontrado normalizado (referencias.normalizar_componente)
+            ocorrencias INTEGER DEFAULT 0,          -- Itens com ou sem preço
+            amostras INTEGER DEFAULT 0,             -- Itens com preço > 0
+            soma REAL DEFAULT 0.0,
+            minimo REAL,
+            maximo REAL,
+            mediana REAL,                           -- Do sketch, recalculada a cada atualização
+            sketch TEXT,                            -- JSON {balde logarítmico: contagem}
+            atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (tipo_componente, componente)
+        )
+        """,
+        _carga_referencias,
+    ]),
+    (9, "Texto das páginas guardado (reprocessar com regras novas sem reler o PDF)", [
+        """
+        CREATE TABLE IF NOT EXISTS paginas_texto (
+            hash_pdf TEXT NOT NULL,                 -- Mesmo endereço do cache_extracao (SHA-256 do PDF)
+            pagina INTEGER NOT NULL,                -- Base 1; páginas sem texto não são guardadas
+            motor TEXT,                             -- Motor de leitura que produziu o texto
+            texto BLOB NOT NULL,                    -- Texto comprimido (zlib)
+            PRIMARY KEY (hash_pdf, pagina)
+        )
+        """,
+        "ALTER TABLE licitacoes ADD COLUMN hash_pdf TEXT",
+    ]),
+    (10, "Produto sugerido de cada item materializado (matches_produto)", [
+        """
+        CREATE TABLE IF NOT EXISTS matches_produto (
+            item_id INTEGER PRIMARY KEY,            -- itens_extraidos.id
+            licitacao_id INTEGER NOT NULL,          -- Repetido do item: o Lucro Potencial soma por licitação
+            produto_id INTEGER,                     -- NULL: nenhum produto do catálogo serve
+            preco_venda REAL DEFAULT 0.0,
+            margem REAL DEFAULT 0.0,                -- Por unidade (venda - custo)
+            FOREIGN KEY (item_id) REFERENCES itens_extraidos (id),
+            FOREIGN KEY (produto_id) REFERENCES catalogo_produtos (id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_matches_licitacao ON matches_produto (licitacao_id)",
+        "CREATE INDEX IF NOT EXISTS idx_matches_produto ON matches_produto (produto_id)",
+        # Item apagado (reprocessamento, particionamento) leva o match junto
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_matches_item_delete AFTER DELETE ON itens_extraidos BEGIN
+            DELETE FROM matches_produto WHERE item_id = old.id;
+        END
+        """,
+        _carga_matches,
+    ]),
+    (11, "Busca por trecho (trigramas) na descrição dos itens", [
+        # Tag do catálogo pode estar grudada no meio de uma palavra ("256gb" em "ssd256gb"):
+        # o busca_itens (palavras) não acha, o trigrama acha. Conteúdo externo (itens_extraidos)
+        # e detail=none: o índice guarda só quais itens têm cada trigrama.
+        # Sem trigger de INSERT: com executemany o FTS5 descarrega o índice a cada linha (~10x
+        # mais lento); quem grava itens chama catalogo.indexar_trechos com um INSERT ... SELECT só
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS busca_trechos USING fts5(
+            valor_encontrado,
+            content = 'itens_extraidos',
+            content_rowid = 'id',
+            tokenize = 'trigram',
+            detail = 'none'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_busca_trechos_delete AFTER DELETE ON itens_extraidos BEGIN
+            INSERT INTO busca_trechos (busca_trechos, rowid, valor_encontrado) VALUES ('delete', old.id, old.valor_encontrado);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_busca_trechos_update AFTER UPDATE OF valor_encontrado ON itens_extraidos BEGIN
+            INSERT INTO busca_trechos (busca_trechos, rowid, valor_encontrado) VALUES ('delete', old.id, old.valor_encontrado);
+            INSERT INTO busca_trechos (rowid, valor_encontrado) VALUES (new.id, new.valor_encontrado);
+        END
+        """,
+        "INSERT INTO busca_trechos (busca_trechos) VALUES ('rebuild')", # Carga inicial
+    ]),
+    (12, "Controle de acesso do texto guardado (despejo LRU + idade, como o cache)", [
+        # Uma linha por PDF: o texto guardado também é despejado pelo último acesso e por tamanho
+        """
+        CREATE TABLE IF NOT EXISTS textos_guardados (
+            hash_pdf TEXT PRIMARY KEY,              -- Mesmo endereço do paginas_texto
+            paginas INTEGER NOT NULL,               -- 0: PDF sem texto (não é relido a cada hit do cache)
+            tamanho_bytes INTEGER NOT NULL,         -- Soma dos textos comprimidos
+            criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+            ultimo_acesso DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_textos_acesso ON textos_guardados (ultimo_acesso)",
+        """
+        INSERT OR IGNORE INTO textos_guardados (hash_pdf, paginas, tamanho_bytes)
+        SELECT hash_pdf, COUNT(*), SUM(LENGTH(texto)) FROM paginas_texto GROUP BY hash_pdf
+        """,
+    ]),
+    (13, "Tentativas de cada job (PDF que derruba o worker não volta para a fila para sempre)", [
+        "ALTER TABLE jobs ADD COLUMN tentativas INTEGER DEFAULT 0", # Somada a cada reserva
+    ]),
+]
+
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+def migrar(conexao, silencioso=False):
+    """
+    Aplica as migrações pendentes, cada uma na sua transação (DDL no SQLite é transacional).
+    Retorna a lista de versões aplicadas. `silencioso` manda o progresso para o log em vez
+    da saída padrão (servidor Streamlit, workers, bancos de usuário criados sob demanda).
+    """
+    versao = conexao.execute("PRAGMA user_version").fetchone()[0]
+    aplicadas = []
+    isolamento_original = conexao.isolation_level
+    conexao.isolation_level = None # Controle manual de BEGIN/COMMIT
+    try:
+        for numero, descricao, comandos in MIGRACOES:
+            if numero <= versao: continue
+            # IMMEDIATE + releitura: se outro processo (ex: worker da fila) migrou
+            # enquanto esperávamos o lock, não aplica de novo
+            conexao.execute("BEGIN IMMEDIATE")
+            if conexao.execute("PRAGMA user_version").fetchone()[0] >= numero:
+                conexao.execute("COMMIT")
+                continue
+            if silencioso: logger.info(f"🗄️ Migração v{numero}: {descricao}")
+            else: print(f"   -> Migração v{numero}: {descricao}")
+            try:
+                for passo in comandos:
+                    if callable(passo): passo(conexao)
+                    else: conexao.execute(passo)
+                conexao.execute(f"PRAGMA user_version = {numero}")
+                conexao.execute("COMMIT")
+            except Exception:
+                conexao.execute("ROLLBACK")
+                raise
+            aplicadas.append(numero)
+    finally:
+        conexao.isolation_level = isolamento_original
+    return aplicadas
+
+_bancos_migrados = set() # Evita reabrir o banco a cada rerun do Streamlit
+
+def garantir_schema(caminho=CAMINHO_BANCO):
+    """Deixa o banco na VERSAO_ATUAL (uma vez por processo). O progresso vai para o log."""
+    if caminho in _bancos_migrados: return
+    conexao = sqlite3.connect(caminho)
+    try:
+        migrar(conexao, silencioso=True)
+    finally:
+        conexao.close()
+    _bancos_migrados.add(caminho)
 
 def criar_banco():
-    print("--- Criando Banco V3 (Com Preços e Quantidades) ---")
-    conexao = sqlite3.connect("licitacloud.db")
-    cursor = conexao.cursor()
-    
-    # 1. Usuários
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS usuarios (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        email TEXT UNIQUE NOT NULL,
-        senha_hash TEXT NOT NULL,
-        nome TEXT
-    )
-    """)
-    
-    # 2. Licitações
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS licitacoes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        dono_id INTEGER NOT NULL,
-        nome_arquivo TEXT NOT NULL,
-        data_processamento DATETIME DEFAULT CURRENT_TIMESTAMP,
-        status TEXT DEFAULT 'PROCESSADO',
-        FOREIGN KEY (dono_id) REFERENCES usuarios (id)
-    )
-    """)
-    
-    # 3. Itens (AGORA COM PREÇO E QUANTIDADE DO EDITAL)
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS itens_extraidos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        licitacao_id INTEGER,
-        tipo_componente TEXT,
-        valor_encontrado TEXT,
-        quantidade_edital INTEGER DEFAULT 1,    -- NOVO
-        preco_medio_edital REAL DEFAULT 0.0,    -- NOVO
-        FOREIGN KEY (licitacao_id) REFERENCES licitacoes (id)
-    )
-    """)
-
-    # 4. Catálogo
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS catalogo_produtos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        dono_id INTEGER NOT NULL,
-        nome_produto TEXT NOT NULL,
-        tags_match TEXT NOT NULL,
-        custo_unitario REAL,
-        preco_venda REAL,
-        FOREIGN KEY (dono_id) REFERENCES usuarios (id)
-    )
-    """)
-    
-    print("✅ Banco atualizado com suporte a Quantidade e Preço!")
-    conexao.commit()
+    print(f"--- Criando/Atualizando Banco (schema v{VERSAO_ATUAL}) ---")
+    conexao = sqlite3.connect(CAMINHO_BANCO)
+    aplicadas = migrar(conexao)
     conexao.close()
+    if aplicadas:
+        print(f"✅ Banco atualizado para a v{VERSAO_ATUAL}!")
+    else:
+        print("✅ Banco já estava na versão atual.")
 
 if __name__ == "__main__":
-    criar_banco()
\ No newline at end of file
+    criar_banco()